@@ -0,0 +1,22 @@
+import os
+
+
+# Профиль SERVER_PROFILE=wsgi (serve.sh). Приложение загружается в каждом воркере после fork (без preload),
+# поэтому пул соединений Django у каждого процесса свой и не наследуется через fork.
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", str(os.cpu_count() or 1)))
+# Поток держит соединение из пула на время запроса: DATABASE_POOL_MAX_SIZE не меньше WEB_THREADS.
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "8"))
+timeout = int(os.environ.get("WEB_TIMEOUT", "30"))
+graceful_timeout = timeout
+keepalive = 5
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
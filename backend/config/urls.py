@@ -1,10 +1,13 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from wallets.views import metrics_view
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("wallets.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 
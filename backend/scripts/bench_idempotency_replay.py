@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _report(name: str, latencies: list[float]) -> None:
+    ms = [x * 1000 for x in latencies]
+    print(
+        f"{name:>8}: n={len(ms)} mean={statistics.mean(ms):.2f}ms "
+        f"p50={_percentile(ms, 50):.2f}ms p95={_percentile(ms, 95):.2f}ms p99={_percentile(ms, 99):.2f}ms"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Сравнение задержки нового перевода и повтора по Idempotency-Key")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--from-wallet-id", required=True)
+    parser.add_argument("--to-wallet-id", required=True)
+    parser.add_argument("--amount", default="0.01")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    url = f"{args.base_url.rstrip('/')}/api/transfer"
+    payload = {
+        "from_wallet_id": args.from_wallet_id,
+        "to_wallet_id": args.to_wallet_id,
+        "amount": args.amount,
+    }
+
+    fresh: list[float] = []
+    replay: list[float] = []
+    with httpx.Client(timeout=20.0) as client:
+        for _ in range(args.requests):
+            key = str(uuid.uuid4())
+            started = time.perf_counter()
+            r = client.post(url, json=payload, headers={"Idempotency-Key": key})
+            fresh.append(time.perf_counter() - started)
+            if r.status_code != 200:
+                print(f"перевод завершился со статусом {r.status_code}: {r.text[:120]}")
+                return 1
+
+            started = time.perf_counter()
+            r = client.post(url, json=payload, headers={"Idempotency-Key": key})
+            replay.append(time.perf_counter() - started)
+            if r.headers.get("Idempotent-Replayed") != "true":
+                print(f"повтор не был распознан: status={r.status_code}")
+                return 1
+
+    _report("transfer", fresh)
+    _report("replay", replay)
+    print(f"replay/transfer p50: {_percentile(replay, 50) / _percentile(fresh, 50):.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+
+
@@ -0,0 +1,27 @@
+#!/bin/sh
+# Профиль HTTP-сервера по SERVER_PROFILE: dev — runserver (по умолчанию), wsgi — gunicorn (gthread), asgi — uvicorn.
+set -e
+
+python manage.py migrate
+
+profile="${SERVER_PROFILE:-dev}"
+case "$profile" in
+  dev)
+    exec python manage.py runserver 0.0.0.0:8000 --noreload
+    ;;
+  wsgi|asgi)
+    # Несколько процессов: /metrics агрегирует значения воркеров через каталог prometheus multiprocess.
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    if [ "$profile" = wsgi ]; then
+      exec gunicorn config.wsgi:application -c config/gunicorn.py
+    fi
+    exec uvicorn config.asgi:application --host 0.0.0.0 --port 8000 \
+      --workers "${WEB_WORKERS:-$(nproc)}" --no-access-log
+    ;;
+  *)
+    echo "Неизвестный SERVER_PROFILE: $profile (dev|wsgi|asgi)" >&2
+    exit 1
+    ;;
+esac
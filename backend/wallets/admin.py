@@ -1,19 +1,68 @@
 from django.contrib import admin
 
-from wallets.models import Transaction, Wallet
+from wallets.models import (
+    FeeRule,
+    Hold,
+    IdempotencyKey,
+    NotificationDeadLetter,
+    OutboxEvent,
+    ReconciliationCheckpoint,
+    Transaction,
+    Wallet,
+)
 
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ("id", "owner_name", "currency", "balance", "created_at", "updated_at")
-    list_filter = ("currency", "owner_name")
+    list_display = (
+        "id", "owner_name", "currency", "wallet_class", "shard", "balance", "reserved", "created_at", "updated_at"
+    )
+    list_filter = ("currency", "wallet_class", "owner_name")
     search_fields = ("id", "owner_name")
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ("id", "status", "from_wallet", "to_wallet", "amount", "fee", "created_at")
+    list_display = ("id", "status", "from_wallet", "to_wallet", "amount", "fee", "fee_wallet", "created_at")
     list_filter = ("status",)
     search_fields = ("id",)
 
 
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "wallet", "to_wallet", "amount", "reserved", "captured_amount", "expires_at")
+    list_filter = ("status",)
+    search_fields = ("id", "wallet__id")
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("key", "response_status", "transaction", "created_at")
+    search_fields = ("key",)
+
+
+@admin.register(ReconciliationCheckpoint)
+class ReconciliationCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("wallet", "ledger_net", "last_diff", "last_created_at", "checked_at")
+    search_fields = ("wallet__id", "wallet__owner_name")
+
+
+@admin.register(NotificationDeadLetter)
+class NotificationDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ("transaction_id", "to_wallet_id", "attempts", "created_at")
+    search_fields = ("transaction_id", "to_wallet_id")
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "topic", "created_at")
+    list_filter = ("topic",)
+
+
+@admin.register(FeeRule)
+class FeeRuleAdmin(admin.ModelAdmin):
+    list_display = ("id", "currency", "wallet_class", "above", "percent", "fixed", "updated_at")
+    list_filter = ("currency", "wallet_class")
+    ordering = ("currency", "wallet_class", "above")
+
+
@@ -5,4 +5,7 @@ class WalletsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "wallets"
 
+    def ready(self) -> None:
+        from wallets import signals  # noqa: F401
+
 
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import nullcontext
+from decimal import Decimal
+from typing import Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection
+from psycopg import AsyncClientCursor, AsyncCursor
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from wallets import fees, fx, metrics, outbox, retry, sql, wallet_cache
+from wallets.models import Wallet
+from wallets.services import (
+    InvalidTransfer,
+    TransferResult,
+    _FIX_TO_BALANCE_SQL,
+    _LOCK_WALLETS_SQL,
+    _READ_WALLETS_SQL,
+    _admin_owner,
+    _admin_shards,
+    _apply_balances_sql,
+    _check_locked_wallets,
+    _check_versions,
+    _optimistic,
+    _pick_admin_shard,
+    _prepare_transfer,
+    _read_applied,
+    _reject_sequenced,
+    _stale_credit,
+    _transfer_result,
+    _validate_transfer,
+    _wallets_from_rows,
+)
+
+
+_pool: AsyncConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+# Ключи OPTIONS, которые разбирает сам Django, а не libpq.
+_DJANGO_OPTIONS = ("pool", "isolation_level", "server_side_binding", "assume_role", "cursor_factory")
+
+
+def _conninfo() -> str:
+    db = settings.DATABASES["default"]
+    params = {
+        "dbname": db.get("NAME"),
+        "user": db.get("USER"),
+        "password": db.get("PASSWORD"),
+        "host": db.get("HOST"),
+        "port": db.get("PORT"),
+    }
+    # Остальные OPTIONS (sslmode, connect_timeout, options с search_path и т.п.) — те же, что у синхронного пути.
+    params.update((k, v) for k, v in db.get("OPTIONS", {}).items() if k not in _DJANGO_OPTIONS)
+    params["options"] = " ".join(filter(None, [params.get("options"), "-c TimeZone=UTC"]))
+    return make_conninfo(**{k: str(v) for k, v in params.items() if v not in (None, "")})
+
+
+async def get_pool() -> AsyncConnectionPool:
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                pool = AsyncConnectionPool(
+                    _conninfo(),
+                    min_size=int(getattr(settings, "ASYNC_DB_POOL_MIN_SIZE", 1)),
+                    max_size=int(getattr(settings, "ASYNC_DB_POOL_MAX_SIZE", 20)),
+                    kwargs={"cursor_factory": AsyncClientCursor},
+                    open=False,
+                )
+                await pool.open()
+                _pool = pool
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def _currency(cur: AsyncCursor, wallet_id: str) -> str | None:
+    async def load(key: str) -> str | None:
+        await cur.execute("SELECT currency FROM wallets_wallet WHERE id = %s::uuid", [key])
+        row = await cur.fetchone()
+        return row[0] if row else None
+
+    return await wallet_cache.wallet_currencies.aget_or_load(wallet_id, load)
+
+
+async def _admin_wallet_id(cur: AsyncCursor, currency: str, shard: int) -> str:
+    async def load(key: tuple[str, int]) -> str:
+        owner = _admin_owner()
+        admin = Wallet(owner_name=owner, currency=currency, shard=shard, balance=Decimal("0.00"))
+        await cur.execute(
+            sql.insert_sql(Wallet, suffix="ON CONFLICT (owner_name, currency, shard) DO NOTHING"),
+            sql.insert_params(admin, connection),
+        )
+        await cur.execute(
+            "SELECT id FROM wallets_wallet WHERE owner_name = %s AND currency = %s AND shard = %s",
+            [owner, currency, shard],
+        )
+        return str((await cur.fetchone())[0])
+
+    return await wallet_cache.admin_wallet_ids.aget_or_load((currency, shard), load)
+
+
+async def _lock_wallets(cur: AsyncCursor, wallet_ids: list[str], *, lock: bool = True) -> dict[str, Wallet]:
+    await cur.execute(_LOCK_WALLETS_SQL if lock else _READ_WALLETS_SQL, [wallet_ids])
+    return _wallets_from_rows(await cur.fetchall(), DEFAULT_DB_ALIAS)
+
+
+async def atransfer(
+    *,
+    from_wallet_id: str,
+    to_wallet_id: str,
+    amount: Decimal,
+    on_success: Callable[[AsyncCursor, TransferResult], Awaitable[None]] | None = None,
+) -> TransferResult:
+    # Те же шаги и тот же SQL, что и transfer(), но на psycopg AsyncConnection: ожидание блокировки не держит поток.
+    from_wallet_id, to_wallet_id, amount = _validate_transfer(from_wallet_id, to_wallet_id, amount)
+    _reject_sequenced(from_wallet_id)
+    # Снимки тарифов и курсов берутся до транзакции: проверка их версий (раз в интервал) идёт в потоке, без
+    # синхронного доступа к БД в event loop, и не держит блокировок кошельков.
+    schedule = fees.fresh() or await sync_to_async(fees.current, thread_sensitive=False)()
+    rates = fx.fresh() or await sync_to_async(fx.current, thread_sensitive=False)()
+
+    async def attempt() -> TransferResult:
+        pool = await get_pool()
+        async with pool.connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    isolation = retry.set_isolation_sql()
+                    if isolation is not None:
+                        await cur.execute(isolation)
+                    currency = await _currency(cur, from_wallet_id)
+                    if currency is None:
+                        raise InvalidTransfer("from_wallet не найден")
+
+                    admin_shard = _pick_admin_shard()
+                    admin_id = await _admin_wallet_id(cur, currency, admin_shard)
+                    optimistic = _optimistic([from_wallet_id])
+                    with nullcontext() if optimistic else metrics.lock_wait("async"):
+                        by_id = await _lock_wallets(cur, [from_wallet_id, to_wallet_id, admin_id], lock=not optimistic)
+                    from_wallet = by_id.get(from_wallet_id)
+                    if from_wallet is None:
+                        wallet_cache.wallet_currencies.invalidate(from_wallet_id)
+                        raise InvalidTransfer("from_wallet не найден")
+
+                    admin_wallet = by_id.get(admin_id)
+                    if admin_wallet is None or admin_wallet.currency != from_wallet.currency:
+                        wallet_cache.wallet_currencies.invalidate(from_wallet_id)
+                        wallet_cache.admin_wallet_ids.invalidate((currency, admin_shard))
+                        admin_id = await _admin_wallet_id(cur, from_wallet.currency, admin_shard)
+                        by_id.update(await _lock_wallets(cur, [admin_id], lock=not optimistic))
+
+                    wallets = _check_locked_wallets(by_id, from_wallet_id, to_wallet_id, admin_id, rates)
+                    tx, deltas, _, _ = _prepare_transfer(*wallets, amount, rates, schedule)
+                    statement, params = _apply_balances_sql(
+                        deltas,
+                        [tx],
+                        events=[outbox.notification_event(tx)],
+                        admin_shard=wallets[2] if _admin_shards() > 1 else None,
+                        versions={str(w.id): w.version for w in wallets} if optimistic else None,
+                    )
+                    await cur.execute(statement, params)
+                    balances, other_shards = _read_applied(await cur.fetchall())
+                    if optimistic:
+                        _check_versions(deltas, balances, "async")
+                        fix = _stale_credit(tx, balances)
+                        if fix is not None:
+                            await cur.execute(_FIX_TO_BALANCE_SQL, fix)
+                    sql.mark_saved([tx], DEFAULT_DB_ALIAS)
+
+                    result = _transfer_result(tx, wallets, balances, other_shards)
+                    if on_success is not None:
+                        await on_success(cur, result)
+        return result
+
+    return await retry.arun(attempt, path="async")
+
+
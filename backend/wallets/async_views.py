@@ -0,0 +1,94 @@
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from psycopg import errors as pg_errors
+from rest_framework import status
+
+from wallets import fastpath, idempotency, metrics, retry
+from wallets.async_services import atransfer
+from wallets.services import InsufficientFunds, InvalidTransfer
+from wallets.views import _replay, _transfer_response_data
+
+
+def _render(data: dict, http_status: int, headers: dict | None = None) -> HttpResponse:
+    # Тот же рендерер, что у DRF-view, чтобы тела ответов совпадали байт в байт.
+    response = HttpResponse(fastpath.render(data), status=http_status, content_type="application/json")
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def transfer_async(request):
+    try:
+        payload = fastpath.loads(request.body or b"{}")
+    except ValueError as e:
+        return _render({"detail": f"JSON parse error - {e}"}, status.HTTP_400_BAD_REQUEST)
+
+    data, errors = fastpath.validate_transfer(payload)
+    if errors is not None:
+        return _render(errors, status.HTTP_400_BAD_REQUEST)
+
+    key = request.headers.get(idempotency.HEADER)
+    request_hash = None
+    if key is not None:
+        if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+            return _render({"detail": "Некорректный Idempotency-Key"}, status.HTTP_400_BAD_REQUEST)
+        request_hash = idempotency.request_fingerprint(
+            from_wallet_id=str(data["from_wallet_id"]),
+            to_wallet_id=str(data["to_wallet_id"]),
+            amount=data["amount"],
+        )
+        stored = await idempotency.alookup(key)
+        if stored is not None:
+            return _render(*_replay(stored, request_hash))
+
+    stored = None
+    body = None
+
+    async def on_success(cur, result):
+        nonlocal stored, body
+        body = _transfer_response_data(result)
+        if key is not None:
+            stored = await idempotency.astore(
+                cur,
+                key,
+                request_hash=request_hash,
+                status=status.HTTP_200_OK,
+                body=body,
+                tx=result.transaction,
+            )
+
+    try:
+        await atransfer(
+            from_wallet_id=str(data["from_wallet_id"]),
+            to_wallet_id=str(data["to_wallet_id"]),
+            amount=data["amount"],
+            on_success=on_success,
+        )
+    except InsufficientFunds:
+        metrics.transfer_result("async", "insufficient_funds")
+        return _render({"detail": "Insufficient funds"}, status.HTTP_409_CONFLICT)
+    except InvalidTransfer as e:
+        metrics.transfer_result("async", "invalid")
+        return _render({"detail": str(e)}, status.HTTP_400_BAD_REQUEST)
+    except retry.RetriesExhausted:
+        return _render(
+            {"detail": "Конфликт параллельных переводов, повторите запрос"},
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            {"Retry-After": "1"},
+        )
+    except pg_errors.UniqueViolation:
+        # Параллельный запрос с тем же ключом успел закоммитить первым.
+        stored = await idempotency.alookup(key) if key is not None else None
+        if stored is None:
+            raise
+        return _render(*_replay(stored, request_hash))
+
+    metrics.transfer_result("async", "ok")
+    if stored is not None:
+        await idempotency.acache(key, stored)
+    return _render(body, status.HTTP_200_OK)
+
+
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import random
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def latency_summary(latencies_ms: list[float]) -> dict[str, float]:
+    if not latencies_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    ordered = sorted(latencies_ms)
+    return {
+        "p50": round(percentile(ordered, 50), 3),
+        "p95": round(percentile(ordered, 95), 3),
+        "p99": round(percentile(ordered, 99), 3),
+        "max": round(ordered[-1], 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+    }
+
+
+class Sampler:
+    # Индексы 0..n-1: равномерно или по Zipf (индекс 0 — самый «горячий» кошелёк).
+    def __init__(self, n: int, *, skew: str = "uniform", zipf_s: float = 1.1, rng: random.Random | None = None):
+        self.n = n
+        self.rng = rng or random.Random()
+        self.cum_weights = None
+        if skew == "zipf":
+            self.cum_weights = list(itertools.accumulate(1 / (k**zipf_s) for k in range(1, n + 1)))
+
+    def __call__(self) -> int:
+        if self.cum_weights is None:
+            return self.rng.randrange(self.n)
+        x = self.rng.random() * self.cum_weights[-1]
+        return min(self.n - 1, bisect.bisect_left(self.cum_weights, x))
+
+
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+
+from wallets import metrics, services
+from wallets.services import TransferItem, TransferResult
+
+
+class _Pending:
+    __slots__ = ("item", "outcome", "done")
+
+    def __init__(self, item: TransferItem) -> None:
+        self.item = item
+        self.outcome: TransferResult | BaseException | None = None
+        self.done = threading.Event()
+
+
+class _Batch:
+    __slots__ = ("items", "full")
+
+    def __init__(self) -> None:
+        self.items: list[_Pending] = []
+        self.full = threading.Event()
+
+
+class Coalescer:
+    # Микропакеты по кошельку-отправителю внутри процесса. Первый запрос к кошельку становится ведущим: ждёт до
+    # max_wait секунд (или пока пакет не наберёт max_batch), забирает пакет и применяет его одной транзакцией
+    # transfer_coalesced(); остальные запросы пакета ждут свой результат. Пока пакет применяется, следующий
+    # копится уже под новым ведущим.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._open: dict[str, _Batch] = {}
+
+    def submit(self, item: TransferItem, *, max_wait: float, max_batch: int) -> TransferResult:
+        pending = _Pending(item)
+        with self._lock:
+            batch = self._open.get(item.from_wallet_id)
+            leader = batch is None
+            if leader:
+                batch = self._open[item.from_wallet_id] = _Batch()
+            batch.items.append(pending)
+            if len(batch.items) >= max_batch:
+                # Пакет полон: новые запросы начнут следующий, ведущий перестаёт ждать.
+                del self._open[item.from_wallet_id]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(max_wait)
+            with self._lock:
+                if self._open.get(item.from_wallet_id) is batch:
+                    del self._open[item.from_wallet_id]
+            self._apply(batch.items)
+        else:
+            pending.done.wait()
+
+        if isinstance(pending.outcome, BaseException):
+            raise pending.outcome
+        return pending.outcome
+
+    def _apply(self, batch: list[_Pending]) -> None:
+        metrics.coalesced_batch(len(batch))
+        outcomes: list[TransferResult | BaseException] = [RuntimeError("пакет переводов не применён")] * len(batch)
+        try:
+            outcomes = services.transfer_coalesced([pending.item for pending in batch])
+        except Exception as e:
+            # Ошибка всего пакета (исчерпаны повторы, БД недоступна) достаётся каждому его запросу.
+            outcomes = [e] * len(batch)
+        finally:
+            for pending, outcome in zip(batch, outcomes):
+                pending.outcome = outcome
+                pending.done.set()
+
+
+coalescer = Coalescer()
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "TRANSFER_COALESCE_ENABLED", False))
+
+
+def transfer(*, from_wallet_id: str, to_wallet_id: str, amount: Decimal) -> TransferResult:
+    # Тот же контракт, что у services.transfer(): результат или TransferError/RetriesExhausted.
+    return coalescer.submit(
+        TransferItem(from_wallet_id=str(from_wallet_id), to_wallet_id=str(to_wallet_id), amount=amount),
+        max_wait=float(getattr(settings, "TRANSFER_COALESCE_MAX_WAIT", 0.002)),
+        max_batch=max(1, int(getattr(settings, "TRANSFER_COALESCE_MAX_BATCH", 64))),
+    )
+
+
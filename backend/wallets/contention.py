@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+from django.conf import settings
+
+
+class HotWallets:
+    # Кошельки, на которых недавно сорвался оптимистичный перевод: до истечения TTL они идут пессимистичным путём.
+    # Состояние локально для процесса, как и кэш метаданных.
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._until: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, wallet_ids: Iterable[str], ttl: float) -> None:
+        until = time.monotonic() + ttl
+        with self._lock:
+            for wallet_id in wallet_ids:
+                self._until[wallet_id] = until
+                self._until.move_to_end(wallet_id)
+            while len(self._until) > self.maxsize:
+                self._until.popitem(last=False)
+
+    def any_hot(self, wallet_ids: Iterable[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if not self._until:
+                return False
+            for wallet_id in wallet_ids:
+                until = self._until.get(wallet_id)
+                if until is None:
+                    continue
+                if until > now:
+                    return True
+                del self._until[wallet_id]
+        return False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._until.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._until)
+
+
+hot_wallets = HotWallets(int(getattr(settings, "TRANSFER_HOT_WALLETS_MAX_SIZE", 10_000)))
+
+
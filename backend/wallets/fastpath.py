@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import io
+import json
+import re
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from wallets.serializers import TransferRequestSerializer
+
+try:
+    import orjson
+except ImportError:
+    # orjson необязателен: без него разбор и рендер — стандартные json/JSONRenderer, быстрой остаётся валидация.
+    orjson = None
+
+
+# Быстрый путь POST /api/transfer (TRANSFER_FAST_PATH=1). Он лишь сокращает работу для типичного корректного
+# запроса: всё, в чём быстрый путь не уверен, уходит в DRF, поэтому ошибки и тела ответов совпадают байт в байт.
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "TRANSFER_FAST_PATH", False))
+
+
+def _uuid(value) -> uuid.UUID | None:
+    # UUIDField принимает и int — такие редкие значения разбирает сериализатор.
+    if type(value) is not str:
+        return None
+    try:
+        return uuid.UUID(hex=value)
+    except ValueError:
+        return None
+
+
+def _positive_decimal(field: serializers.DecimalField):
+    # Только каноничная запись без знака, пробелов и экспоненты, целая часть не длиннее max_digits - decimal_places:
+    # такое DecimalField принимает всегда, а quantize до decimal_places точен. Ноль, отрицательные суммы и прочие
+    # записи проверяет сериализатор — он же формирует текст ошибки.
+    pattern = re.compile(rf"\d{{1,{field.max_digits - field.decimal_places}}}(?:\.\d{{1,{field.decimal_places}}})?")
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+
+    def parse(value) -> Decimal | None:
+        kind = type(value)
+        if kind is not str:
+            if kind is not int and kind is not float:
+                return None
+            value = str(value)
+        if pattern.fullmatch(value) is None:
+            return None
+        amount = Decimal(value).quantize(quantum)
+        return amount if amount else None
+
+    return parse
+
+
+def _compile(serializer_class: type[serializers.Serializer]):
+    fields = []
+    for name, field in serializer_class().fields.items():
+        if not field.required or field.validators or field.allow_null:
+            raise TypeError(f"{serializer_class.__name__}.{name}: поле не поддерживается быстрым путём")
+        if type(field) is serializers.UUIDField:
+            fields.append((name, _uuid))
+        elif type(field) is serializers.DecimalField:
+            fields.append((name, _positive_decimal(field)))
+        else:
+            raise TypeError(f"{serializer_class.__name__}.{name}: тип {type(field).__name__} не поддерживается")
+    fields = tuple(fields)
+
+    def validate(payload) -> dict | None:
+        if type(payload) is not dict:
+            return None
+        data = {}
+        for name, parse in fields:
+            value = parse(payload.get(name))
+            if value is None:
+                return None
+            data[name] = value
+        return data
+
+    return validate
+
+
+# validate_amount у TransferRequestSerializer требует amount > 0 — _positive_decimal пропускает только такие суммы.
+transfer_request = _compile(TransferRequestSerializer)
+
+
+def validate_transfer(payload) -> tuple[dict | None, dict | None]:
+    data = transfer_request(payload) if enabled() else None
+    if data is not None:
+        return data, None
+    serializer = TransferRequestSerializer(data=payload)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
+
+
+# orjson читает целые шире 64 бит как float, а json — как int: тела с такими числами разбирает json.
+_LONG_NUMBER = re.compile(rb"\d{19}")
+
+
+def loads(body: bytes):
+    if orjson is not None and enabled() and _LONG_NUMBER.search(body) is None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Текст ошибки — как у стандартного json: повторяем разбор им.
+            pass
+    return json.loads(body)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or not enabled() or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if _LONG_NUMBER.search(body) is None:
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                # NaN/Infinity, одиночные суррогаты и синтаксические ошибки: решение и текст — за JSONParser.
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Совпадает с JSONRenderer (UNICODE_JSON, COMPACT_JSON) на телах из строк, None, bool, int, dict и list.
+    # float orjson пишет иначе (1e20 против 1e+20), но в ответах переводов его нет: суммы уже отформатированы
+    # строками. UUID orjson кодирует сам и так же, как str(). Decimal он без default не кодирует, а datetime
+    # кодирует иначе (+00:00 и микросекунды против Z и миллисекунд), поэтому datetime пропускается в default
+    # (OPT_PASSTHROUGH_DATETIME) — ответ с Decimal или datetime рендерит JSONRenderer.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not enabled()
+            or self.ensure_ascii
+            or not self.compact
+            or "indent" in (accepted_media_type or "")
+            or (renderer_context or {}).get("indent") is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            body = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b"\xe2\x80" in body:
+            # JSONRenderer экранирует U+2028/U+2029 (JSON как подмножество JavaScript).
+            body = body.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return body
+
+
+_renderer = FastJSONRenderer()
+
+
+def render(data) -> bytes:
+    return _renderer.render(data)
+
+
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import connection
+
+from wallets.models import FeeRule
+
+
+_CENT = Decimal("0.01")
+_ZERO = Decimal("0.00")
+
+# Отпечаток таблицы правил одним запросом: она маленькая (десятки строк), а так замечается любая правка,
+# удаление и вставка, независимо от часов серверов приложения.
+_SIGNATURE_SQL = f"""
+SELECT md5(coalesce(
+    string_agg(concat_ws('|', id, currency, wallet_class, above, percent, fixed), ',' ORDER BY id),
+    ''
+))
+FROM {FeeRule._meta.db_table}
+"""
+
+
+@dataclass(frozen=True)
+class Tiers:
+    # Нижние границы ступеней по возрастанию и для каждой — (доля, фиксированная часть).
+    bounds: tuple[Decimal, ...]
+    rates: tuple[tuple[Decimal, Decimal], ...]
+
+    def fee(self, amount: Decimal) -> Decimal:
+        # Ступень с наибольшей границей строго меньше amount.
+        i = bisect_left(self.bounds, amount)
+        if i == 0:
+            return _ZERO
+        fraction, fixed = self.rates[i - 1]
+        return (amount * fraction + fixed).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+# Тариф без настроенных правил и для ключей, которым не подошло ни одно: 10% при amount > 1000.00.
+DEFAULT_TIERS = Tiers(bounds=(Decimal("1000.00"),), rates=((Decimal("0.10"), _ZERO),))
+
+
+@dataclass(frozen=True)
+class FeeSchedule:
+    signature: str
+    tiers: dict[tuple[str, str], Tiers]
+    checked_at: float
+
+    def tiers_for(self, currency: str, wallet_class: str) -> Tiers:
+        # Точное совпадение важнее валюты, валюта важнее класса, затем правило для всех.
+        for key in ((currency, wallet_class), (currency, ""), ("", wallet_class), ("", "")):
+            tiers = self.tiers.get(key)
+            if tiers is not None:
+                return tiers
+        return DEFAULT_TIERS
+
+    def fee(self, amount: Decimal, currency: str, wallet_class: str) -> Decimal:
+        return self.tiers_for(currency, wallet_class).fee(amount)
+
+    def fees(self, requests: Iterable[tuple[str, str, Decimal]]) -> list[Decimal]:
+        # Пакетная оценка: ступени разрешаются один раз на (валюта, класс), дальше — только bisect по границам.
+        resolved: dict[tuple[str, str], Tiers] = {}
+        result = []
+        for currency, wallet_class, amount in requests:
+            tiers = resolved.get((currency, wallet_class))
+            if tiers is None:
+                tiers = resolved[(currency, wallet_class)] = self.tiers_for(currency, wallet_class)
+            result.append(tiers.fee(amount))
+        return result
+
+
+def compile_rules(rules: Iterable[tuple[str, str, Decimal, Decimal, Decimal]], signature: str = "") -> FeeSchedule:
+    grouped: dict[tuple[str, str], list[tuple[Decimal, Decimal, Decimal]]] = {}
+    for currency, wallet_class, above, percent, fixed in rules:
+        grouped.setdefault((currency, wallet_class), []).append((above, percent / 100, fixed))
+    tiers = {
+        key: Tiers(
+            bounds=tuple(above for above, _, _ in sorted(rows)),
+            rates=tuple((fraction, fixed) for _, fraction, fixed in sorted(rows)),
+        )
+        for key, rows in grouped.items()
+    }
+    return FeeSchedule(signature=signature, tiers=tiers, checked_at=time.monotonic())
+
+
+_EMPTY = FeeSchedule(signature="", tiers={}, checked_at=-math.inf)
+
+# Как и курсы (wallets.fx): неизменяемый снимок процесса, заменяется целиком одним присваиванием.
+_schedule = _EMPTY
+_refresh_lock = threading.Lock()
+
+
+def _interval() -> float:
+    return float(getattr(settings, "FEE_RULES_CHECK_INTERVAL", 1.0))
+
+
+def fresh() -> FeeSchedule | None:
+    schedule = _schedule
+    return schedule if time.monotonic() - schedule.checked_at < _interval() else None
+
+
+def current() -> FeeSchedule:
+    # Отпечаток правил проверяется не чаще FEE_RULES_CHECK_INTERVAL на процесс, перекомпиляция — только при смене.
+    return fresh() or _refresh()
+
+
+def _refresh() -> FeeSchedule:
+    global _schedule
+    with _refresh_lock:
+        schedule = fresh()
+        if schedule is not None:
+            return schedule
+        with connection.cursor() as cur:
+            cur.execute(_SIGNATURE_SQL)
+            (signature,) = cur.fetchone()
+        if signature == _schedule.signature:
+            _schedule = replace(_schedule, checked_at=time.monotonic())
+        else:
+            rules = FeeRule.objects.values_list("currency", "wallet_class", "above", "percent", "fixed")
+            _schedule = compile_rules(rules, signature)
+        return _schedule
+
+
+def reset() -> None:
+    global _schedule
+    _schedule = _EMPTY
+
+
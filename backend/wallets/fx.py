@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Context, Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from wallets.models import FxRate, FxRateSet
+
+
+# amount (18 цифр) * rate (24 цифры) помещается в 64 значащие цифры без округления: произведение точное,
+# округляется только результат — один раз, до копеек, тем же ROUND_HALF_UP, что и _q2.
+_EXACT = Context(prec=64)
+_CENT = Decimal("0.01")
+
+_LATEST_SQL = f"SELECT id, created_at FROM {FxRateSet._meta.db_table} ORDER BY id DESC LIMIT 1"
+
+
+@dataclass(frozen=True)
+class RateTable:
+    version: int
+    rates: dict[tuple[str, str], Decimal]
+    published_at: datetime | None
+    checked_at: float
+
+    def rate(self, base: str, quote: str) -> Decimal | None:
+        return self.rates.get((base, quote))
+
+
+_EMPTY = RateTable(version=0, rates={}, published_at=None, checked_at=-math.inf)
+
+# Снимок курсов процесса. Заменяется целиком одним присваиванием: перевод видит либо старую версию, либо новую,
+# но не их смесь; чтение — без блокировок и без запросов.
+_table = _EMPTY
+_refresh_lock = threading.Lock()
+
+
+def convert(amount: Decimal, rate: Decimal) -> Decimal:
+    return _EXACT.multiply(amount, rate).quantize(_CENT, rounding=ROUND_HALF_UP, context=_EXACT)
+
+
+def _interval() -> float:
+    return float(getattr(settings, "FX_RATES_CHECK_INTERVAL", 1.0))
+
+
+def fresh() -> RateTable | None:
+    table = _table
+    return table if time.monotonic() - table.checked_at < _interval() else None
+
+
+def current() -> RateTable:
+    # Версия проверяется не чаще FX_RATES_CHECK_INTERVAL на процесс (один запрос по PK); курсы перечитываются
+    # только при её смене.
+    return fresh() or _refresh()
+
+
+def _refresh() -> RateTable:
+    global _table
+    with _refresh_lock:
+        table = fresh()
+        if table is not None:
+            return table
+        with connection.cursor() as cur:
+            cur.execute(_LATEST_SQL)
+            row = cur.fetchone()
+        version, published_at = row if row is not None else (0, None)
+        now = time.monotonic()
+        if version == _table.version:
+            _table = replace(_table, checked_at=now)
+        else:
+            rates = {
+                (base, quote): rate
+                for base, quote, rate in FxRate.objects.filter(rate_set_id=version).values_list("base", "quote", "rate")
+            }
+            _table = RateTable(version=version, rates=rates, published_at=published_at, checked_at=now)
+        return _table
+
+
+def reset() -> None:
+    global _table
+    _table = _EMPTY
+
+
+def publish(rates: dict[tuple[str, str], Decimal], *, source: str = "", replace_all: bool = False) -> FxRateSet:
+    # Новая версия = предыдущая + переданные пары (или только они при replace_all); старые версии остаются для
+    # аудита. Публикации сериализуются advisory lock, поэтому порядок id совпадает с порядком коммитов.
+    for (base, quote), rate in rates.items():
+        if base == quote or not base or not quote:
+            raise ValueError(f"Некорректная пара {base}/{quote}")
+        if rate <= 0:
+            raise ValueError(f"Курс {base}/{quote} должен быть > 0")
+
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [FxRateSet._meta.db_table])
+        previous = FxRateSet.objects.order_by("-id").first()
+        merged: dict[tuple[str, str], Decimal] = {}
+        if previous is not None and not replace_all:
+            merged = {
+                (base, quote): rate
+                for base, quote, rate in FxRate.objects.filter(rate_set=previous).values_list("base", "quote", "rate")
+            }
+        merged.update(rates)
+        rate_set = FxRateSet.objects.create(source=source)
+        FxRate.objects.bulk_create(
+            [FxRate(rate_set=rate_set, base=base, quote=quote, rate=rate) for (base, quote), rate in merged.items()]
+        )
+    # Этот процесс увидит новую версию сразу, остальные — при следующей проверке.
+    reset()
+    return rate_set
+
+
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from wallets import fees, fx, metrics, outbox, retry, wallet_cache
+from wallets.models import Hold, HoldStatus, Wallet
+from wallets.services import (
+    InsufficientFunds,
+    InvalidTransfer,
+    TransferError,
+    TransferResult,
+    _admin_owner,
+    _admin_shards,
+    _admin_wallet_id,
+    _apply_balances,
+    _check_locked_wallets,
+    _fee_for,
+    _fx_rate,
+    _lock_wallets,
+    _pick_admin_shard,
+    _prepare_transfer,
+    _q2,
+    _reject_sequenced,
+    _transfer_result,
+    _validate_transfer,
+    _wallet_currencies,
+)
+
+
+class HoldNotFound(TransferError):
+    pass
+
+
+class HoldStateError(TransferError):
+    pass
+
+
+@dataclass(frozen=True)
+class CaptureResult:
+    hold: Hold
+    transfer: TransferResult
+
+
+def _ttl(ttl: float | None) -> float:
+    default = float(getattr(settings, "HOLD_DEFAULT_TTL", 7 * 24 * 60 * 60))
+    limit = float(getattr(settings, "HOLD_MAX_TTL", 30 * 24 * 60 * 60))
+    ttl = default if ttl is None else float(ttl)
+    if ttl <= 0 or ttl > limit:
+        raise InvalidTransfer(f"ttl должен быть в пределах (0, {limit:.0f}] секунд")
+    return ttl
+
+
+def _reserve(wallet_id: str, amount: Decimal) -> None:
+    # version растёт и здесь: оптимистичный перевод, прочитавший кошелёк до холда, не пройдёт условный UPDATE.
+    Wallet.objects.filter(id=wallet_id).update(reserved=F("reserved") + amount, version=F("version") + 1)
+
+
+def _lock_hold(hold_id) -> Hold:
+    hold = Hold.objects.select_for_update().filter(id=hold_id).first()
+    if hold is None:
+        raise HoldNotFound("Холд не найден")
+    if hold.status != HoldStatus.ACTIVE:
+        raise HoldStateError(f"Холд уже в статусе {hold.status}")
+    if hold.expires_at <= timezone.now():
+        # Резерв снимет sweeper (expire_holds) — тем же путём, что и у остальных истёкших холдов.
+        raise HoldStateError("Срок холда истёк")
+    return hold
+
+
+def _close(hold: Hold, status: str, **fields) -> Hold:
+    hold.status = status
+    for name, value in fields.items():
+        setattr(hold, name, value)
+    hold.save(update_fields=["status", "updated_at", *fields])
+    metrics.hold_action(status)
+    return hold
+
+
+@retry.atomic("hold")
+def authorize(*, wallet_id, to_wallet_id, amount: Decimal, ttl: float | None = None) -> Hold:
+    # Резервирует amount + комиссию (по тем же правилам, что у перевода) без списания: balance не меняется,
+    # растёт wallet.reserved, и переводы видят только available = balance - reserved.
+    wallet_id, to_wallet_id, amount = _validate_transfer(wallet_id, to_wallet_id, amount)
+    _reject_sequenced(wallet_id)
+    ttl = _ttl(ttl)
+
+    currencies = _wallet_currencies([wallet_id, to_wallet_id])
+    if wallet_id not in currencies:
+        raise InvalidTransfer("from_wallet не найден")
+    if to_wallet_id not in currencies:
+        raise InvalidTransfer("Один или несколько кошельков не найдены")
+    if currencies[wallet_id] != currencies[to_wallet_id]:
+        # Курс фиксируется при capture; здесь только проверка, что пара котируется.
+        _fx_rate(currencies[wallet_id], currencies[to_wallet_id])
+
+    # Снимок тарифов — до блокировки, как у transfer().
+    schedule = fees.current()
+    with metrics.lock_wait("hold"):
+        wallet = _lock_wallets([wallet_id]).get(wallet_id)
+    if wallet is None:
+        wallet_cache.wallet_currencies.invalidate(wallet_id)
+        raise InvalidTransfer("from_wallet не найден")
+    if wallet.owner_name == _admin_owner():
+        raise InvalidTransfer("Холд на admin-кошельке невозможен")
+
+    reserved = _q2(amount + _fee_for(amount, wallet, schedule))
+    if wallet.available < reserved:
+        raise InsufficientFunds("Insufficient funds")
+
+    _reserve(wallet_id, reserved)
+    hold = Hold.objects.create(
+        wallet_id=wallet_id,
+        to_wallet_id=to_wallet_id,
+        amount=amount,
+        reserved=reserved,
+        expires_at=timezone.now() + timedelta(seconds=ttl),
+    )
+    metrics.hold_action(HoldStatus.ACTIVE)
+    return hold
+
+
+@retry.atomic("hold")
+def capture(hold_id, amount: Decimal | None = None) -> CaptureResult:
+    # Порядок блокировок: холд, затем кошельки в порядке id — как у sweeper, поэтому они не ловят deadlock.
+    # Снимки тарифов и курсов — до первой из них.
+    schedule, rates = fees.current(), fx.current()
+    hold = _lock_hold(hold_id)
+    amount = hold.amount if amount is None else _q2(amount)
+    if amount <= 0 or amount > hold.amount:
+        raise InvalidTransfer("amount должен быть > 0 и не больше суммы холда")
+
+    from_wallet_id, to_wallet_id = str(hold.wallet_id), str(hold.to_wallet_id)
+    _reject_sequenced(from_wallet_id)
+    currency = _wallet_currencies([from_wallet_id]).get(from_wallet_id)
+    if currency is None:
+        raise InvalidTransfer("from_wallet не найден")
+
+    admin_shard = _pick_admin_shard()
+    admin_id = _admin_wallet_id(currency, admin_shard)
+    with metrics.lock_wait("hold"):
+        by_id = _lock_wallets([from_wallet_id, to_wallet_id, admin_id])
+    admin_wallet = by_id.get(admin_id)
+    if admin_wallet is None or admin_wallet.currency != currency:
+        wallet_cache.admin_wallet_ids.invalidate((currency, admin_shard))
+        admin_id = _admin_wallet_id(currency, admin_shard)
+        by_id.update(_lock_wallets([admin_id]))
+
+    wallets = _check_locked_wallets(by_id, from_wallet_id, to_wallet_id, admin_id, rates)
+    # Резерв холда снимается целиком — остаток после частичного capture освобождается, — а перевод идёт из него.
+    # Комиссия считается от фактической суммы по действующему тарифу (wallets.fees); если после смены правил
+    # она превысит резерв, недостающее списывается из available, а без него capture получит InsufficientFunds.
+    wallets[0].reserved -= hold.reserved
+    tx, deltas, _, _ = _prepare_transfer(*wallets, amount, rates, schedule)
+    _reserve(from_wallet_id, -hold.reserved)
+    balances, other_shards = _apply_balances(
+        deltas,
+        [tx],
+        events=[outbox.notification_event(tx)],
+        admin_shard=wallets[2] if _admin_shards() > 1 else None,
+    )
+    result = _transfer_result(tx, wallets, balances, other_shards)
+    _close(hold, HoldStatus.CAPTURED, captured_amount=amount, transaction=tx)
+    return CaptureResult(hold=hold, transfer=result)
+
+
+@retry.atomic("hold")
+def void(hold_id) -> Hold:
+    hold = _lock_hold(hold_id)
+    _reserve(str(hold.wallet_id), -hold.reserved)
+    return _close(hold, HoldStatus.VOIDED)
+
+
+# Пакет истёкших холдов одним запросом: строки берутся по частичному индексу (expires_at) WHERE status = 'active',
+# занятые capture/void пропускаются (SKIP LOCKED), резервы суммируются по кошельку и снимаются одним UPDATE
+# с блокировкой кошельков в порядке id.
+_EXPIRE_SQL = f"""
+WITH expired AS (
+    UPDATE wallets_hold AS h
+    SET status = '{HoldStatus.EXPIRED}', updated_at = %s
+    WHERE h.id IN (
+        SELECT id
+        FROM wallets_hold
+        WHERE status = '{HoldStatus.ACTIVE}' AND expires_at <= %s
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING h.wallet_id, h.reserved
+), released AS (
+    SELECT wallet_id, SUM(reserved) AS reserved
+    FROM expired
+    GROUP BY wallet_id
+), locked AS (
+    SELECT w.id
+    FROM wallets_wallet AS w
+    JOIN released AS r ON r.wallet_id = w.id
+    ORDER BY w.id
+    FOR UPDATE OF w
+), updated AS (
+    UPDATE wallets_wallet AS w
+    SET reserved = w.reserved - r.reserved, version = w.version + 1
+    FROM released AS r
+    WHERE w.id = r.wallet_id AND w.id IN (SELECT id FROM locked)
+    RETURNING w.id
+)
+SELECT (SELECT count(*) FROM expired), (SELECT count(*) FROM updated)
+"""
+
+
+@retry.atomic("hold_sweep")
+def _expire_batch(now: datetime, batch_size: int) -> int:
+    with connection.cursor() as cur:
+        cur.execute(_EXPIRE_SQL, [now, now, batch_size])
+        expired, _ = cur.fetchone()
+    return expired
+
+
+def expire_holds(*, batch_size: int | None = None, now: datetime | None = None) -> int:
+    # Каждый пакет — своя короткая транзакция, чтобы не держать блокировки кошельков на весь проход.
+    batch_size = batch_size or int(getattr(settings, "HOLD_SWEEP_BATCH_SIZE", 1000))
+    now = now or timezone.now()
+    total = 0
+    while True:
+        expired = _expire_batch(now, batch_size)
+        total += expired
+        if expired < batch_size:
+            break
+    if total:
+        metrics.hold_action(HoldStatus.EXPIRED, total)
+    return total
+
+
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from psycopg import AsyncCursor
+
+from wallets import sql
+from wallets.async_services import get_pool
+from wallets.models import IdempotencyKey, Transaction
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status: int
+    body: dict
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+
+def _cache_key(key: str) -> str:
+    return "idem:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def request_fingerprint(*, from_wallet_id: str, to_wallet_id: str, amount) -> str:
+    raw = f"{from_wallet_id}|{to_wallet_id}|{amount:.2f}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_get(key: str) -> StoredResponse | None:
+    # Кэш — только ускоритель: недоступный Redis не должен ронять переводы.
+    try:
+        cached = cache.get(_cache_key(key))
+    except Exception:
+        logger.warning("idempotency cache get failed", exc_info=True)
+        return None
+    if cached is None:
+        return None
+    request_hash, status, body = cached
+    return StoredResponse(request_hash=request_hash, status=status, body=body)
+
+
+def _cache_set(key: str, stored: StoredResponse, timeout: int) -> None:
+    if timeout <= 0:
+        return
+    try:
+        cache.set(_cache_key(key), (stored.request_hash, stored.status, stored.body), timeout)
+    except Exception:
+        logger.warning("idempotency cache set failed", exc_info=True)
+
+
+_LOOKUP_SQL = """
+SELECT request_hash, response_status, response_body, created_at
+FROM wallets_idempotencykey
+WHERE key = %s
+"""
+
+
+def _stored_from_row(key: str, row) -> StoredResponse | None:
+    if row is None:
+        return None
+    request_hash, status, body, created_at = row
+    stored = StoredResponse(request_hash=request_hash, status=status, body=body)
+    age = (timezone.now() - created_at).total_seconds()
+    _cache_set(key, stored, int(_ttl() - age))
+    return stored
+
+
+def lookup(key: str) -> StoredResponse | None:
+    stored = _cache_get(key)
+    if stored is not None:
+        return stored
+
+    row = (
+        IdempotencyKey.objects.filter(key=key)
+        .values_list("request_hash", "response_status", "response_body", "created_at")
+        .first()
+    )
+    return _stored_from_row(key, row)
+
+
+async def alookup(key: str) -> StoredResponse | None:
+    stored = await sync_to_async(_cache_get, thread_sensitive=False)(key)
+    if stored is not None:
+        return stored
+
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute(_LOOKUP_SQL, [key])
+        row = await cur.fetchone()
+    return await sync_to_async(_stored_from_row, thread_sensitive=False)(key, row)
+
+
+def store(key: str, *, request_hash: str, status: int, body: dict, tx: Transaction | None = None) -> None:
+    # Вызывается внутри atomic-блока перевода: уникальный индекс по key не даёт применить повтор дважды.
+    IdempotencyKey.objects.create(
+        key=key,
+        request_hash=request_hash,
+        transaction=tx,
+        response_status=status,
+        response_body=body,
+    )
+    stored = StoredResponse(request_hash=request_hash, status=status, body=body)
+    transaction.on_commit(lambda: _cache_set(key, stored, _ttl()))
+
+
+async def astore(
+    cur: AsyncCursor,
+    key: str,
+    *,
+    request_hash: str,
+    status: int,
+    body: dict,
+    tx: Transaction | None = None,
+) -> StoredResponse:
+    # Async-аналог store(): вставка в транзакции перевода, кэш заполняет вызывающий после коммита.
+    row = IdempotencyKey(
+        key=key,
+        request_hash=request_hash,
+        transaction=tx,
+        response_status=status,
+        response_body=body,
+    )
+    await cur.execute(sql.insert_sql(IdempotencyKey), sql.insert_params(row, connection))
+    return StoredResponse(request_hash=request_hash, status=status, body=body)
+
+
+async def acache(key: str, stored: StoredResponse) -> None:
+    await sync_to_async(_cache_set, thread_sensitive=False)(key, stored, _ttl())
+
+
+def purge_expired(*, batch_size: int = 1000) -> int:
+    cutoff = timezone.now() - timedelta(seconds=_ttl())
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
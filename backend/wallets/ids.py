@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+_RAND_BITS = 74
+_RAND_B_BITS = 62
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_rand = 0
+
+
+def uuid7() -> uuid.UUID:
+    # RFC 9562: 48 бит unix-времени в мс, версия 7, 74 случайных бита (rand_a + rand_b). Внутри процесса значения
+    # строго растут: в той же миллисекунде (или после отката часов) случайная часть увеличивается на случайный шаг,
+    # так что соседние id не угадываются перебором.
+    global _last_ms, _last_rand
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big") >> (80 - _RAND_BITS)
+    with _lock:
+        if ms <= _last_ms:
+            ms, rand = _last_ms, _last_rand + random.randrange(1, 1 << 32)
+            if rand >> _RAND_BITS:
+                ms, rand = ms + 1, rand & ((1 << _RAND_BITS) - 1)
+        _last_ms, _last_rand = ms, rand
+    return uuid.UUID(
+        int=(ms << 80)
+        | (0x7 << 76)
+        | ((rand >> _RAND_B_BITS) << 64)
+        | (0b10 << 62)
+        | (rand & ((1 << _RAND_B_BITS) - 1))
+    )
+
+
+def new_id() -> uuid.UUID:
+    # Первичные ключи Wallet и Transaction. UUID_VERSION=4 возвращает случайные id (для сравнения и отката).
+    if int(getattr(settings, "UUID_VERSION", 7)) == 4:
+        return uuid.uuid4()
+    return uuid7()
+
+
+def timestamp_ms(value: uuid.UUID) -> int | None:
+    # Время создания из uuid7; у uuid4 его нет.
+    if value.version != 7:
+        return None
+    return value.int >> 80
+
+
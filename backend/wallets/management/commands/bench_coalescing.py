@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from wallets import coalescer
+from wallets.models import Wallet
+from wallets.services import _ensure_admin_wallet, transfer
+
+
+_OWNER_PREFIX = "bench-coalescing-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Один «горячий» кошелёк-отправитель, N потоков: переводы по одному (FOR UPDATE на каждый) против "
+        "микропакетов coalescer; переводы/с и задержка p50/p99."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=5.0, help="Длительность каждого режима, сек")
+        parser.add_argument("--max-wait", type=float, default=None, help="По умолчанию TRANSFER_COALESCE_MAX_WAIT")
+        parser.add_argument("--max-batch", type=int, default=None, help="По умолчанию TRANSFER_COALESCE_MAX_BATCH")
+
+    def handle(self, *args, **opts):
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        _ensure_admin_wallet(currency)
+        hot, *targets = [
+            Wallet.objects.get_or_create(owner_name=f"{_OWNER_PREFIX}{i}", currency=currency, shard=0)[0]
+            for i in range(9)
+        ]
+        Wallet.objects.filter(pk=hot.pk).update(balance=Decimal("1000000000.00"))
+        target_ids = [str(w.id) for w in targets]
+        max_wait = opts["max_wait"] if opts["max_wait"] is not None else settings.TRANSFER_COALESCE_MAX_WAIT
+        max_batch = opts["max_batch"] or settings.TRANSFER_COALESCE_MAX_BATCH
+
+        self.stdout.write(f"threads={opts['threads']} duration={opts['duration']}s")
+        with override_settings(TRANSFER_COALESCE_MAX_WAIT=max_wait, TRANSFER_COALESCE_MAX_BATCH=max_batch):
+            modes = (("single", transfer), (f"coalesced (wait={max_wait}s batch={max_batch})", coalescer.transfer))
+            for label, fn in modes:
+                rate, latencies = self._run(fn, str(hot.id), target_ids, opts["threads"], opts["duration"])
+                p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+                self.stdout.write(
+                    f"{label:<36} {rate:>8.0f} transfers/s  "
+                    f"p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+                )
+
+    def _run(self, fn, hot_id: str, target_ids: list[str], threads: int, duration: float) -> tuple[float, list[float]]:
+        latencies: list[float] = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+        deadline = 0.0
+
+        def worker(slot: int) -> None:
+            local: list[float] = []
+            try:
+                barrier.wait()
+                i = slot
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    fn(from_wallet_id=hot_id, to_wallet_id=target_ids[i % len(target_ids)], amount=Decimal("1.00"))
+                    local.append(time.perf_counter() - started)
+                    i += threads
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local)
+
+        pool = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+        for thread in pool:
+            thread.start()
+        started = time.perf_counter()
+        deadline = started + duration
+        barrier.wait()
+        for thread in pool:
+            thread.join()
+        return len(latencies) / (time.perf_counter() - started), latencies
+
+
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from wallets import fx
+from wallets.services import _fx_rate, _q2
+
+
+class Command(BaseCommand):
+    help = (
+        "Стоимость межвалютной части перевода в процессе: поиск курса в снимке wallets.fx и конвертация "
+        "(нс/операцию) при заданном числе валют; проверка версии снимка (fx.current) на горячем пути."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--currencies", type=int, default=200, help="Валют в таблице (пар — n * (n - 1))")
+        parser.add_argument("--ops", type=int, default=1_000_000)
+
+    def handle(self, *args, **opts):
+        n, ops = opts["currencies"], opts["ops"]
+        if n < 2 or ops < 1:
+            raise CommandError("--currencies должен быть >= 2, --ops >= 1")
+
+        rng = random.Random(1)
+        codes = [f"C{i:03d}" for i in range(n)]
+        rates = {
+            pair: Decimal(rng.uniform(0.001, 1000)).quantize(Decimal("1e-12"))
+            for pair in itertools.permutations(codes, 2)
+        }
+        # Снимок строится в памяти, без публикации: бенчмарк не должен создавать версии курсов в рабочей БД.
+        table = fx.RateTable(version=1, rates=rates, published_at=None, checked_at=time.monotonic())
+        pairs = rng.choices(list(rates), k=min(ops, 100_000))
+        amounts = [_q2(Decimal(rng.uniform(0.01, 100_000))) for _ in pairs]
+        work = list(zip(pairs, amounts))
+        self.stdout.write(f"currencies={n} pairs={len(rates)} ops={ops}")
+
+        def run(label: str, step) -> None:
+            started = time.perf_counter_ns()
+            for (base, quote), amount in itertools.islice(itertools.cycle(work), ops):
+                step(base, quote, amount)
+            per_op = (time.perf_counter_ns() - started) / ops
+            self.stdout.write(f"{label:<28} {per_op:8.0f} ns/op  ({1e9 / per_op:,.0f} ops/s)")
+
+        run("same currency (_q2)", lambda base, quote, amount: _q2(amount))
+        run("lookup", lambda base, quote, amount: table.rate(base, quote))
+        run("lookup + convert", lambda base, quote, amount: fx.convert(amount, table.rates[(base, quote)]))
+        with override_settings(FX_RATES_MAX_AGE=0):
+            run("_fx_rate + convert", lambda base, quote, amount: fx.convert(amount, _fx_rate(base, quote, table)))
+
+        # Горячий путь fx.current(): снимок свежий — ни запросов, ни блокировок; первый вызов проверяет версию в БД.
+        fx.current()
+        run("fx.current() (fresh)", lambda base, quote, amount: fx.current())
+
+
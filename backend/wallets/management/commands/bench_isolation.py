@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import override_settings
+
+from wallets import contention, retry
+from wallets.metrics import TRANSFER_RETRIES_TOTAL
+from wallets.models import Wallet
+from wallets.services import (
+    LOCKING_OPTIMISTIC,
+    LOCKING_PESSIMISTIC,
+    InsufficientFunds,
+    _ensure_admin_wallet,
+    transfer,
+)
+
+
+_OWNER_PREFIX = "bench-isolation-"
+
+
+def _retries_total() -> float:
+    return sum(
+        sample.value
+        for metric in TRANSFER_RETRIES_TOTAL.collect()
+        for sample in metric.samples
+        if sample.name == "wallet_transfer_retries_total"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность переводов под конкуренцией за «горячие» кошельки для каждого уровня изоляции "
+        "и режима блокировок: успешные переводы в секунду, повторы на 40001/40P01 и исчерпанные повторы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--wallets", type=int, default=4, help="Сколько кошельков делят потоки")
+        parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона каждого режима, сек")
+        parser.add_argument(
+            "--levels",
+            default=",".join(retry.ISOLATION_LEVELS),
+            help="Уровни изоляции через запятую",
+        )
+        parser.add_argument(
+            "--locking",
+            default=LOCKING_PESSIMISTIC,
+            help=f"Режимы блокировок через запятую: {LOCKING_PESSIMISTIC}, {LOCKING_OPTIMISTIC}",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["wallets"] < 2:
+            raise CommandError("--wallets должен быть >= 2")
+        levels = [level.strip().lower() for level in opts["levels"].split(",") if level.strip()]
+        unknown = [level for level in levels if level not in retry.ISOLATION_LEVELS]
+        if unknown:
+            raise CommandError(f"Неизвестные уровни изоляции: {', '.join(unknown)}")
+        modes = [mode.strip().lower() for mode in opts["locking"].split(",") if mode.strip()]
+        unknown = [mode for mode in modes if mode not in (LOCKING_PESSIMISTIC, LOCKING_OPTIMISTIC)]
+        if unknown:
+            raise CommandError(f"Неизвестные режимы блокировок: {', '.join(unknown)}")
+
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        _ensure_admin_wallet(currency)
+        names = [f"{_OWNER_PREFIX}{i:03d}" for i in range(opts["wallets"])]
+        Wallet.objects.bulk_create(
+            [Wallet(owner_name=name, currency=currency, balance=Decimal("0.00")) for name in names],
+            ignore_conflicts=True,
+        )
+        wallet_ids = [
+            str(wallet_id)
+            for wallet_id in Wallet.objects.filter(owner_name__in=names, currency=currency, shard=0).values_list(
+                "id", flat=True
+            )
+        ]
+
+        self.stdout.write(f"threads={opts['threads']} wallets={len(wallet_ids)} duration={opts['duration']}s")
+        for level in levels:
+            for mode in modes:
+                Wallet.objects.filter(id__in=wallet_ids).update(balance=Decimal("1000000.00"), version=F("version") + 1)
+                contention.hot_wallets.clear()
+                with override_settings(TRANSFER_ISOLATION_LEVEL=level, TRANSFER_LOCKING_MODE=mode):
+                    outcomes, retries, elapsed = self._run(wallet_ids, opts["threads"], opts["duration"])
+                self.stdout.write(
+                    f"{level:<16} {mode:<12} ok={outcomes['ok'] / elapsed:>8.0f}/s retries={retries:>6.0f} "
+                    f"conflicts={outcomes['conflict']} insufficient={outcomes['insufficient_funds']}"
+                )
+
+    def _run(self, wallet_ids: list[str], threads: int, duration: float) -> tuple[Counter, float, float]:
+        outcomes: Counter = Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads + 1)
+        deadline = 0.0
+
+        def worker(seed: int) -> None:
+            rng = random.Random(seed)
+            local: Counter = Counter()
+            try:
+                barrier.wait()
+                while time.perf_counter() < deadline:
+                    src, dst = rng.sample(wallet_ids, 2)
+                    try:
+                        transfer(from_wallet_id=src, to_wallet_id=dst, amount=Decimal("1.00"))
+                        local["ok"] += 1
+                    except InsufficientFunds:
+                        local["insufficient_funds"] += 1
+                    except retry.RetriesExhausted:
+                        local["conflict"] += 1
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(local)
+
+        retries_before = _retries_total()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        started = time.perf_counter()
+        deadline = started + duration
+        barrier.wait()
+        for thread in pool:
+            thread.join()
+        return outcomes, _retries_total() - retries_before, time.perf_counter() - started
+
+
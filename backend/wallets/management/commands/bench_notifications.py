@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from wallets.notifications import Notification
+from wallets.tasks import send_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Пропускная способность одного слота воркера: старая задача (time.sleep на каждое уведомление) "
+        "против пакетной асинхронной доставки send_notifications."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500, help="Сколько уведомлений доставить")
+        parser.add_argument("--latency", type=float, default=0.05, help="Задержка провайдера на одно уведомление, сек")
+        parser.add_argument("--batch-size", type=int, default=100, help="Размер пакета send_notifications")
+        parser.add_argument("--concurrency", type=int, default=100, help="Параллельных доставок внутри пакета")
+
+    def handle(self, *args, **opts):
+        count, latency = opts["count"], opts["latency"]
+        items = [
+            Notification(to_wallet_id=str(uuid.uuid4()), transaction_id=str(uuid.uuid4())).as_dict()
+            for _ in range(count)
+        ]
+
+        # Старая схема: одна задача на перевод, слот воркера спит всё время доставки.
+        started = time.perf_counter()
+        for _ in items:
+            time.sleep(latency)
+        before = count / (time.perf_counter() - started)
+
+        batch_size = opts["batch_size"]
+        with override_settings(
+            NOTIFICATION_LATENCY=latency,
+            NOTIFICATION_FAILURE_RATE=0.0,
+            NOTIFICATION_CONCURRENCY=opts["concurrency"],
+        ):
+            started = time.perf_counter()
+            for i in range(0, count, batch_size):
+                send_notifications.apply(kwargs={"items": items[i : i + batch_size]}).get()
+            after = count / (time.perf_counter() - started)
+
+        self.stdout.write(f"latency={latency}s count={count} batch_size={batch_size}")
+        self.stdout.write(f"before: {before:.1f} notifications/s per worker slot")
+        self.stdout.write(f"after:  {after:.1f} notifications/s per worker slot (x{after / before:.1f})")
+
+
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets import outbox
+from wallets.models import OutboxEvent
+from wallets.notifications import Notification
+
+
+class Command(BaseCommand):
+    help = "Пропускная способность outbox relay: сколько событий в секунду разбирает один процесс."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=20000, help="Сколько событий положить в outbox")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--publish",
+            choices=["noop", "celery"],
+            default="noop",
+            help="noop — только работа с БД; celery — реальная публикация в брокер",
+        )
+
+    def handle(self, *args, **opts):
+        # Бенчмарк сам разбирает outbox; чужие события с noop-публикацией были бы потеряны.
+        if OutboxEvent.objects.exists():
+            raise CommandError("outbox не пуст — запустите бенчмарк на пустой таблице")
+
+        n = opts["events"]
+        OutboxEvent.objects.bulk_create(
+            [
+                OutboxEvent(
+                    topic=outbox.TOPIC_NOTIFICATION,
+                    payload=Notification(to_wallet_id=str(uuid.uuid4()), transaction_id=str(uuid.uuid4())).as_dict(),
+                )
+                for _ in range(n)
+            ],
+            batch_size=5000,
+        )
+
+        publisher = outbox.publish if opts["publish"] == "celery" else (lambda events: None)
+        started = time.perf_counter()
+        published = 0
+        max_lag = 0.0
+        while True:
+            batch = outbox.relay_batch(opts["batch_size"], publisher=publisher)
+            if not batch.published:
+                break
+            published += batch.published
+            max_lag = max(max_lag, batch.max_lag_seconds)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"events={published} batch_size={opts['batch_size']} publish={opts['publish']}")
+        self.stdout.write(f"throughput: {published / elapsed:.0f} events/s, drained in {elapsed:.2f}s")
+        self.stdout.write(f"max relay lag: {max_lag:.3f}s")
+
+
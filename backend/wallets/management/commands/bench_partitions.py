@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from wallets import partitions, statements
+from wallets.models import Transaction
+
+
+_PLAIN = "bench_tx_plain"
+_PARTITIONED = "bench_tx_part"
+
+_COLUMNS = (
+    "id, from_wallet_id, to_wallet_id, fee_wallet_id, amount, fee, from_balance_after, to_balance_after, status, "
+    "created_at"
+)
+
+# Синтетический леджер, упорядоченный по времени, как настоящий: строка g получает created_at из [start, start + span).
+_FILL_SQL = f"""
+INSERT INTO {{table}} ({_COLUMNS})
+SELECT gen_random_uuid(), w.ids[1 + (g * 7919) %% w.n], w.ids[1 + (g * 104729 + 1) %% w.n], NULL, 10.00, 0.00,
+       NULL, NULL, 'SUCCESS', %(start)s + (g::float8 / %(rows)s) * %(span)s * interval '1 second'
+FROM generate_series(%(lo)s::bigint, %(hi)s - 1) AS g,
+     (SELECT %(ids)s::uuid[] AS ids, cardinality(%(ids)s::uuid[]) AS n) AS w
+"""
+
+_TAIL_SQL = f"""
+INSERT INTO {{table}} ({_COLUMNS})
+SELECT gen_random_uuid(), %(src)s, %(dst)s, NULL, 10.00, 0.00, NULL, NULL, 'SUCCESS', now()
+FROM generate_series(1, %(size)s)
+"""
+
+_MONTH_SQL = """
+SELECT id FROM {table} WHERE created_at >= %s AND created_at < %s ORDER BY created_at, id LIMIT 1000
+"""
+
+
+def _ms(samples: list[float]) -> str:
+    p99 = statistics.quantiles(samples, n=100)[98] if len(samples) > 1 else samples[0]
+    return f"p50={statistics.median(samples) * 1000:.2f}ms p99={p99 * 1000:.2f}ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Обычная и партиционированная по месяцам таблица леджера на одинаковых синтетических данных: скорость "
+        "наполнения и вставки в хвост, задержка выписки (первая и глубокая страница), выборки за месяц и VACUUM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2_000_000, help="Строк в каждой таблице (100M — полный прогон)")
+        parser.add_argument("--months", type=int, default=24, help="На сколько месяцев растянуть историю")
+        parser.add_argument("--wallets", type=int, default=20_000)
+        parser.add_argument("--chunk", type=int, default=1_000_000, help="Строк на один INSERT при наполнении")
+        parser.add_argument("--samples", type=int, default=200, help="Запросов на каждое измерение задержки")
+        parser.add_argument("--tail-batches", type=int, default=200, help="Транзакций по 100 строк в хвост таблицы")
+        parser.add_argument("--keep", action="store_true", help="Не удалять таблицы после прогона")
+
+    def handle(self, *args, **opts):
+        if opts["rows"] < 1 or opts["months"] < 1:
+            raise CommandError("--rows и --months должны быть >= 1")
+        rng = random.Random(42)
+        now = timezone.now()
+        first_month = partitions.add_months(partitions.month_start(now), -opts["months"] + 1)
+        span = (now - first_month).total_seconds()
+        wallet_ids = [str(w) for w in self._uuids(opts["wallets"])]
+
+        self._create_tables(first_month, partitions.add_months(partitions.month_start(now), 2))
+        try:
+            for table in (_PLAIN, _PARTITIONED):
+                self._report(table, self._run(table, opts, first_month, span, wallet_ids, rng))
+        finally:
+            if not opts["keep"]:
+                with connection.cursor() as cur:
+                    cur.execute(f"DROP TABLE IF EXISTS {_PLAIN}, {_PARTITIONED}")
+
+    def _uuids(self, n: int) -> list:
+        with connection.cursor() as cur:
+            cur.execute("SELECT gen_random_uuid() FROM generate_series(1, %s)", [n])
+            return [row[0] for row in cur.fetchall()]
+
+    def _create_tables(self, first_month, last_month) -> None:
+        source = Transaction._meta.db_table
+        with connection.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {_PLAIN}, {_PARTITIONED}")
+            # INCLUDING INDEXES копирует и первичный ключ (id, created_at), и индексы выписки/экспорта.
+            cur.execute(f"CREATE TABLE {_PLAIN} (LIKE {source} INCLUDING ALL)")
+            cur.execute(f"CREATE TABLE {_PARTITIONED} (LIKE {source} INCLUDING ALL) PARTITION BY RANGE (created_at)")
+            month = first_month
+            while month <= last_month:
+                cur.execute(
+                    f"CREATE TABLE {_PARTITIONED}_y{month.year:04d}m{month.month:02d} PARTITION OF {_PARTITIONED} "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    [month.isoformat(), partitions.add_months(month, 1).isoformat()],
+                )
+                month = partitions.add_months(month, 1)
+
+    def _run(self, table: str, opts, first_month, span: float, wallet_ids: list[str], rng) -> dict:
+        result = {}
+        rows, chunk = opts["rows"], opts["chunk"]
+        with connection.cursor() as cur:
+            started = time.perf_counter()
+            last_chunk = 0.0
+            for lo in range(0, rows, chunk):
+                hi = min(rows, lo + chunk)
+                chunk_started = time.perf_counter()
+                cur.execute(
+                    _FILL_SQL.format(table=table),
+                    {"start": first_month, "rows": rows, "span": span, "lo": lo, "hi": hi, "ids": wallet_ids},
+                )
+                last_chunk = (hi - lo) / (time.perf_counter() - chunk_started)
+                self.stdout.write(f"  {table}: {hi}/{rows}", ending="\r")
+            result["fill"] = rows / (time.perf_counter() - started)
+            result["fill_last_chunk"] = last_chunk
+            cur.execute(f"ANALYZE {table}")
+
+            # Вставки в хвост небольшими транзакциями, как flush переводов, — уже на полной таблице.
+            started = time.perf_counter()
+            for _ in range(opts["tail_batches"]):
+                src, dst = rng.sample(wallet_ids, 2)
+                cur.execute(_TAIL_SQL.format(table=table), {"src": src, "dst": dst, "size": 100})
+            result["tail"] = opts["tail_batches"] * 100 / (time.perf_counter() - started)
+
+            first_page, deep_page, month_scan = [], [], []
+            for _ in range(opts["samples"]):
+                wallet_id = rng.choice(wallet_ids)
+                params = [wallet_id, 51]
+                started = time.perf_counter()
+                cur.execute(statements._statement_sql(False, table), statements._statement_params(params, 51))
+                cur.fetchall()
+                first_page.append(time.perf_counter() - started)
+
+                at = first_month + timedelta(seconds=rng.uniform(0, span))
+                params = [wallet_id, at, at, uuid.UUID(int=0), 51]
+                started = time.perf_counter()
+                cur.execute(statements._statement_sql(True, table), statements._statement_params(params, 51))
+                cur.fetchall()
+                deep_page.append(time.perf_counter() - started)
+
+                month = partitions.add_months(first_month, rng.randrange(opts["months"]))
+                started = time.perf_counter()
+                cur.execute(_MONTH_SQL.format(table=table), [month, partitions.add_months(month, 1)])
+                cur.fetchall()
+                month_scan.append(time.perf_counter() - started)
+            result["first_page"], result["deep_page"], result["month_scan"] = first_page, deep_page, month_scan
+
+            # VACUUM: у обычной таблицы — вся таблица, у партиционированной — только текущий месяц, куда идут вставки.
+            target = table
+            if table == _PARTITIONED:
+                month = partitions.month_start(timezone.now())
+                target = f"{_PARTITIONED}_y{month.year:04d}m{month.month:02d}"
+            started = time.perf_counter()
+            cur.execute(f"VACUUM {target}")
+            result["vacuum"] = time.perf_counter() - started
+        return result
+
+    def _report(self, table: str, r: dict) -> None:
+        self.stdout.write(
+            f"{table:<15} fill={r['fill']:>9.0f} rows/s (последний пакет {r['fill_last_chunk']:.0f}/s) "
+            f"tail={r['tail']:>7.0f} rows/s vacuum={r['vacuum'] * 1000:.0f}ms"
+        )
+        self.stdout.write(f"{'':<15} statement first page {_ms(r['first_page'])}")
+        self.stdout.write(f"{'':<15} statement deep page  {_ms(r['deep_page'])}")
+        self.stdout.write(f"{'':<15} month range          {_ms(r['month_scan'])}")
+
+
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from wallets.models import Wallet
+from wallets.sequencer import Sequencer, TransferRequest
+from wallets.services import _ensure_admin_wallet, transfer
+
+
+_OWNER_PREFIX = "bench-sequencer-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Один «горячий» кошелёк-отправитель: переводы через Postgres (FOR UPDATE, N потоков) против sequencer "
+        "в памяти с WAL (fsync на пакет) и пакетным flush."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transfers", type=int, default=20000, help="Переводов через sequencer")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--flush-every", type=int, default=10, help="flush после каждых N пакетов")
+        parser.add_argument("--threads", type=int, default=8, help="Потоков для пути через Postgres")
+        parser.add_argument("--db-duration", type=float, default=5.0, help="Длительность пути через Postgres, сек")
+
+    def handle(self, *args, **opts):
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        _ensure_admin_wallet(currency)
+        hot, *targets = [
+            Wallet.objects.get_or_create(owner_name=f"{_OWNER_PREFIX}{i}", currency=currency, shard=0)[0]
+            for i in range(9)
+        ]
+        Wallet.objects.filter(pk=hot.pk).update(balance=Decimal("1000000000.00"))
+        target_ids = [str(w.id) for w in targets]
+
+        db_rate = self._db_path(str(hot.id), target_ids, opts["threads"], opts["db_duration"])
+        self.stdout.write(f"postgres  ({opts['threads']} потоков): {db_rate:>9.0f} transfers/s")
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SEQUENCER_WALLETS=[]):
+            seq = Sequencer.open([str(hot.id)], os.path.join(tmp, "bench.wal"), name="bench")
+            n, batch_size = opts["transfers"], opts["batch_size"]
+            started = time.perf_counter()
+            for batch_no, offset in enumerate(range(0, n, batch_size), 1):
+                seq.submit(
+                    [
+                        TransferRequest(str(hot.id), target_ids[i % len(target_ids)], Decimal("1.00"))
+                        for i in range(offset, min(n, offset + batch_size))
+                    ]
+                )
+                if batch_no % opts["flush_every"] == 0:
+                    seq.flush()
+            seq.flush()
+            elapsed = time.perf_counter() - started
+            seq.close()
+        self.stdout.write(f"sequencer (batch {batch_size}):   {n / elapsed:>9.0f} transfers/s")
+
+    def _db_path(self, hot_id: str, target_ids: list[str], threads: int, duration: float) -> float:
+        done = [0] * threads
+        deadline = time.perf_counter() + duration
+
+        def worker(slot: int) -> None:
+            try:
+                i = slot
+                while time.perf_counter() < deadline:
+                    dst = target_ids[i % len(target_ids)]
+                    transfer(from_wallet_id=hot_id, to_wallet_id=dst, amount=Decimal("1.00"))
+                    done[slot] += 1
+                    i += threads
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return sum(done) / duration
+
+
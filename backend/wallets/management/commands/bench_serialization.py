@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from wallets import fastpath
+from wallets.models import Transaction, Wallet
+from wallets.serializers import TransferRequestSerializer
+from wallets.services import TransferResult
+from wallets.views import TransferAPIView, _transfer_response_data
+
+
+class Command(BaseCommand):
+    help = (
+        "HTTP-слой POST /api/transfer на одном ядре: разбор JSON, валидация, рендер ответа и весь view целиком "
+        "(сервис подменён готовым результатом) — DRF против быстрого пути TRANSFER_FAST_PATH."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ops", type=int, default=50_000, help="Операций на стадию")
+
+    def handle(self, *args, **opts):
+        ops = opts["ops"]
+        if ops < 1:
+            raise CommandError("--ops должен быть >= 1")
+
+        wallets = [Wallet(id=uuid.uuid4(), balance=Decimal(balance)) for balance in ("8350.00", "1500.00", "150.00")]
+        result = TransferResult(
+            transaction=Transaction(id=uuid.uuid4()),
+            from_wallet=wallets[0],
+            to_wallet=wallets[1],
+            admin_wallet=wallets[2],
+            amount=Decimal("1500.00"),
+            fee=Decimal("150.00"),
+            total_debited=Decimal("1650.00"),
+            admin_balance=Decimal("150.00"),
+        )
+        payload = {"from_wallet_id": str(wallets[0].id), "to_wallet_id": str(wallets[1].id), "amount": "1500.00"}
+        body = json.dumps(payload).encode()
+        response = _transfer_response_data(result)
+        factory = APIRequestFactory()
+        view = TransferAPIView.as_view()
+        if fastpath.orjson is None:
+            self.stdout.write("orjson не установлен: разбор и рендер идут через json, быстрой остаётся валидация")
+
+        def validate_drf() -> None:
+            serializer = TransferRequestSerializer(data=payload)
+            serializer.is_valid(raise_exception=True)
+
+        def request() -> bytes:
+            r = view(factory.post("/api/transfer/", body, content_type="application/json"))
+            if r.status_code != 200:
+                raise CommandError(f"view ответил {r.status_code}: {r.rendered_content!r}")
+            return r.rendered_content
+
+        def run(label: str, step) -> float:
+            started = time.perf_counter_ns()
+            for _ in range(ops):
+                step()
+            per_op = (time.perf_counter_ns() - started) / ops
+            self.stdout.write(f"{label:<28} {per_op / 1000:8.1f} µs/op  ({1e9 / per_op:,.0f} ops/s)")
+            return per_op
+
+        self.stdout.write(f"ops={ops}")
+        # Подменяем только сервис: в замер попадают парсер, валидация, метрики стадий, Response и рендер.
+        with mock.patch("wallets.views.transfer", return_value=result):
+            with override_settings(TRANSFER_FAST_PATH=False):
+                baseline = request()
+                run("parse (JSONParser)", lambda: JSONParser().parse(io.BytesIO(body)))
+                run("validate (serializer)", validate_drf)
+                run("render (JSONRenderer)", lambda: JSONRenderer().render(response))
+                drf = run("view (DRF)", request)
+            with override_settings(TRANSFER_FAST_PATH=True):
+                if request() != baseline:
+                    raise CommandError("тела ответов DRF и быстрого пути различаются")
+                run("parse (FastJSONParser)", lambda: fastpath.FastJSONParser().parse(io.BytesIO(body)))
+                run("validate (fastpath)", lambda: fastpath.transfer_request(payload))
+                run("render (fastpath)", lambda: fastpath.render(response))
+                fast = run("view (TRANSFER_FAST_PATH)", request)
+
+        self.stdout.write(f"view: {1e9 / drf:,.0f} -> {1e9 / fast:,.0f} req/s на ядро (x{drf / fast:.2f})")
+
+
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+
+# uuid7 на стороне БД (в Postgres 16 своей функции нет): unix-время в мс поверх первых 6 байт gen_random_uuid(),
+# биты версии 0100 -> 0111. Внутри одной миллисекунды порядок случайный — для индекса это несущественно.
+_UUID7_FUNCTION = """
+CREATE OR REPLACE FUNCTION pg_temp.bench_uuid7() RETURNS uuid AS $$
+    SELECT encode(
+        set_bit(set_bit(
+            overlay(uuid_send(gen_random_uuid())
+                    PLACING substring(int8send((extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                    FROM 1 FOR 6),
+            52, 1), 53, 1),
+        'hex')::uuid
+$$ LANGUAGE sql VOLATILE
+"""
+
+_GENERATORS = {
+    "uuid4": "gen_random_uuid()",
+    "uuid7": "pg_temp.bench_uuid7()",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Вставка в таблицу с первичным ключом uuid4 и uuid7: строки/с, WAL на строку (full-page writes), "
+        "размер индекса первичного ключа и доля попаданий его страниц в shared buffers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+        parser.add_argument("--batch", type=int, default=10_000, help="Строк на одну транзакцию INSERT")
+        parser.add_argument("--keep", action="store_true", help="Не удалять таблицы после прогона")
+
+    def handle(self, *args, **opts):
+        if opts["rows"] < 1 or opts["batch"] < 1:
+            raise CommandError("--rows и --batch должны быть >= 1")
+        with connection.cursor() as cur:
+            cur.execute(_UUID7_FUNCTION)
+            cur.execute("SHOW shared_buffers")
+            self.stdout.write(f"rows={opts['rows']} batch={opts['batch']} shared_buffers={cur.fetchone()[0]}")
+        try:
+            for version, generator in _GENERATORS.items():
+                self._run(f"bench_pk_{version}", generator, opts["rows"], opts["batch"])
+        finally:
+            if not opts["keep"]:
+                with connection.cursor() as cur:
+                    cur.execute(f"DROP TABLE IF EXISTS {', '.join(f'bench_pk_{v}' for v in _GENERATORS)}")
+
+    def _run(self, table: str, generator: str, rows: int, batch: int) -> None:
+        with connection.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+            cur.execute(
+                f"CREATE TABLE {table} (id uuid PRIMARY KEY, created_at timestamptz NOT NULL DEFAULT now(), "
+                "amount numeric(18, 2) NOT NULL)"
+            )
+            try:
+                # Одинаковая стартовая точка: после checkpoint первая запись в каждую страницу пишет её в WAL целиком.
+                cur.execute("CHECKPOINT")
+            except DatabaseError:
+                self.stdout.write("  CHECKPOINT недоступен (нужна роль pg_checkpoint) — WAL сравнивается как есть")
+            cur.execute("SELECT pg_current_wal_lsn()")
+            wal_start = cur.fetchone()[0]
+
+            insert = f"INSERT INTO {table} (id, amount) SELECT {generator}, 10.00 FROM generate_series(1, %s)"
+            started = time.perf_counter()
+            tail_from, tail_started = None, started
+            for lo in range(0, rows, batch):
+                if tail_from is None and lo >= rows * 0.9:
+                    # Скорость на последних 10% — когда индекс уже не помещается в shared buffers.
+                    tail_from, tail_started = lo, time.perf_counter()
+                size = min(batch, rows - lo)
+                cur.execute(insert, [size])
+                self.stdout.write(f"  {table}: {lo + size}/{rows}", ending="\r")
+            elapsed = time.perf_counter() - started
+            tail_elapsed = time.perf_counter() - tail_started
+
+            cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", [wal_start])
+            wal_bytes = float(cur.fetchone()[0])
+            cur.execute("SELECT pg_stat_force_next_flush()")
+            cur.execute(
+                "SELECT pg_relation_size(indexrelid), idx_blks_hit, idx_blks_read FROM pg_statio_user_indexes "
+                "WHERE relname = %s",
+                [table],
+            )
+            index_size, hits, reads = cur.fetchone()
+
+        hit_rate = hits / (hits + reads) if hits + reads else 1.0
+        tail_rate = (rows - (tail_from or 0)) / tail_elapsed
+        self.stdout.write(
+            f"{table:<14} {rows / elapsed:>9.0f} rows/s (последние 10%: {tail_rate:.0f}/s) "
+            f"WAL={wal_bytes / rows:.0f} B/row pk_index={index_size / 2**20:.0f} MiB hit_rate={hit_rate:.4f}"
+        )
+
+
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from decimal import Decimal
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wallets.bench import percentile
+from wallets.models import Wallet
+from wallets.services import admin_wallet_balance
+
+
+class Command(BaseCommand):
+    help = (
+        "Сценарий demo_race_condition (N параллельных списаний с одного кошелька), "
+        "запущенный против sync (WSGI) и async (ASGI) endpoint'ов перевода."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync-url", default="http://localhost:8000/api/transfer", help="URL sync endpoint")
+        parser.add_argument(
+            "--async-url", default="http://localhost:8001/api/transfer/async", help="URL async endpoint"
+        )
+        parser.add_argument("--clients", type=int, default=1000, help="Количество параллельных клиентов")
+        parser.add_argument("--amount", default="20.00", help="Сумма одного списания")
+        parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут одного запроса, сек")
+        parser.add_argument("--only", choices=["sync", "async"], help="Прогнать только один endpoint")
+
+    def _reset_wallets(self, n: int, amount: Decimal) -> tuple[Wallet, Wallet]:
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        a, _ = Wallet.objects.get_or_create(owner_name="A", currency=currency, defaults={"balance": Decimal("0.00")})
+        b, _ = Wallet.objects.get_or_create(owner_name="B", currency=currency, defaults={"balance": Decimal("0.00")})
+        Wallet.objects.get_or_create(
+            owner_name=admin_owner, currency=currency, shard=0, defaults={"balance": Decimal("0.00")}
+        )
+
+        # Как в demo_race_condition: денег ровно на половину запросов.
+        Wallet.objects.filter(id=a.id).update(balance=amount * (n // 2))
+        Wallet.objects.filter(id=b.id).update(balance=Decimal("0.00"))
+        Wallet.objects.filter(owner_name=admin_owner, currency=currency).update(balance=Decimal("0.00"))
+        return a, b
+
+    async def _fire(self, url: str, payload: dict, n: int, timeout: float):
+        limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+        start = asyncio.Event()
+
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+
+            async def one():
+                await start.wait()
+                started = time.perf_counter()
+                try:
+                    r = await client.post(url, json=payload)
+                    return r.status_code, time.perf_counter() - started
+                except httpx.HTTPError as e:
+                    return type(e).__name__, time.perf_counter() - started
+
+            tasks = [asyncio.create_task(one()) for _ in range(n)]
+            await asyncio.sleep(0)
+            began = time.perf_counter()
+            start.set()
+            results = await asyncio.gather(*tasks)
+            return results, time.perf_counter() - began
+
+    def _run(self, name: str, url: str, n: int, amount: Decimal, timeout: float) -> None:
+        a, b = self._reset_wallets(n, amount)
+        payload = {"from_wallet_id": str(a.id), "to_wallet_id": str(b.id), "amount": f"{amount:.2f}"}
+
+        self.stdout.write(f"[{name}] {n} параллельных запросов по {payload['amount']} на {url} ...")
+        results, elapsed = asyncio.run(self._fire(url, payload, n, timeout))
+
+        statuses = Counter(status for status, _ in results)
+        latencies = [latency * 1000 for _, latency in results]
+        a.refresh_from_db()
+        b.refresh_from_db()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"[{name}] время={elapsed:.2f}s rps={n / elapsed:.1f} "
+                f"p50={percentile(latencies, 50):.0f}ms p95={percentile(latencies, 95):.0f}ms "
+                f"p99={percentile(latencies, 99):.0f}ms max={max(latencies):.0f}ms"
+            )
+        )
+        self.stdout.write(f"[{name}] статусы: {dict(statuses)}")
+        self.stdout.write(
+            f"[{name}] A={a.balance} (должно быть >= 0.00) B={b.balance} "
+            f"admin={admin_wallet_balance(a.currency)} успехов ожидалось {n // 2}"
+        )
+
+    def handle(self, *args, **options):
+        n = int(options["clients"])
+        amount = Decimal(str(options["amount"]))
+        timeout = float(options["timeout"])
+
+        if options["only"] in (None, "sync"):
+            self._run("sync", options["sync_url"], n, amount, timeout)
+        if options["only"] in (None, "async"):
+            self._run("async", options["async_url"], n, amount, timeout)
+
+
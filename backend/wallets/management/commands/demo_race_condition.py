@@ -10,6 +10,7 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from wallets.models import Wallet
+from wallets.services import admin_wallet_balance
 
 
 class Command(BaseCommand):
@@ -30,11 +31,13 @@ class Command(BaseCommand):
 
         a, _ = Wallet.objects.get_or_create(owner_name="A", currency=currency, defaults={"balance": Decimal("0.00")})
         b, _ = Wallet.objects.get_or_create(owner_name="B", currency=currency, defaults={"balance": Decimal("0.00")})
-        admin, _ = Wallet.objects.get_or_create(owner_name=admin_owner, currency=currency, defaults={"balance": Decimal("0.00")})
+        admin, _ = Wallet.objects.get_or_create(
+            owner_name=admin_owner, currency=currency, shard=0, defaults={"balance": Decimal("0.00")}
+        )
 
         Wallet.objects.filter(id=a.id).update(balance=Decimal("100.00"))
         Wallet.objects.filter(id=b.id).update(balance=Decimal("0.00"))
-        Wallet.objects.filter(id=admin.id).update(balance=Decimal("0.00"))
+        Wallet.objects.filter(owner_name=admin_owner, currency=currency).update(balance=Decimal("0.00"))
 
         a.refresh_from_db()
         b.refresh_from_db()
@@ -92,6 +95,6 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f"Итог: success={ok}, failed={fail}"))
         self.stdout.write(self.style.SUCCESS(f"Final A balance={a.balance} (должно быть >= 0.00)"))
         self.stdout.write(self.style.SUCCESS(f"Final B balance={b.balance}"))
-        self.stdout.write(self.style.SUCCESS(f"Final admin balance={admin.balance}"))
+        self.stdout.write(self.style.SUCCESS(f"Final admin balance={admin_wallet_balance(currency)}"))
 
 
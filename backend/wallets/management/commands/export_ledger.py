@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+
+from wallets.models import Transaction
+from wallets.statements import InvalidCursor, decode_cursor, encode_cursor
+
+
+FIELDS = [f.attname for f in Transaction._meta.concrete_fields]
+
+
+def _parse_bound(value: str) -> datetime:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Некорректная дата: {value}")
+        parsed = datetime.combine(day, dt_time.min)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+class _CsvFormat:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self) -> str:
+        self.writer.writerow(FIELDS)
+        return self._take()
+
+    def encode(self, rows) -> str:
+        self.writer.writerows([["" if v is None else _plain(v) for v in row] for row in rows])
+        return self._take()
+
+    def _take(self) -> str:
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+
+class _JsonlFormat:
+    def header(self) -> str:
+        return ""
+
+    def encode(self, rows) -> str:
+        return "".join(json.dumps(dict(zip(FIELDS, map(_plain, row))), ensure_ascii=False) + "\n" for row in rows)
+
+
+class _StdoutWriter:
+    def __init__(self, fmt):
+        self.format = fmt
+        self.stream = open(sys.stdout.fileno(), "w", encoding="utf-8", newline="", closefd=False)
+        self.stream.write(fmt.header())
+
+    def write(self, rows) -> None:
+        self.stream.write(self.format.encode(rows))
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+class _FileWriter:
+    # Чанк дописывается целиком (для gzip — отдельным member) и сбрасывается на диск до сохранения cursor;
+    # write() возвращает смещение конца чанка. При --resume файл обрезается по сохранённому смещению,
+    # так что недописанный или не зафиксированный в cursor хвост пропадает и каждая строка попадает в файл ровно раз.
+    def __init__(self, path: str, fmt, *, use_gzip: bool, offset: int | None):
+        self.format = fmt
+        self.use_gzip = use_gzip
+        if offset is None:
+            self.file = open(path, "wb")
+            self._append(fmt.header())
+        else:
+            self.file = open(path, "r+b")
+            size = self.file.seek(0, os.SEEK_END)
+            if size < offset:
+                self.file.close()
+                raise CommandError(f"{path} короче сохранённого смещения ({size} < {offset}): файл не от этой выгрузки")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+
+    def write(self, rows) -> int:
+        return self._append(self.format.encode(rows))
+
+    def _append(self, text: str) -> int:
+        if text:
+            data = text.encode("utf-8")
+            self.file.write(gzip.compress(data) if self.use_gzip else data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path: str, *, compression: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise CommandError("Для --format parquet нужен pyarrow (pip install pyarrow)") from e
+
+        self.pa = pa
+        decimal = pa.decimal128(18, 2)
+        types = {
+            "created_at": pa.timestamp("us", tz="UTC"),
+            "amount": decimal,
+            "fee": decimal,
+            "to_amount": decimal,
+            "fx_rate": pa.decimal128(24, 12),
+            "from_balance_after": decimal,
+            "to_balance_after": decimal,
+        }
+        self.schema = pa.schema([(name, types.get(name, pa.string())) for name in FIELDS])
+        # Каждый чанк — отдельная row group, в памяти держится только текущий чанк.
+        self.writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, rows) -> None:
+        columns = list(zip(*rows))
+        arrays = []
+        for field, values in zip(self.schema, columns):
+            if self.pa.types.is_string(field.type):
+                values = [None if v is None else str(v) for v in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковая выгрузка леджера (Transaction) в CSV/JSONL/Parquet через server-side cursor. "
+        "Память не зависит от объёма выгрузки; выгрузку можно продолжить с cursor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Файл выгрузки; '-' — stdout (без сжатия)")
+        parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], default="csv")
+        parser.add_argument(
+            "--compress",
+            choices=["auto", "gzip", "none"],
+            default="auto",
+            help="Сжатие csv/jsonl; auto — gzip, если имя файла оканчивается на .gz",
+        )
+        parser.add_argument("--since", help="created_at >= (ISO дата или datetime, по умолчанию UTC)")
+        parser.add_argument("--until", help="created_at < (ISO дата или datetime, по умолчанию UTC)")
+        parser.add_argument(
+            "--wallet",
+            action="append",
+            default=[],
+            help="Только операции, где кошелёк — отправитель или получатель (можно повторять)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Размер чанка server-side cursor")
+        parser.add_argument("--after", help="Продолжить после указанного cursor")
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Продолжить с cursor из <output>.cursor и дописывать в существующий файл",
+        )
+
+    def handle(self, *args, **opts):
+        output = opts["output"]
+        fmt = opts["format"]
+        chunk_size = opts["chunk_size"]
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size должен быть > 0")
+
+        state_path = None if output == "-" else f"{output}.cursor"
+        after = opts["after"]
+        offset = None
+        if opts["resume"]:
+            if state_path is None:
+                raise CommandError("--resume недоступен для stdout")
+            if fmt == "parquet":
+                raise CommandError("--resume не поддерживается для parquet: используйте --after и новый файл")
+            if os.path.exists(state_path):
+                after, offset = self._read_state(state_path)
+
+        qs = Transaction.objects.all()
+        if opts["since"]:
+            qs = qs.filter(created_at__gte=_parse_bound(opts["since"]))
+        if opts["until"]:
+            qs = qs.filter(created_at__lt=_parse_bound(opts["until"]))
+        if opts["wallet"]:
+            qs = qs.filter(Q(from_wallet_id__in=opts["wallet"]) | Q(to_wallet_id__in=opts["wallet"]))
+        if after:
+            try:
+                created_at, last_id = decode_cursor(after)
+            except InvalidCursor as e:
+                raise CommandError(str(e)) from e
+            # created_at__gte дублирует условие ради range scan по индексу (created_at, id).
+            qs = qs.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=last_id)
+            )
+
+        writer = self._open_writer(output, fmt, opts["compress"], offset=offset)
+
+        created_idx, id_idx = FIELDS.index("created_at"), FIELDS.index("id")
+        rows = qs.order_by("created_at", "id").values_list(*FIELDS).iterator(chunk_size=chunk_size)
+        total = 0
+        cursor = after
+        chunk: list[tuple] = []
+        try:
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    cursor = self._flush(writer, chunk, state_path, created_idx, id_idx)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                cursor = self._flush(writer, chunk, state_path, created_idx, id_idx)
+                total += len(chunk)
+        finally:
+            writer.close()
+
+        self.stderr.write(f"exported={total} cursor={cursor or ''}")
+
+    def _open_writer(self, output: str, fmt: str, compress: str, *, offset: int | None):
+        if fmt == "parquet":
+            if output == "-":
+                raise CommandError("parquet нельзя писать в stdout")
+            return _ParquetWriter(output, compression="zstd" if compress != "none" else "none")
+
+        text_format = _CsvFormat() if fmt == "csv" else _JsonlFormat()
+        if output == "-":
+            return _StdoutWriter(text_format)
+        use_gzip = compress == "gzip" or (compress == "auto" and output.endswith(".gz"))
+        return _FileWriter(output, text_format, use_gzip=use_gzip, offset=offset)
+
+    def _read_state(self, state_path: str) -> tuple[str | None, int | None]:
+        with open(state_path, encoding="utf-8") as f:
+            raw = f.read().strip()
+        try:
+            state = json.loads(raw)
+            return state["cursor"], state["offset"]
+        except (ValueError, TypeError, KeyError) as e:
+            raise CommandError(f"{state_path}: нет смещения в файле — продолжите с --after и новым файлом") from e
+
+    def _flush(self, writer, chunk, state_path, created_idx: int, id_idx: int) -> str:
+        offset = writer.write(chunk)
+
+        last = chunk[-1]
+        cursor = encode_cursor(last[created_idx], last[id_idx])
+        if state_path is not None:
+            # Cursor и смещение фиксируются вместе и только после того, как чанк на диске.
+            tmp = f"{state_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"cursor": cursor, "offset": offset}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, state_path)
+        return cursor
+
+
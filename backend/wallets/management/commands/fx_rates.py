@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets import fx
+
+
+def _parse_pair(value: str) -> tuple[tuple[str, str], Decimal]:
+    try:
+        pair, rate = value.split("=", 1)
+        base, quote = pair.split(":", 1)
+        return (base.strip(), quote.strip()), Decimal(rate)
+    except (ValueError, InvalidOperation) as e:
+        raise CommandError(f"Ожидается BASE:QUOTE=RATE, получено {value!r}") from e
+
+
+class Command(BaseCommand):
+    help = (
+        "Курсы валют для межвалютных переводов: опубликовать новую версию (--set BASE:QUOTE=RATE, пары, "
+        "не указанные явно, переносятся из текущей версии) или показать текущую (--list)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--set", action="append", default=[], metavar="BASE:QUOTE=RATE", help="Можно повторять")
+        parser.add_argument("--source", default="manual", help="Источник курсов, сохраняется в версии")
+        parser.add_argument("--replace", action="store_true", help="Новая версия содержит только пары из --set")
+        parser.add_argument("--list", action="store_true", help="Показать текущую версию")
+
+    def handle(self, *args, **opts):
+        if opts["set"]:
+            rates = dict(_parse_pair(value) for value in opts["set"])
+            try:
+                rate_set = fx.publish(rates, source=opts["source"], replace_all=opts["replace"])
+            except ValueError as e:
+                raise CommandError(str(e)) from e
+            self.stdout.write(f"published version {rate_set.id}: {len(rates)} pairs from {rate_set.source}")
+        elif not opts["list"]:
+            raise CommandError("Укажите --set или --list")
+
+        if opts["list"]:
+            table = fx.current()
+            published = "-" if table.published_at is None else table.published_at.isoformat()
+            self.stdout.write(f"version {table.version}, published {published}")
+            for (base, quote), rate in sorted(table.rates.items()):
+                self.stdout.write(f"{base}/{quote} {rate.normalize():f}")
+
+
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from prometheus_client.parser import text_string_to_metric_families
+
+from wallets.bench import Sampler, latency_summary
+from wallets.models import Wallet
+from wallets.retry import DEADLOCK_DETECTED, RETRYABLE_SQLSTATES, SERIALIZATION_FAILURE
+from wallets.services import _ensure_admin_wallet
+
+
+_OWNER_PREFIX = "loadtest-"
+
+_DB_COUNTERS_SQL = """
+SELECT deadlocks, xact_commit, xact_rollback
+FROM pg_stat_database
+WHERE datname = current_database()
+"""
+
+_LOCK_WAITERS_SQL = """
+SELECT count(*) FILTER (WHERE wait_event_type = 'Lock'), count(*) FILTER (WHERE backend_type = 'client backend')
+FROM pg_stat_activity
+WHERE datname = current_database()
+"""
+
+# Метрики для --compare: (путь в JSON, True если «больше — хуже»).
+_COMPARED = [
+    (("throughput_rps",), False),
+    (("latency_ms", "p50"), True),
+    (("latency_ms", "p95"), True),
+    (("latency_ms", "p99"), True),
+    (("ok_rps",), False),
+    (("conflict_rate",), True),
+    (("db", "lock_wait_seconds"), True),
+    (("db", "deadlocks"), True),
+    (("db", "retries", SERIALIZATION_FAILURE), True),
+    (("db", "retries", DEADLOCK_DETECTED), True),
+]
+
+
+def _db_counters() -> dict[str, int]:
+    with connection.cursor() as cur:
+        # Снимок статистики кэшируется до конца транзакции — сбрасываем, чтобы увидеть свежие значения.
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+        cur.execute(_DB_COUNTERS_SQL)
+        deadlocks, commits, rollbacks = cur.fetchone()
+    return {"deadlocks": deadlocks, "commits": commits, "rollbacks": rollbacks}
+
+
+def _metrics_url(url: str) -> str:
+    parsed = httpx.URL(url)
+    return str(parsed.copy_with(path="/metrics", query=None))
+
+
+def _retry_counts(url: str, timeout: float) -> dict[str, float] | None:
+    # Повторы после 40001/40P01 видит только сервер: читаем его счётчик wallet_transfer_retries_total.
+    # Пути (sync, async, batch…) суммируются; при нескольких воркерах /metrics уже агрегирует процессы.
+    try:
+        response = httpx.get(url, timeout=timeout)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    counts = dict.fromkeys(sorted(RETRYABLE_SQLSTATES), 0.0)
+    for family in text_string_to_metric_families(response.text):
+        if family.name != "wallet_transfer_retries":
+            continue
+        for sample in family.samples:
+            if sample.name == "wallet_transfer_retries_total":
+                sqlstate = sample.labels["sqlstate"]
+                counts[sqlstate] = counts.get(sqlstate, 0.0) + sample.value
+    return counts
+
+
+class _LockWaitSampler(threading.Thread):
+    # Раз в interval считаем бэкенды, ждущие heavyweight lock; сумма * interval ≈ суммарное время ожидания.
+    # Заодно — пик клиентских соединений с базой: соединение на поток против пула видно по нему сразу.
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.wait_seconds = 0.0
+        self.max_waiters = 0
+        self.max_backends = 0
+        self.samples = 0
+
+    def run(self) -> None:
+        try:
+            with connection.cursor() as cur:
+                while not self.stopped.wait(self.interval):
+                    cur.execute(_LOCK_WAITERS_SQL)
+                    waiters, backends = cur.fetchone()
+                    self.samples += 1
+                    self.max_waiters = max(self.max_waiters, waiters)
+                    self.max_backends = max(self.max_backends, backends)
+                    self.wait_seconds += waiters * self.interval
+        finally:
+            connection.close()
+
+
+def _get(data: dict, path: tuple[str, ...]):
+    for key in path:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест перевода: open-loop (Пуассон) поток запросов по набору кошельков с равномерным "
+        "или Zipf-распределением. Отчёт p50/p95/p99, throughput, доля 409, deadlocks и время ожидания блокировок; "
+        "результат сохраняется в JSON и сравнивается с базовым прогоном."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000/api/transfer", help="Endpoint перевода")
+        parser.add_argument(
+            "--metrics-url",
+            default=None,
+            help="/metrics сервера для счётчика повторов (по умолчанию — тот же хост, что у --url)",
+        )
+        parser.add_argument("--wallets", type=int, default=1000, help="Сколько кошельков участвует")
+        parser.add_argument("--initial-balance", default="1000000.00", help="Баланс кошельков перед прогоном")
+        parser.add_argument("--skew", choices=["uniform", "zipf"], default="uniform")
+        parser.add_argument("--zipf-s", type=float, default=1.1, help="Параметр s распределения Zipf")
+        parser.add_argument("--fee-ratio", type=float, default=0.0, help="Доля переводов с комиссией (amount > 1000)")
+        parser.add_argument("--rate", type=float, default=200.0, help="Целевая частота запросов, req/s")
+        parser.add_argument("--duration", type=float, default=30.0, help="Длительность, сек")
+        parser.add_argument("--max-in-flight", type=int, default=1000, help="Предел одновременных запросов клиента")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--lock-sample-interval", type=float, default=0.1)
+        parser.add_argument("--no-reset", action="store_true", help="Не сбрасывать балансы кошельков")
+        parser.add_argument("--label", default="", help="Метка прогона в отчёте, например профиль сервера")
+        parser.add_argument("--output", help="Куда сохранить JSON с результатом")
+        parser.add_argument("--compare", help="JSON базового прогона для сравнения")
+        parser.add_argument(
+            "--fail-on-regression",
+            type=float,
+            default=None,
+            metavar="PCT",
+            help="Завершиться с ошибкой, если метрика ухудшилась больше чем на PCT процентов",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["wallets"] < 2:
+            raise CommandError("--wallets должен быть >= 2")
+        if opts["rate"] <= 0 or opts["duration"] <= 0:
+            raise CommandError("--rate и --duration должны быть > 0")
+
+        wallet_ids = self._prepare_wallets(opts["wallets"], Decimal(opts["initial_balance"]), reset=not opts["no_reset"])
+        rng = random.Random(opts["seed"])
+        sampler = Sampler(len(wallet_ids), skew=opts["skew"], zipf_s=opts["zipf_s"], rng=rng)
+
+        metrics_url = opts["metrics_url"] or _metrics_url(opts["url"])
+        retries_before = _retry_counts(metrics_url, opts["timeout"])
+        before = _db_counters()
+        lock_sampler = _LockWaitSampler(opts["lock_sample_interval"])
+        lock_sampler.start()
+        started_at = timezone.now()
+        run = asyncio.run(self._run(opts, wallet_ids, sampler, rng))
+        lock_sampler.stopped.set()
+        lock_sampler.join()
+        # pg_stat_database обновляется бэкендами с задержкой до ~1 с.
+        time.sleep(1.0)
+        after = _db_counters()
+        retries_after = _retry_counts(metrics_url, opts["timeout"]) if retries_before is not None else None
+        if retries_after is None:
+            # Сервер без /metrics (METRICS_ENABLED=0) или недоступен: повторы в отчёте — null.
+            self.stderr.write(f"счётчик повторов недоступен: {metrics_url}")
+            retries = None
+        else:
+            retries = {
+                sqlstate: int(retries_after[sqlstate] - retries_before.get(sqlstate, 0.0))
+                for sqlstate in sorted(retries_after)
+            }
+
+        statuses: Counter = run["statuses"]
+        completed = sum(statuses.values())
+        result = {
+            "started_at": started_at.isoformat(),
+            "config": {
+                key: opts[key]
+                for key in (
+                    "label", "url", "wallets", "skew", "zipf_s", "fee_ratio",
+                    "rate", "duration", "max_in_flight", "seed",
+                )
+            },
+            "requests": run["scheduled"],
+            "completed": completed,
+            "dropped": run["dropped"],
+            "throughput_rps": round(completed / run["elapsed"], 2),
+            "ok_rps": round(statuses.get("200", 0) / run["elapsed"], 2),
+            "latency_ms": latency_summary(run["latencies"]),
+            "service_time_ms": latency_summary(run["service_times"]),
+            "status_counts": dict(sorted(statuses.items())),
+            "conflict_rate": round(statuses.get("409", 0) / completed, 4) if completed else 0.0,
+            "db": {
+                "deadlocks": after["deadlocks"] - before["deadlocks"],
+                "retries": retries,
+                "rollbacks": after["rollbacks"] - before["rollbacks"],
+                "commits": after["commits"] - before["commits"],
+                "lock_wait_seconds": round(lock_sampler.wait_seconds, 3),
+                "max_lock_waiters": lock_sampler.max_waiters,
+                "max_backends": lock_sampler.max_backends,
+            },
+        }
+
+        self._print(result)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"результат сохранён в {opts['output']}")
+        if opts["compare"]:
+            self._compare(result, opts["compare"], opts["fail_on_regression"])
+
+    def _prepare_wallets(self, n: int, balance: Decimal, *, reset: bool) -> list[str]:
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        _ensure_admin_wallet(currency)
+        Wallet.objects.bulk_create(
+            [Wallet(owner_name=f"{_OWNER_PREFIX}{i:06d}", currency=currency, balance=balance) for i in range(n)],
+            ignore_conflicts=True,
+            batch_size=5000,
+        )
+        wallets = Wallet.objects.filter(
+            owner_name__in=[f"{_OWNER_PREFIX}{i:06d}" for i in range(n)], currency=currency, shard=0
+        )
+        if reset:
+            wallets.update(balance=balance, version=F("version") + 1)
+        # Порядок по имени: индекс 0 — всегда один и тот же «горячий» кошелёк для Zipf.
+        return [str(wallet_id) for wallet_id in wallets.order_by("owner_name").values_list("id", flat=True)]
+
+    def _amount(self, rng: random.Random, fee_ratio: float) -> str:
+        if rng.random() < fee_ratio:
+            return f"{rng.uniform(1000.01, 2000):.2f}"
+        return f"{rng.uniform(1, 100):.2f}"
+
+    async def _run(self, opts, wallet_ids: list[str], sampler: Sampler, rng: random.Random) -> dict:
+        max_in_flight = opts["max_in_flight"]
+        limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+        statuses: Counter = Counter()
+        latencies: list[float] = []
+        service_times: list[float] = []
+        in_flight = 0
+        dropped = 0
+        scheduled = 0
+        loop = asyncio.get_running_loop()
+
+        async def one(client: httpx.AsyncClient, due: float, payload: dict) -> None:
+            nonlocal in_flight
+            sent = loop.time()
+            try:
+                r = await client.post(opts["url"], json=payload)
+                statuses[str(r.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            finally:
+                done = loop.time()
+                in_flight -= 1
+            # Латентность считается от запланированного момента, а не от отправки: иначе очередь клиента прячется
+            # (coordinated omission).
+            latencies.append((done - due) * 1000)
+            service_times.append((done - sent) * 1000)
+
+        tasks: list[asyncio.Task] = []
+        async with httpx.AsyncClient(timeout=opts["timeout"], limits=limits) as client:
+            start = loop.time()
+            offset = 0.0
+            while True:
+                offset += rng.expovariate(opts["rate"])
+                if offset >= opts["duration"]:
+                    break
+                delay = start + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                scheduled += 1
+                if in_flight >= max_in_flight:
+                    dropped += 1
+                    continue
+
+                src = sampler()
+                dst = sampler()
+                while dst == src:
+                    dst = rng.randrange(len(wallet_ids))
+                payload = {
+                    "from_wallet_id": wallet_ids[src],
+                    "to_wallet_id": wallet_ids[dst],
+                    "amount": self._amount(rng, opts["fee_ratio"]),
+                }
+                in_flight += 1
+                tasks.append(asyncio.create_task(one(client, start + offset, payload)))
+            await asyncio.gather(*tasks)
+            elapsed = loop.time() - start
+
+        return {
+            "scheduled": scheduled,
+            "dropped": dropped,
+            "elapsed": elapsed,
+            "statuses": statuses,
+            "latencies": latencies,
+            "service_times": service_times,
+        }
+
+    def _print(self, result: dict) -> None:
+        lat = result["latency_ms"]
+        db = result["db"]
+        if result["config"]["label"]:
+            self.stdout.write(f"[{result['config']['label']}]")
+        self.stdout.write(
+            f"requests={result['requests']} completed={result['completed']} dropped={result['dropped']} "
+            f"throughput={result['throughput_rps']} rps ok={result['ok_rps']} rps"
+        )
+        self.stdout.write(
+            f"latency p50={lat['p50']:.1f}ms p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms max={lat['max']:.1f}ms"
+        )
+        self.stdout.write(f"statuses={result['status_counts']} conflict_rate={result['conflict_rate']:.2%}")
+        retries = db.get("retries")
+        retries = " ".join(f"{k}={v}" for k, v in retries.items()) if retries is not None else "n/a"
+        self.stdout.write(
+            f"db deadlocks={db['deadlocks']} rollbacks={db['rollbacks']} retries[{retries}] "
+            f"lock_wait={db['lock_wait_seconds']:.2f}s max_waiters={db['max_lock_waiters']} "
+            f"max_backends={db['max_backends']}"
+        )
+
+    def _compare(self, result: dict, path: str, threshold: float | None) -> None:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        regressions = []
+        self.stdout.write(f"сравнение с {path} ({baseline.get('started_at', '?')}):")
+        for key, higher_is_worse in _COMPARED:
+            old, new = _get(baseline, key), _get(result, key)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            if old:
+                change = (new - old) / old * 100
+            else:
+                # С нуля (deadlocks, повторы) — рост без процента, но тоже ухудшение.
+                change = 0.0 if new == old else float("inf") if new > old else float("-inf")
+            worse = change > 0 if higher_is_worse else change < 0
+            mark = ""
+            if threshold is not None and worse and abs(change) > threshold:
+                regressions.append(".".join(key))
+                mark = "  <-- регрессия"
+            self.stdout.write(f"  {'.'.join(key):<22} {old:>12} -> {new:<12} ({change:+.1f}%){mark}")
+
+        if regressions:
+            raise CommandError(f"Регрессия по метрикам: {', '.join(regressions)}")
+
+
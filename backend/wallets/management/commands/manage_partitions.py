@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Помесячные партиции wallets_transaction: создать партиции на N месяцев вперёд, выгрузить старые месяцы "
+        "в gzip CSV и удалить их из леджера (только уже покрытые сверкой)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=None, help="По умолчанию TRANSACTION_PARTITIONS_AHEAD")
+        parser.add_argument(
+            "--archive-older-than",
+            type=int,
+            default=None,
+            help="Архивировать месяцы старше N (по умолчанию TRANSACTION_RETENTION_MONTHS, 0 — не архивировать)",
+        )
+        parser.add_argument("--archive-dir", default=None, help="По умолчанию TRANSACTION_ARCHIVE_DIR")
+        parser.add_argument("--list", action="store_true", help="Только показать партиции")
+
+    def handle(self, *args, **opts):
+        if opts["list"]:
+            for p in partitions.list_partitions():
+                bounds = "DEFAULT" if p.is_default else f"[{p.lo:%Y-%m-%d}, {p.hi:%Y-%m-%d})"
+                self.stdout.write(f"{p.name:<40} {bounds:<26} ~{p.estimated_rows} rows")
+            return
+
+        if opts["ahead"] is not None and opts["ahead"] < 0:
+            raise CommandError("--ahead должен быть >= 0")
+        for name in partitions.ensure_partitions(opts["ahead"]):
+            self.stdout.write(f"created {name}")
+
+        months = opts["archive_older_than"]
+        if months is None:
+            months = int(getattr(settings, "TRANSACTION_RETENTION_MONTHS", 0))
+        if months <= 0:
+            return
+        archive_dir = opts["archive_dir"] or settings.TRANSACTION_ARCHIVE_DIR
+        try:
+            archived, deferred = partitions.archive_partitions(months, archive_dir)
+        except partitions.PartitionError as e:
+            raise CommandError(str(e)) from e
+        for a in archived:
+            self.stdout.write(f"archived {a.name}: {a.rows} rows -> {a.path}")
+        for d in deferred:
+            self.stdout.write(f"deferred {d.name}: {d.reason}")
+
+
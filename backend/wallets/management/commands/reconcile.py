@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверка Wallet.balance с леджером: входящие amount + комиссии минус исходящие amount + fee. "
+        "Обрабатывает только дельту после checkpoint, диапазоны id кошельков — параллельно в пуле процессов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ranges", type=int, default=1, help="На сколько диапазонов id делить кошельки")
+        parser.add_argument("--workers", type=int, default=1, help="Размер пула процессов")
+        parser.add_argument(
+            "--settle-lag",
+            type=float,
+            default=None,
+            help="Не фиксировать в checkpoint строки моложе N секунд (по умолчанию RECONCILE_SETTLE_LAG)",
+        )
+        parser.add_argument(
+            "--adopt-opening-balances",
+            action="store_true",
+            help="Для кошельков без checkpoint принять текущий баланс за сошедшийся (первый запуск на старых данных)",
+        )
+        parser.add_argument("--show", type=int, default=50, help="Сколько расхождений вывести")
+
+    def handle(self, *args, **opts):
+        if opts["ranges"] < 1 or opts["workers"] < 1:
+            raise CommandError("--ranges и --workers должны быть >= 1")
+
+        settle_lag = None if opts["settle_lag"] is None else timedelta(seconds=opts["settle_lag"])
+        report = reconcile(
+            ranges=opts["ranges"],
+            workers=opts["workers"],
+            settle_lag=settle_lag,
+            adopt_opening_balances=opts["adopt_opening_balances"],
+        )
+
+        self.stdout.write(
+            f"wallets={report.wallets} ledger_rows={report.rows} mismatches={len(report.mismatches)}"
+        )
+        for m in sorted(report.mismatches, key=lambda m: abs(m.diff), reverse=True)[: opts["show"]]:
+            self.stdout.write(f"  {m.wallet_id} balance={m.balance} expected={m.expected} diff={m.diff}")
+
+        if report.mismatches:
+            raise CommandError(f"Найдено расхождений: {len(report.mismatches)}")
+
+
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from wallets import outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Relay transactional outbox: забирает события пачками (FOR UPDATE SKIP LOCKED) и публикует их в Celery."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="По умолчанию OUTBOX_RELAY_BATCH_SIZE")
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Пауза, когда outbox пуст, сек (по умолчанию OUTBOX_RELAY_POLL_INTERVAL)",
+        )
+        parser.add_argument("--stats-interval", type=float, default=10.0, help="Как часто печатать lag/backlog, сек")
+        parser.add_argument("--once", action="store_true", help="Разобрать текущий backlog и выйти")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"] or int(getattr(settings, "OUTBOX_RELAY_BATCH_SIZE", 500))
+        poll_interval = opts["poll_interval"]
+        if poll_interval is None:
+            poll_interval = float(getattr(settings, "OUTBOX_RELAY_POLL_INTERVAL", 0.2))
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        errors = 0
+        next_stats = time.monotonic() + opts["stats_interval"]
+        while not stopping:
+            try:
+                batch = outbox.relay_batch(batch_size)
+                errors = 0
+            except Exception:
+                # Брокер или БД недоступны: события остались в outbox, повторим с нарастающей паузой.
+                logger.exception("outbox relay batch failed")
+                close_old_connections()
+                errors += 1
+                time.sleep(min(30.0, poll_interval * 2**errors))
+                continue
+
+            if opts["once"] and batch.published < batch_size:
+                break
+            if batch.published < batch_size:
+                time.sleep(poll_interval)
+
+            if time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + opts["stats_interval"]
+                self._report()
+
+        self._report()
+
+    def _report(self) -> None:
+        stats = outbox.relay_stats()
+        backlog = outbox.backlog()
+        self.stdout.write(
+            f"published={stats['published']} batches={stats['batches']} "
+            f"last_lag={stats['last_lag_seconds']:.3f}s max_lag={stats['max_lag_seconds']:.3f}s "
+            f"pending={backlog['pending']} oldest_age={backlog['oldest_age_seconds']:.3f}s"
+        )
+
+
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from wallets import sequencer
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sequencer «горячих» кошельков: один писатель держит их балансы в памяти, применяет переводы из очереди "
+        "Redis последовательно, пишет каждый пакет в WAL (fsync) и пачками сбрасывает дельты и леджер в Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--name", default=sequencer.DEFAULT_NAME)
+        parser.add_argument("--wallet", action="append", default=None, help="По умолчанию SEQUENCER_WALLETS")
+        parser.add_argument("--wal", default=None, help="По умолчанию SEQUENCER_WAL_PATH")
+        parser.add_argument("--batch-size", type=int, default=None, help="По умолчанию SEQUENCER_BATCH_SIZE")
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=None,
+            help="Как часто сбрасывать в Postgres, сек (по умолчанию SEQUENCER_FLUSH_INTERVAL)",
+        )
+
+    def handle(self, *args, **opts):
+        wallet_ids = opts["wallet"] or list(getattr(settings, "SEQUENCER_WALLETS", ()))
+        if not wallet_ids:
+            raise CommandError("Не заданы кошельки: --wallet или SEQUENCER_WALLETS")
+        wal_path = opts["wal"] or settings.SEQUENCER_WAL_PATH
+        batch_size = opts["batch_size"] or int(getattr(settings, "SEQUENCER_BATCH_SIZE", 1000))
+        flush_interval = opts["flush_interval"]
+        if flush_interval is None:
+            flush_interval = float(getattr(settings, "SEQUENCER_FLUSH_INTERVAL", 0.05))
+
+        if not sequencer.acquire_writer_lock(opts["name"]):
+            raise CommandError(f"sequencer {opts['name']} уже запущен другим процессом")
+
+        seq = sequencer.Sequencer.open(wallet_ids, wal_path, name=opts["name"])
+        self.stdout.write(f"sequencer {seq.name}: {len(wallet_ids)} кошельков, WAL {wal_path}, seq={seq.seq}")
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        client = sequencer._redis()
+        processed = flushed = 0
+        next_flush = time.monotonic() + flush_interval
+        try:
+            while not stopping:
+                processed += sequencer.serve_batch(seq, client, batch_size=batch_size, block=flush_interval)
+                if time.monotonic() >= next_flush:
+                    # Ошибка flush не теряет данные: переводы в WAL и в памяти, попробуем на следующем шаге.
+                    try:
+                        flushed += seq.flush()
+                    except Exception:
+                        logger.exception("sequencer flush failed")
+                        close_old_connections()
+                    next_flush = time.monotonic() + flush_interval
+        finally:
+            seq.flush()
+            seq.close()
+            self.stdout.write(f"processed={processed} flushed={flushed} seq={seq.seq}")
+
+
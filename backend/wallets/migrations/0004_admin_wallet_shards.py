@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_fee_wallet(apps, schema_editor):
+    # До шардирования комиссия всегда зачислялась на единственный admin-кошелёк валюты (теперь это шард 0):
+    # проставляем его в fee_wallet старых строк с комиссией, чтобы сверка и выписки их учитывали.
+    owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE wallets_transaction t
+            SET fee_wallet_id = admin.id
+            FROM wallets_wallet src, wallets_wallet admin
+            WHERE t.fee_wallet_id IS NULL
+              AND t.fee > 0
+              AND src.id = t.from_wallet_id
+              AND admin.owner_name = %s
+              AND admin.currency = src.currency
+              AND admin.shard = 0
+            """,
+            [owner],
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0003_transaction_amount_validators"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wallet",
+            name="shard",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RemoveConstraint(
+            model_name="wallet",
+            name="uniq_wallet_owner_currency",
+        ),
+        migrations.AddConstraint(
+            model_name="wallet",
+            constraint=models.UniqueConstraint(
+                fields=("owner_name", "currency", "shard"),
+                name="uniq_wallet_owner_currency_shard",
+            ),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="fee_wallet",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="fee_transactions",
+                to="wallets.wallet",
+            ),
+        ),
+        migrations.RunPython(backfill_fee_wallet, migrations.RunPython.noop),
+    ]
+
+
@@ -0,0 +1,34 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индексы на большом леджере строятся CONCURRENTLY, без блокировки записи.
+    atomic = False
+
+    dependencies = [
+        ("wallets", "0005_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="from_balance_after",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="to_balance_after",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["from_wallet", "-created_at", "-id"], name="tx_from_wallet_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["to_wallet", "-created_at", "-id"], name="tx_to_wallet_created_idx"),
+        ),
+    ]
+
+
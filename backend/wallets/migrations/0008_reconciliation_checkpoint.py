@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_fee_wallet(apps, schema_editor):
+    # Тот же backfill, что в 0004: повтор для баз, где 0004 применили до его появления. Строки с уже
+    # проставленным fee_wallet не трогает.
+    owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE wallets_transaction t
+            SET fee_wallet_id = admin.id
+            FROM wallets_wallet src, wallets_wallet admin
+            WHERE t.fee_wallet_id IS NULL
+              AND t.fee > 0
+              AND src.id = t.from_wallet_id
+              AND admin.owner_name = %s
+              AND admin.currency = src.currency
+              AND admin.shard = 0
+            """,
+            [owner],
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("wallets", "0007_transaction_created_at_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReconciliationCheckpoint",
+            fields=[
+                (
+                    "wallet",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="reconciliation_checkpoint",
+                        serialize=False,
+                        to="wallets.wallet",
+                    ),
+                ),
+                ("opening_balance", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=18)),
+                ("ledger_net", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=18)),
+                ("last_created_at", models.DateTimeField(blank=True, null=True)),
+                ("last_transaction_id", models.UUIDField(blank=True, null=True)),
+                ("last_diff", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=18)),
+                ("checked_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_fee_wallet, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["fee_wallet", "-created_at", "-id"], name="tx_fee_wallet_created_idx"),
+        ),
+    ]
+
+
@@ -0,0 +1,25 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0008_reconciliation_checkpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationDeadLetter",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("to_wallet_id", models.UUIDField()),
+                ("transaction_id", models.UUIDField(db_index=True)),
+                ("attempts", models.PositiveSmallIntegerField()),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
+
+
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0010_outbox_event"),
+    ]
+
+    operations = [
+        # Константный DEFAULT на Postgres 11+ добавляется без перезаписи таблицы; без CHECK — и без её проверки.
+        migrations.AddField(
+            model_name="wallet",
+            name="version",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
+
+
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0011_wallet_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SequencerCheckpoint",
+            fields=[
+                ("name", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("last_seq", models.BigIntegerField(default=0)),
+                ("flushed_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
+
+
@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+
+_LEGACY = "wallets_transaction_legacy"
+
+# Индексы и внешние ключи переносятся со старой таблицы на новую с теми же именами: Django находит их по имени
+# (Meta.indexes) или по колонкам, так что следующие миграции их видят. Если старая таблица уже партиция новой,
+# CREATE INDEX и ADD CONSTRAINT на родителе подхватывают её совпадающие индексы и FK без перестроения и проверки.
+_MOVE_INDEXES_AND_FKS = """
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE tablename = '{source}' AND indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = '{source}'::regclass AND contype IN ('p', 'u')
+        )
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', r.indexname, left(r.indexname, {keep}) || '_{suffix}');
+        EXECUTE regexp_replace(r.indexdef, ' ON (ONLY )?(\\S+\\.)?{source} ', ' ON wallets_transaction ');
+    END LOOP;
+    FOR r IN
+        SELECT conname, pg_get_constraintdef(oid) AS def FROM pg_constraint
+        WHERE conrelid = '{source}'::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE wallets_transaction ADD CONSTRAINT %I %s', r.conname, r.def);
+    END LOOP;
+END $$;
+"""
+
+_SWAP = f"""
+ALTER TABLE wallets_transaction RENAME TO {_LEGACY};
+ALTER TABLE {_LEGACY} RENAME CONSTRAINT wallets_transaction_pkey TO {_LEGACY}_pkey;
+CREATE TABLE wallets_transaction (
+    LIKE {_LEGACY} INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY RANGE (created_at);
+ALTER TABLE wallets_transaction DROP CONSTRAINT {_LEGACY}_bound;
+-- Уникальность на партиционированной таблице должна включать ключ партиционирования.
+ALTER TABLE wallets_transaction ADD CONSTRAINT wallets_transaction_pkey PRIMARY KEY (id, created_at);
+"""
+
+
+def _month(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition(apps, schema_editor):
+    # Леджер не копируется: существующая таблица становится партицией wallets_transaction_legacy на диапазон
+    # [месяц самой старой строки, следующий месяц + 1). Долгие шаги идут каждый в своей транзакции и запись
+    # не останавливают: уникальный индекс строится CONCURRENTLY, CHECK с тем же диапазоном проверяется VALIDATE
+    # под SHARE UPDATE EXCLUSIVE. Благодаря ему ATTACH PARTITION не сканирует таблицу, и подмена под
+    # ACCESS EXCLUSIVE меняет только каталог. Запас в месяц — на случай, если миграция пересечёт границу месяца.
+    connection = schema_editor.connection
+    with connection.cursor() as cur:
+        cur.execute("SELECT min(created_at), now() FROM wallets_transaction")
+        oldest, now = cur.fetchone()
+        lo, hi = _month(oldest or now), _add_months(_month(now), 2)
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_LEGACY}_id_created_at_key")
+        cur.execute(
+            f"CREATE UNIQUE INDEX CONCURRENTLY {_LEGACY}_id_created_at_key ON wallets_transaction (id, created_at)"
+        )
+        cur.execute(f"ALTER TABLE wallets_transaction DROP CONSTRAINT IF EXISTS {_LEGACY}_bound")
+        cur.execute(
+            f"ALTER TABLE wallets_transaction ADD CONSTRAINT {_LEGACY}_bound "
+            "CHECK (created_at >= %s AND created_at < %s) NOT VALID",
+            [lo, hi],
+        )
+        cur.execute(f"ALTER TABLE wallets_transaction VALIDATE CONSTRAINT {_LEGACY}_bound")
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute(_SWAP)
+        cur.execute(f"SELECT EXISTS (SELECT 1 FROM {_LEGACY})")
+        attach = cur.fetchone()[0]
+        if attach:
+            cur.execute(
+                f"ALTER TABLE {_LEGACY} ADD CONSTRAINT {_LEGACY}_id_created_at_key "
+                f"UNIQUE USING INDEX {_LEGACY}_id_created_at_key"
+            )
+            cur.execute(
+                f"ALTER TABLE wallets_transaction ATTACH PARTITION {_LEGACY} FOR VALUES FROM (%s) TO (%s)",
+                [lo.isoformat(), hi.isoformat()],
+            )
+        # Помесячные партиции по UTC до трёх месяцев вперёд; дальше их заранее создаёт manage_partitions.
+        # DEFAULT ловит строки вне созданных диапазонов.
+        month = hi if attach else _month(now)
+        while month <= _add_months(_month(now), 3):
+            cur.execute(
+                f'CREATE TABLE "wallets_transaction_y{month:%Y}m{month:%m}" PARTITION OF wallets_transaction '
+                "FOR VALUES FROM (%s) TO (%s)",
+                [month.isoformat(), _add_months(month, 1).isoformat()],
+            )
+            month = _add_months(month, 1)
+        cur.execute("CREATE TABLE wallets_transaction_default PARTITION OF wallets_transaction DEFAULT")
+        cur.execute(_MOVE_INDEXES_AND_FKS.format(source=_LEGACY, keep=56, suffix="legacy"))
+        if attach:
+            # Старый PRIMARY KEY (id) дублирует (id, created_at); диапазон теперь держит граница партиции.
+            cur.execute(f"ALTER TABLE {_LEGACY} DROP CONSTRAINT {_LEGACY}_pkey, DROP CONSTRAINT {_LEGACY}_bound")
+        else:
+            cur.execute(f"DROP TABLE {_LEGACY}")
+
+
+# Обратно — копией в обычную таблицу под блокировкой: только в окно обслуживания.
+BACKWARD = (
+    """
+ALTER TABLE wallets_transaction RENAME TO wallets_transaction_partitioned;
+ALTER TABLE wallets_transaction_partitioned
+    RENAME CONSTRAINT wallets_transaction_pkey TO wallets_transaction_partitioned_pkey;
+CREATE TABLE wallets_transaction (
+    LIKE wallets_transaction_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+);
+ALTER TABLE wallets_transaction ADD CONSTRAINT wallets_transaction_pkey PRIMARY KEY (id);
+INSERT INTO wallets_transaction SELECT * FROM wallets_transaction_partitioned;
+"""
+    + _MOVE_INDEXES_AND_FKS.format(source="wallets_transaction_partitioned", keep=59, suffix="old")
+    + """
+DROP TABLE wallets_transaction_partitioned;
+"""
+)
+
+
+def unpartition(apps, schema_editor):
+    with transaction.atomic(using=schema_editor.connection.alias), schema_editor.connection.cursor() as cur:
+        cur.execute(BACKWARD)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY и VALIDATE CONSTRAINT — вне общей транзакции миграции.
+    atomic = False
+
+    dependencies = [
+        ("wallets", "0012_sequencer_checkpoint"),
+    ]
+
+    operations = [
+        # FK на партиционированную таблицу требует уникальности по (id, created_at); PROTECT остаётся на стороне ORM.
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="transaction",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="idempotency_keys",
+                to="wallets.transaction",
+            ),
+        ),
+        migrations.RunPython(partition, unpartition),
+    ]
+
+
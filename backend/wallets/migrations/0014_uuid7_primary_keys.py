@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+import wallets.ids
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0013_partition_transaction"),
+    ]
+
+    # Меняется только default на стороне Python: существующие uuid4 остаются как есть (их id уже знают клиенты,
+    # outbox и ключи идемпотентности), новые строки получают uuid7. Схема БД не меняется.
+    operations = [
+        migrations.AlterField(
+            model_name="wallet",
+            name="id",
+            field=models.UUIDField(default=wallets.ids.new_id, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="id",
+            field=models.UUIDField(default=wallets.ids.new_id, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
+
+
@@ -0,0 +1,108 @@
+from decimal import Decimal
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Q
+
+import wallets.ids
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0014_uuid7_primary_keys"),
+    ]
+
+    operations = [
+        # Константный DEFAULT без перезаписи таблицы; CHECK проверяет существующие строки одним проходом.
+        migrations.AddField(
+            model_name="wallet",
+            name="reserved",
+            field=models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=18),
+        ),
+        migrations.AddConstraint(
+            model_name="wallet",
+            constraint=models.CheckConstraint(check=Q(reserved__gte=0), name="wallet_reserved_non_negative"),
+        ),
+        migrations.AddConstraint(
+            model_name="wallet",
+            constraint=models.CheckConstraint(
+                check=Q(balance__gte=F("reserved")),
+                name="wallet_balance_covers_reserved",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Hold",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(default=wallets.ids.new_id, editable=False, primary_key=True, serialize=False),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=18,
+                        validators=[django.core.validators.MinValueValidator(Decimal("0.01"))],
+                    ),
+                ),
+                ("reserved", models.DecimalField(decimal_places=2, max_digits=18)),
+                ("captured_amount", models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "active"),
+                            ("captured", "captured"),
+                            ("voided", "voided"),
+                            ("expired", "expired"),
+                        ],
+                        default="active",
+                        max_length=16,
+                    ),
+                ),
+                ("expires_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="holds",
+                        to="wallets.wallet",
+                    ),
+                ),
+                (
+                    "to_wallet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="wallets.wallet",
+                    ),
+                ),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="wallets.transaction",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.CheckConstraint(check=Q(amount__gt=0), name="hold_amount_gt_zero"),
+                    models.CheckConstraint(check=Q(reserved__gte=F("amount")), name="hold_reserved_covers_amount"),
+                ],
+                "indexes": [
+                    models.Index(fields=["expires_at"], name="hold_active_expires_idx", condition=Q(status="active")),
+                    models.Index(fields=["wallet", "-created_at"], name="hold_wallet_created_idx"),
+                ],
+            },
+        ),
+    ]
+
+
@@ -0,0 +1,56 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0015_wallet_holds"),
+    ]
+
+    operations = [
+        # Nullable-колонки без DEFAULT: ALTER на партиционированной таблице меняет только каталог, строки не трогает.
+        migrations.AddField(
+            model_name="transaction",
+            name="to_amount",
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="fx_rate",
+            field=models.DecimalField(blank=True, decimal_places=12, max_digits=24, null=True),
+        ),
+        migrations.CreateModel(
+            name="FxRateSet",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("source", models.CharField(blank=True, max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FxRate",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("base", models.CharField(max_length=8)),
+                ("quote", models.CharField(max_length=8)),
+                ("rate", models.DecimalField(decimal_places=12, max_digits=24)),
+                (
+                    "rate_set",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rates",
+                        to="wallets.fxrateset",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=["rate_set", "base", "quote"], name="uniq_fx_rate_set_pair"),
+                    models.CheckConstraint(check=Q(rate__gt=0), name="fx_rate_gt_zero"),
+                ],
+            },
+        ),
+    ]
+
+
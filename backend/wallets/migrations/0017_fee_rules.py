@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wallets", "0016_fx_rates"),
+    ]
+
+    operations = [
+        # Константный DEFAULT: колонка добавляется без перезаписи таблицы кошельков.
+        migrations.AddField(
+            model_name="wallet",
+            name="wallet_class",
+            field=models.CharField(default="standard", max_length=32),
+        ),
+        migrations.CreateModel(
+            name="FeeRule",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("currency", models.CharField(blank=True, max_length=8)),
+                ("wallet_class", models.CharField(blank=True, max_length=32)),
+                ("above", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=18)),
+                ("percent", models.DecimalField(decimal_places=4, default=Decimal("0"), max_digits=7)),
+                ("fixed", models.DecimalField(decimal_places=2, default=Decimal("0.00"), max_digits=18)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=["currency", "wallet_class", "above"], name="uniq_fee_rule_tier"),
+                    models.CheckConstraint(
+                        check=Q(above__gte=0, percent__gte=0, fixed__gte=0),
+                        name="fee_rule_non_negative",
+                    ),
+                ],
+            },
+        ),
+    ]
+
+
@@ -5,21 +5,40 @@ from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import Q
 
+from wallets import ids
+
+
+DEFAULT_WALLET_CLASS = "standard"
+
 
 class Wallet(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # uuid7: новые ключи растут со временем и ложатся в правый край B-tree, а не в случайные страницы индекса.
+    id = models.UUIDField(primary_key=True, default=ids.new_id, editable=False)
     owner_name = models.CharField(max_length=128)
     balance = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    # Сумма активных холдов (wallets.holds): входит в balance, но списать её переводом нельзя.
+    reserved = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
     currency = models.CharField(max_length=8, default="U")
+    # Тарифный класс кошелька: по нему (и по валюте) выбираются ступени комиссии (wallets.fees).
+    wallet_class = models.CharField(max_length=32, default=DEFAULT_WALLET_CLASS)
+    shard = models.PositiveSmallIntegerField(default=0)
+    # Растёт при каждом изменении баланса; по нему оптимистичный перевод узнаёт о параллельной записи.
+    version = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=["owner_name", "currency"], name="uniq_wallet_owner_currency"),
+            models.UniqueConstraint(fields=["owner_name", "currency", "shard"], name="uniq_wallet_owner_currency_shard"),
             models.CheckConstraint(check=Q(balance__gte=0), name="wallet_balance_non_negative"),
+            models.CheckConstraint(check=Q(reserved__gte=0), name="wallet_reserved_non_negative"),
+            models.CheckConstraint(check=Q(balance__gte=models.F("reserved")), name="wallet_balance_covers_reserved"),
         ]
 
+    @property
+    def available(self) -> Decimal:
+        return self.balance - self.reserved
+
     def __str__(self) -> str:
         return f"{self.owner_name}:{self.currency} ({self.id})"
 
@@ -30,7 +49,9 @@ class TransactionStatus(models.TextChoices):
 
 
 class Transaction(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # В БД таблица партиционирована помесячно по created_at (миграция 0013, wallets.partitions); первичный ключ
+    # там — (id, created_at).
+    id = models.UUIDField(primary_key=True, default=ids.new_id, editable=False)
     from_wallet = models.ForeignKey(
         Wallet,
         null=True,
@@ -43,12 +64,25 @@ class Transaction(models.Model):
         on_delete=models.PROTECT,
         related_name="incoming_transactions",
     )
+    fee_wallet = models.ForeignKey(
+        Wallet,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="fee_transactions",
+    )
     amount = models.DecimalField(
         max_digits=18,
         decimal_places=2,
         validators=[MinValueValidator(Decimal("0.01"))],
     )
     fee = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    # Межвалютный перевод (wallets.fx): amount и fee — в валюте from_wallet, to_amount = _q2(amount * fx_rate)
+    # зачислен в валюте to_wallet. NULL — валюты совпадают и зачислен amount.
+    to_amount = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    fx_rate = models.DecimalField(max_digits=24, decimal_places=12, null=True, blank=True)
+    from_balance_after = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    to_balance_after = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
     status = models.CharField(max_length=16, choices=TransactionStatus.choices)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -57,8 +91,185 @@ class Transaction(models.Model):
             models.CheckConstraint(check=Q(amount__gt=0), name="tx_amount_gt_zero"),
             models.CheckConstraint(check=Q(fee__gte=0), name="tx_fee_non_negative"),
         ]
+        indexes = [
+            models.Index(fields=["from_wallet", "-created_at", "-id"], name="tx_from_wallet_created_idx"),
+            models.Index(fields=["to_wallet", "-created_at", "-id"], name="tx_to_wallet_created_idx"),
+            models.Index(fields=["created_at", "id"], name="tx_created_at_id_idx"),
+            models.Index(fields=["fee_wallet", "-created_at", "-id"], name="tx_fee_wallet_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.id} {self.status} amount={self.amount} fee={self.fee}"
 
 
+class IdempotencyKey(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    # Без FK в БД: Transaction партиционирована, уникален только (id, created_at).
+    transaction = models.ForeignKey(
+        Transaction,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        on_delete=models.PROTECT,
+        related_name="idempotency_keys",
+    )
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.key} -> {self.response_status}"
+
+
+class ReconciliationCheckpoint(models.Model):
+    wallet = models.OneToOneField(
+        Wallet,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="reconciliation_checkpoint",
+    )
+    opening_balance = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    ledger_net = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_transaction_id = models.UUIDField(null=True, blank=True)
+    last_diff = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    checked_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.wallet_id} net={self.ledger_net} diff={self.last_diff}"
+
+
+class NotificationDeadLetter(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    to_wallet_id = models.UUIDField()
+    transaction_id = models.UUIDField(db_index=True)
+    attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.transaction_id} -> {self.to_wallet_id} attempts={self.attempts}"
+
+
+class OutboxEvent(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=64)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.id} {self.topic}"
+
+
+class SequencerCheckpoint(models.Model):
+    # Последняя запись WAL sequencer, уже перенесённая в Postgres; пишется в одной транзакции с балансами и леджером.
+    name = models.CharField(max_length=64, primary_key=True)
+    last_seq = models.BigIntegerField(default=0)
+    flushed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} seq={self.last_seq}"
+
+
+class HoldStatus(models.TextChoices):
+    ACTIVE = "active", "active"
+    CAPTURED = "captured", "captured"
+    VOIDED = "voided", "voided"
+    EXPIRED = "expired", "expired"
+
+
+class Hold(models.Model):
+    # Авторизация: amount + комиссия зарезервированы на wallet до capture/void или до expires_at.
+    id = models.UUIDField(primary_key=True, default=ids.new_id, editable=False)
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name="holds")
+    to_wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name="+")
+    amount = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal("0.01"))],
+    )
+    reserved = models.DecimalField(max_digits=18, decimal_places=2)
+    captured_amount = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=16, choices=HoldStatus.choices, default=HoldStatus.ACTIVE)
+    # Без FK в БД: Transaction партиционирована, уникален только (id, created_at).
+    transaction = models.ForeignKey(
+        Transaction,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        on_delete=models.PROTECT,
+        related_name="+",
+    )
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=Q(amount__gt=0), name="hold_amount_gt_zero"),
+            models.CheckConstraint(check=Q(reserved__gte=models.F("amount")), name="hold_reserved_covers_amount"),
+        ]
+        indexes = [
+            # Частичный индекс: sweeper читает только активные холды в порядке истечения.
+            models.Index(fields=["expires_at"], name="hold_active_expires_idx", condition=Q(status="active")),
+            models.Index(fields=["wallet", "-created_at"], name="hold_wallet_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.id} {self.status} amount={self.amount} reserved={self.reserved}"
+
+
+class FxRateSet(models.Model):
+    # Версия таблицы курсов: публикуется целиком в одной транзакции, действует последняя (см. wallets.fx).
+    id = models.BigAutoField(primary_key=True)
+    source = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"v{self.id} {self.source}"
+
+
+class FxRate(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    rate_set = models.ForeignKey(FxRateSet, on_delete=models.CASCADE, related_name="rates")
+    base = models.CharField(max_length=8)
+    quote = models.CharField(max_length=8)
+    # Сколько единиц quote за единицу base.
+    rate = models.DecimalField(max_digits=24, decimal_places=12)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["rate_set", "base", "quote"], name="uniq_fx_rate_set_pair"),
+            models.CheckConstraint(check=Q(rate__gt=0), name="fx_rate_gt_zero"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.base}/{self.quote}={self.rate} (v{self.rate_set_id})"
+
+
+class FeeRule(models.Model):
+    # Ступень тарифа: при amount > above комиссия = amount * percent / 100 + fixed (со всей суммы, не с превышения).
+    # Пустые currency/wallet_class подходят для любых; правила точнее по ключу важнее (см. wallets.fees).
+    currency = models.CharField(max_length=8, blank=True)
+    wallet_class = models.CharField(max_length=32, blank=True)
+    above = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    percent = models.DecimalField(max_digits=7, decimal_places=4, default=Decimal("0"))
+    fixed = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["currency", "wallet_class", "above"], name="uniq_fee_rule_tier"),
+            models.CheckConstraint(
+                check=Q(above__gte=0, percent__gte=0, fixed__gte=0),
+                name="fee_rule_non_negative",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        scope = f"{self.currency or '*'}/{self.wallet_class or '*'}"
+        return f"{scope} > {self.above}: {self.percent}% + {self.fixed}"
+
+
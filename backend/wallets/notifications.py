@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+
+
+@dataclass(frozen=True)
+class Notification:
+    to_wallet_id: str
+    transaction_id: str
+
+    def as_dict(self) -> dict[str, str]:
+        return asdict(self)
+
+
+class DeliveryError(Exception):
+    pass
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def backoff_delay(attempt: int) -> float:
+    # Экспоненциальный backoff с full jitter: повторы одного пакета не бьют в провайдера синхронно.
+    base = float(_setting("NOTIFICATION_RETRY_BACKOFF_BASE", 1.0))
+    cap = float(_setting("NOTIFICATION_RETRY_BACKOFF_MAX", 60.0))
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+async def deliver(notification: Notification) -> None:
+    # Имитация внешнего провайдера: задержка сети и доля отказов, как в исходной задаче.
+    await asyncio.sleep(float(_setting("NOTIFICATION_LATENCY", 5.0)))
+    if random.random() < float(_setting("NOTIFICATION_FAILURE_RATE", 0.3)):
+        raise DeliveryError("Simulated notification failure")
+
+
+async def deliver_many(
+    notifications: list[Notification],
+    *,
+    concurrency: int | None = None,
+) -> list[tuple[Notification, Exception]]:
+    semaphore = asyncio.Semaphore(concurrency or int(_setting("NOTIFICATION_CONCURRENCY", 100)))
+
+    async def one(notification: Notification):
+        async with semaphore:
+            await deliver(notification)
+
+    results = await asyncio.gather(*(one(n) for n in notifications), return_exceptions=True)
+    return [(n, r) for n, r in zip(notifications, results) if isinstance(r, Exception)]
+
+
+def dispatch(notifications: list[Notification]) -> list[tuple[Notification, Exception]]:
+    # Пакет доставляется конкурентно в одном event loop: слот воркера занят на время самой медленной доставки,
+    # а не на сумму задержек.
+    if not notifications:
+        return []
+    return asyncio.run(deliver_many(notifications))
+
+
+def enqueue(notifications: list[Notification]) -> None:
+    from wallets.tasks import send_notifications
+
+    batch_size = int(_setting("NOTIFICATION_BATCH_SIZE", 100))
+    for i in range(0, len(notifications), batch_size):
+        send_notifications.delay(items=[n.as_dict() for n in notifications[i : i + batch_size]])
+
+
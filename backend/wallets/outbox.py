@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from wallets import notifications
+from wallets.models import OutboxEvent, Transaction
+
+
+TOPIC_NOTIFICATION = "notification"
+
+_TABLE = OutboxEvent._meta.db_table
+
+_CLAIM_SQL = f"""
+SELECT id, topic, payload::text, created_at
+FROM {_TABLE}
+ORDER BY id
+LIMIT %s
+FOR UPDATE SKIP LOCKED
+"""
+
+_DELETE_SQL = f"DELETE FROM {_TABLE} WHERE id = ANY(%s)"
+
+_BACKLOG_SQL = f"SELECT count(*), min(created_at) FROM {_TABLE}"
+
+
+def notification_event(tx: Transaction) -> OutboxEvent:
+    return OutboxEvent(
+        topic=TOPIC_NOTIFICATION,
+        payload=notifications.Notification(
+            to_wallet_id=str(tx.to_wallet_id),
+            transaction_id=str(tx.id),
+        ).as_dict(),
+    )
+
+
+def publish(events: dict[str, list[dict]]) -> None:
+    for topic, payloads in events.items():
+        if topic == TOPIC_NOTIFICATION:
+            notifications.enqueue([notifications.Notification(**payload) for payload in payloads])
+        else:
+            raise ValueError(f"Неизвестный topic outbox: {topic}")
+
+
+@dataclass(frozen=True)
+class RelayBatch:
+    published: int
+    max_lag_seconds: float
+
+
+_stats_lock = threading.Lock()
+_stats = {"batches": 0, "published": 0, "last_lag_seconds": 0.0, "max_lag_seconds": 0.0}
+
+
+def relay_batch(
+    batch_size: int | None = None,
+    *,
+    publisher: Callable[[dict[str, list[dict]]], None] = publish,
+) -> RelayBatch:
+    batch_size = batch_size or int(getattr(settings, "OUTBOX_RELAY_BATCH_SIZE", 500))
+    # SKIP LOCKED: несколько relay разбирают outbox параллельно, не ожидая друг друга.
+    # Удаление и публикация в одной транзакции: упали до COMMIT — события останутся и уйдут повторно (at-least-once).
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute(_CLAIM_SQL, [batch_size])
+            rows = cur.fetchall()
+            if not rows:
+                return RelayBatch(published=0, max_lag_seconds=0.0)
+
+            events: dict[str, list[dict]] = defaultdict(list)
+            for _, topic, payload, _ in rows:
+                events[topic].append(json.loads(payload))
+            publisher(dict(events))
+            cur.execute(_DELETE_SQL, [[row[0] for row in rows]])
+
+    lag = (timezone.now() - min(row[3] for row in rows)).total_seconds()
+    with _stats_lock:
+        _stats["batches"] += 1
+        _stats["published"] += len(rows)
+        _stats["last_lag_seconds"] = lag
+        _stats["max_lag_seconds"] = max(_stats["max_lag_seconds"], lag)
+    return RelayBatch(published=len(rows), max_lag_seconds=lag)
+
+
+def backlog() -> dict[str, float | int]:
+    with connection.cursor() as cur:
+        cur.execute(_BACKLOG_SQL)
+        pending, oldest = cur.fetchone()
+    age = (timezone.now() - oldest).total_seconds() if oldest is not None else 0.0
+    return {"pending": pending, "oldest_age_seconds": round(age, 3)}
+
+
+def relay_stats() -> dict[str, float | int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
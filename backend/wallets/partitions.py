@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import gzip
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from wallets.models import Hold, IdempotencyKey, ReconciliationCheckpoint, Transaction, Wallet
+
+
+_TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = f"{_TABLE}_default"
+
+_BOUND_RE = re.compile(r"FOR VALUES FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+_PARTITIONS_SQL = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = %s::regclass
+"""
+
+
+# Ссылки на строки леджера без FK в БД (первичный ключ партиционированной таблицы — (id, created_at)). В ORM они
+# PROTECT: партицию с такими строками не удаляем.
+_REFERENCES = ((Hold._meta.db_table, "transaction_id"), (IdempotencyKey._meta.db_table, "transaction_id"))
+
+
+class PartitionError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    lo: datetime | None
+    hi: datetime | None
+    estimated_rows: int
+
+    @property
+    def is_default(self) -> bool:
+        return self.lo is None
+
+
+@dataclass(frozen=True)
+class ArchivedPartition:
+    name: str
+    path: str
+    rows: int
+
+
+@dataclass(frozen=True)
+class DeferredPartition:
+    name: str
+    reason: str
+
+
+def month_start(value: datetime) -> datetime:
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def list_partitions() -> list[Partition]:
+    with connection.cursor() as cur:
+        cur.execute(_PARTITIONS_SQL, [_TABLE])
+        rows = cur.fetchall()
+
+    partitions = []
+    for name, bound, estimated in rows:
+        match = _BOUND_RE.search(bound)
+        lo, hi = (parse_datetime(match.group(1)), parse_datetime(match.group(2))) if match else (None, None)
+        partitions.append(Partition(name=name, lo=lo, hi=hi, estimated_rows=max(0, estimated)))
+    return sorted(partitions, key=lambda p: (p.lo is None, p.lo))
+
+
+def create_partition(month: datetime) -> str:
+    lo, hi = month_start(month), add_months(month_start(month), 1)
+    name = partition_name(lo)
+    with transaction.atomic(), connection.cursor() as cur:
+        has_default = any(p.is_default for p in list_partitions())
+        stray = False
+        if has_default:
+            cur.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)",
+                [lo, hi],
+            )
+            stray = cur.fetchone()[0]
+        if stray:
+            # Строки месяца уже лежат в DEFAULT (партицию не создали заранее) — Postgres не даст создать её поверх
+            # них. Отцепляем DEFAULT, переносим строки в новую партицию и возвращаем DEFAULT на место.
+            cur.execute(f"ALTER TABLE {_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        cur.execute(
+            f'CREATE TABLE "{name}" PARTITION OF {_TABLE} FOR VALUES FROM (%s) TO (%s)',
+            [lo.isoformat(), hi.isoformat()],
+        )
+        if stray:
+            cur.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *
+                )
+                INSERT INTO "{name}" SELECT * FROM moved
+                """,
+                [lo, hi],
+            )
+            cur.execute(f"ALTER TABLE {_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    return name
+
+
+def ensure_partitions(ahead: int | None = None, *, now: datetime | None = None) -> list[str]:
+    if ahead is None:
+        ahead = int(getattr(settings, "TRANSACTION_PARTITIONS_AHEAD", 3))
+    current = month_start(now or timezone.now())
+    # Месяц уже покрыт, если попадает в диапазон любой партиции, — в том числе wallets_transaction_legacy из 0013.
+    ranges = [(p.lo, p.hi) for p in list_partitions() if not p.is_default]
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if not any(lo <= month < hi for lo, hi in ranges):
+            created.append(create_partition(month))
+    return created
+
+
+def reconciled_horizon() -> datetime | None:
+    # Строки раньше горизонта уже свёрнуты в ledger_net checkpoint каждого кошелька, и сверка их больше не читает.
+    # Кошелёк без checkpoint сверяется по всему леджеру — тогда архивировать нельзя ничего.
+    if Wallet.objects.filter(reconciliation_checkpoint__isnull=True).exists():
+        return None
+    oldest = ReconciliationCheckpoint.objects.aggregate(oldest=Min("checked_at"))["oldest"]
+    if oldest is None:
+        return None
+    # Cutoff прогона сверки — его начало минус settle lag; checked_at пишется в конце, отсюда запас.
+    lag = timedelta(seconds=float(getattr(settings, "RECONCILE_SETTLE_LAG", 300)))
+    return oldest - lag - timedelta(hours=1)
+
+
+def _referenced_by(cur, partition_name: str) -> list[str]:
+    tables = []
+    for table, column in _REFERENCES:
+        cur.execute(f'SELECT EXISTS (SELECT 1 FROM {table} r JOIN "{partition_name}" t ON t.id = r.{column})')
+        if cur.fetchone()[0]:
+            tables.append(table)
+    return tables
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def archive_partition(partition: Partition, archive_dir: str) -> ArchivedPartition:
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{partition.name}.csv.gz")
+    tmp = f"{path}.tmp"
+
+    # COPY идёт без блокировок родительской таблицы: месяц закрыт, новых строк в партиции нет. Таблица короткой
+    # транзакцией отцепляется и удаляется только после fsync файла и сверки числа строк.
+    lines = 0
+    with connection.cursor() as cur:
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out, cur.copy(
+                f'COPY "{partition.name}" TO STDOUT WITH (FORMAT csv, HEADER)'
+            ) as copy:
+                for chunk in copy:
+                    lines += bytes(chunk).count(b"\n")
+                    out.write(chunk)
+            raw.flush()
+            os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(archive_dir)
+    rows = lines - 1
+
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute(f'SELECT count(*) FROM "{partition.name}"')
+        if cur.fetchone()[0] != rows:
+            raise PartitionError(f"{partition.name}: число строк изменилось во время выгрузки, архив не применён")
+        referenced = _referenced_by(cur, partition.name)
+        if referenced:
+            raise PartitionError(f"{partition.name}: на строки ссылаются {', '.join(referenced)}, архив не применён")
+        cur.execute(f'ALTER TABLE {_TABLE} DETACH PARTITION "{partition.name}"')
+        cur.execute(f'DROP TABLE "{partition.name}"')
+    return ArchivedPartition(name=partition.name, path=path, rows=rows)
+
+
+def archive_partitions(
+    older_than_months: int,
+    archive_dir: str,
+    *,
+    now: datetime | None = None,
+) -> tuple[list[ArchivedPartition], list[DeferredPartition]]:
+    # Архивируются месяцы целиком старше older_than_months от текущего; возвращает архивированные и отложенные
+    # партиции: ещё не покрытые сверкой или со строками, на которые ссылаются холды и ключи идемпотентности.
+    if older_than_months < 1:
+        raise PartitionError("older_than_months должен быть >= 1")
+    cutoff = add_months(month_start(now or timezone.now()), -older_than_months)
+    horizon = reconciled_horizon()
+
+    archived, deferred = [], []
+    for partition in list_partitions():
+        if partition.is_default or partition.hi > cutoff:
+            continue
+        if horizon is None or partition.hi > horizon:
+            deferred.append(DeferredPartition(partition.name, "не покрыт сверкой (запустите reconcile)"))
+            continue
+        with connection.cursor() as cur:
+            referenced = _referenced_by(cur, partition.name)
+        if referenced:
+            deferred.append(DeferredPartition(partition.name, f"на строки ссылаются {', '.join(referenced)}"))
+            continue
+        archived.append(archive_partition(partition, archive_dir))
+    return archived, deferred
+
+
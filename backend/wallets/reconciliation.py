@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from wallets.models import ReconciliationCheckpoint, Transaction, TransactionStatus, Wallet
+
+
+logger = logging.getLogger(__name__)
+
+_WALLETS = Wallet._meta.db_table
+_LEDGER = Transaction._meta.db_table
+_CHECKPOINTS = ReconciliationCheckpoint._meta.db_table
+
+# Ключ (created_at, id) «до начала времён» для кошельков без checkpoint.
+_NIL_ID = uuid.UUID(int=0)
+
+
+@dataclass(frozen=True)
+class Mismatch:
+    wallet_id: uuid.UUID
+    balance: Decimal
+    expected: Decimal
+
+    @property
+    def diff(self) -> Decimal:
+        return self.balance - self.expected
+
+
+@dataclass
+class ReconciliationReport:
+    wallets: int = 0
+    rows: int = 0
+    mismatches: list[Mismatch] = field(default_factory=list)
+
+    def merge(self, other: ReconciliationReport) -> None:
+        self.wallets += other.wallets
+        self.rows += other.rows
+        self.mismatches.extend(other.mismatches)
+
+
+def _range_sql(lo: uuid.UUID | None, hi: uuid.UUID | None) -> tuple[str, dict]:
+    conditions, params = [], {}
+    if lo is not None:
+        conditions.append("w.id >= %(lo)s")
+        params["lo"] = lo
+    if hi is not None:
+        conditions.append("w.id < %(hi)s")
+        params["hi"] = hi
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def _branches(select: str, where: str) -> str:
+    # Три ветки — по индексам (from_wallet|to_wallet|fee_wallet, created_at, id), без OR по всему леджеру.
+    return " UNION ALL ".join(
+        select.format(column=column, delta=delta) + where.format(column=column)
+        for column, delta in (
+            ("from_wallet_id", "-(t.amount + t.fee)"),
+            # Межвалютный перевод зачисляет to_amount в валюте получателя.
+            ("to_wallet_id", "coalesce(t.to_amount, t.amount)"),
+            ("fee_wallet_id", "t.fee"),
+        )
+    )
+
+
+def _reconcile_sql(range_where: str) -> str:
+    # horizon — самый ранний checkpoint диапазона: по нему Postgres во время выполнения отсекает партиции, уже
+    # свёрнутые в checkpoint (по сравнению кортежей он этого не делает).
+    moves = _branches(
+        "SELECT w.id AS wallet_id, {delta} AS delta, t.created_at FROM w JOIN " + _LEDGER + " t ON t.{column} = w.id ",
+        "AND t.created_at >= (SELECT since FROM horizon) AND (t.created_at, t.id) > (w.last_created_at, w.last_id) "
+        "WHERE t.status = %(success)s",
+    )
+    last = _branches(
+        "(SELECT t.created_at, t.id FROM " + _LEDGER + " t ",
+        "WHERE t.{column} = w.id AND t.created_at < %(cutoff)s ORDER BY t.created_at DESC, t.id DESC LIMIT 1)",
+    )
+    return f"""
+        WITH w AS (
+            SELECT w.id, w.balance,
+                   c.wallet_id IS NOT NULL AS has_checkpoint,
+                   coalesce(c.opening_balance, 0) AS opening_balance,
+                   coalesce(c.ledger_net, 0) AS ledger_net,
+                   coalesce(c.last_created_at, '-infinity') AS last_created_at,
+                   coalesce(c.last_transaction_id, %(nil_id)s) AS last_id,
+                   c.last_created_at AS checkpoint_created_at,
+                   c.last_transaction_id AS checkpoint_id
+            FROM {_WALLETS} w
+            LEFT JOIN {_CHECKPOINTS} c ON c.wallet_id = w.id
+            WHERE {range_where}
+        ),
+        horizon AS (SELECT min(last_created_at) AS since FROM w),
+        moves AS ({moves}),
+        totals AS (
+            SELECT wallet_id,
+                   count(*) AS rows,
+                   sum(delta) FILTER (WHERE created_at < %(cutoff)s) AS settled,
+                   sum(delta) FILTER (WHERE created_at >= %(cutoff)s) AS pending
+            FROM moves
+            GROUP BY wallet_id
+        )
+        SELECT w.id, w.balance, w.has_checkpoint, w.opening_balance, w.ledger_net,
+               coalesce(totals.rows, 0), coalesce(totals.settled, 0), coalesce(totals.pending, 0),
+               coalesce(last.created_at, w.checkpoint_created_at),
+               coalesce(last.id, w.checkpoint_id)
+        FROM w
+        LEFT JOIN totals ON totals.wallet_id = w.id
+        LEFT JOIN LATERAL (
+            SELECT created_at, id FROM ({last}) AS branches ORDER BY created_at DESC, id DESC LIMIT 1
+        ) last ON TRUE
+    """
+
+
+def reconcile_range(
+    lo: uuid.UUID | None = None,
+    hi: uuid.UUID | None = None,
+    *,
+    settle_lag: timedelta | None = None,
+    adopt_opening_balances: bool = False,
+) -> ReconciliationReport:
+    if settle_lag is None:
+        settle_lag = timedelta(seconds=getattr(settings, "RECONCILE_SETTLE_LAG", 300))
+    # created_at проставляется до COMMIT, поэтому строка со «старым» created_at может стать видимой позже.
+    # Checkpoint сдвигается только до cutoff; более свежие строки участвуют в сравнении, но не фиксируются.
+    cutoff = timezone.now() - settle_lag
+    range_where, range_params = _range_sql(lo, hi)
+
+    report = ReconciliationReport()
+    checkpoints: list[ReconciliationCheckpoint] = []
+    nested = connection.in_atomic_block
+    with transaction.atomic():
+        if not nested:
+            # Балансы и леджер читаются из одного снимка; параллельный прогон по тем же кошелькам
+            # упадёт с serialization failure на записи checkpoint, а не затрёт его.
+            with connection.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+        sql = _reconcile_sql(range_where)
+        params = {
+            "cutoff": cutoff,
+            "nil_id": _NIL_ID,
+            "success": TransactionStatus.SUCCESS,
+            **range_params,
+        }
+        with connection.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+
+        for (
+            wallet_id,
+            balance,
+            has_checkpoint,
+            opening,
+            ledger_net,
+            moved_rows,
+            settled,
+            pending,
+            last_created_at,
+            last_id,
+        ) in rows:
+            if not has_checkpoint and adopt_opening_balances:
+                # Первый прогон: считаем, что текущий баланс сходится, и фиксируем остаток как входящий.
+                opening = balance - settled - pending
+            expected = opening + ledger_net + settled + pending
+
+            report.wallets += 1
+            report.rows += moved_rows
+            if balance != expected:
+                report.mismatches.append(Mismatch(wallet_id=wallet_id, balance=balance, expected=expected))
+                logger.warning("reconcile mismatch wallet=%s balance=%s expected=%s", wallet_id, balance, expected)
+
+            checkpoints.append(
+                ReconciliationCheckpoint(
+                    wallet_id=wallet_id,
+                    opening_balance=opening,
+                    ledger_net=ledger_net + settled,
+                    last_created_at=last_created_at,
+                    last_transaction_id=last_id,
+                    last_diff=balance - expected,
+                )
+            )
+
+        ReconciliationCheckpoint.objects.bulk_create(
+            checkpoints,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["wallet"],
+            update_fields=[
+                "opening_balance",
+                "ledger_net",
+                "last_created_at",
+                "last_transaction_id",
+                "last_diff",
+                "checked_at",
+            ],
+        )
+    return report
+
+
+def wallet_ranges(parts: int) -> list[tuple[uuid.UUID | None, uuid.UUID | None]]:
+    if parts <= 1:
+        return [(None, None)]
+    # Границы — квантили реальных id, а не равные куски пространства uuid: так диапазоны ровные при любом генераторе id.
+    fractions = [i / parts for i in range(1, parts)]
+    with connection.cursor() as cur:
+        cur.execute(
+            f"SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY id) FROM {_WALLETS}",
+            [fractions],
+        )
+        bounds = cur.fetchone()[0] or []
+    bounds = sorted({b for b in bounds if b is not None})
+    edges = [None, *bounds, None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _reconcile_range_job(args) -> ReconciliationReport:
+    lo, hi, settle_lag, adopt_opening_balances = args
+    try:
+        return reconcile_range(lo, hi, settle_lag=settle_lag, adopt_opening_balances=adopt_opening_balances)
+    finally:
+        _close_connections()
+
+
+def _close_connections() -> None:
+    connections.close_all()
+    for conn in connections.all():
+        # Свойство pool создаёт пул при первом обращении — закрываем только уже открытые.
+        if conn.alias in getattr(conn, "_connection_pools", ()):
+            conn.close_pool()
+
+
+def reconcile(
+    *,
+    ranges: int = 1,
+    workers: int = 1,
+    settle_lag: timedelta | None = None,
+    adopt_opening_balances: bool = False,
+) -> ReconciliationReport:
+    jobs = [(lo, hi, settle_lag, adopt_opening_balances) for lo, hi in wallet_ranges(ranges)]
+    report = ReconciliationReport()
+    if workers <= 1:
+        for lo, hi, lag, adopt in jobs:
+            report.merge(reconcile_range(lo, hi, settle_lag=lag, adopt_opening_balances=adopt))
+        return report
+
+    # fork: дочерние процессы наследуют настроенный Django; соединение родителя закрываем до fork,
+    # чтобы ни один процесс не работал с чужим сокетом. Пул psycopg (DATABASE_POOL=1) тоже: его фоновые
+    # потоки через fork не переходят, и унаследованный пул ждал бы соединения до таймаута.
+    _close_connections()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+        for part in pool.map(_reconcile_range_job, jobs):
+            report.merge(part)
+    return report
+
+
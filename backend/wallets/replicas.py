@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import contextvars
+import itertools
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from wallets import metrics
+
+
+PRIMARY = "default"
+COOKIE = "read_lsn"
+HEADER = "X-Read-LSN"
+
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# На реплике — до какого LSN применён WAL и возраст последней применённой транзакции; вне recovery (стенд без
+# репликации, TEST MIRROR) — текущий LSN самого сервера.
+_PROBE_SQL = """
+SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END,
+       EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+"""
+
+
+def aliases() -> list[str]:
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def parse_lsn(value) -> int | None:
+    try:
+        hi, lo = str(value).split("/")
+        return (int(hi, 16) << 32) | int(lo, 16)
+    except ValueError:
+        return None
+
+
+def format_lsn(value: int) -> str:
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+
+@dataclass(frozen=True)
+class ReplicaState:
+    alias: str
+    available: bool
+    lag_seconds: float
+    replay_lsn: int
+    checked_at: float
+
+
+_states: dict[str, ReplicaState] = {}
+_states_lock = threading.Lock()
+_round_robin = itertools.count()
+
+
+def primary_lsn() -> int:
+    with connections[PRIMARY].cursor() as cur:
+        cur.execute("SELECT pg_current_wal_lsn()")
+        return parse_lsn(cur.fetchone()[0])
+
+
+async def aprimary_lsn() -> int:
+    # Async-view пишут через пул psycopg — LSN берём там же, без перехода в поток.
+    from wallets.async_services import get_pool
+
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cur = await conn.execute("SELECT pg_current_wal_lsn()")
+        return parse_lsn((await cur.fetchone())[0])
+
+
+def _probe(alias: str) -> ReplicaState:
+    now = time.monotonic()
+    try:
+        primary = primary_lsn()
+        with connections[alias].cursor() as cur:
+            cur.execute(_PROBE_SQL)
+            replay, replay_age = cur.fetchone()
+    except DatabaseError:
+        return ReplicaState(alias, available=False, lag_seconds=math.inf, replay_lsn=0, checked_at=now)
+    replay_lsn = parse_lsn(replay) or 0
+    # Догнала primary — отставания нет, даже если последняя транзакция была давно (простой без записей).
+    lag = 0.0 if replay_lsn >= primary else float(replay_age or 0)
+    return ReplicaState(alias, available=True, lag_seconds=lag, replay_lsn=replay_lsn, checked_at=now)
+
+
+def state(alias: str) -> ReplicaState:
+    # Проверка не чаще REPLICA_LAG_CHECK_INTERVAL на процесс; между проверками решения принимаются по кэшу.
+    interval = float(getattr(settings, "REPLICA_LAG_CHECK_INTERVAL", 1.0))
+    with _states_lock:
+        current = _states.get(alias)
+    if current is not None and time.monotonic() - current.checked_at < interval:
+        return current
+    current = _probe(alias)
+    with _states_lock:
+        _states[alias] = current
+    return current
+
+
+def states() -> list[ReplicaState]:
+    with _states_lock:
+        return [_states[alias] for alias in aliases() if alias in _states]
+
+
+def reset() -> None:
+    with _states_lock:
+        _states.clear()
+
+
+def choose(min_lsn: int | None = None) -> str:
+    max_lag = float(getattr(settings, "REPLICA_MAX_LAG", 1.0))
+    candidates = []
+    reason = "no_replica"
+    for alias in aliases():
+        s = state(alias)
+        if not s.available:
+            reason = "unavailable"
+        elif s.lag_seconds > max_lag:
+            reason = "lag"
+        elif min_lsn is not None and s.replay_lsn < min_lsn:
+            # Реплика ещё не применила запись этого клиента — читаем с primary, пока не догонит.
+            reason = "behind_write"
+        else:
+            candidates.append(alias)
+    if not candidates:
+        metrics.read_route("primary", reason)
+        return PRIMARY
+    metrics.read_route("replica", "ok")
+    return candidates[next(_round_robin) % len(candidates)]
+
+
+class _ReadContext:
+    __slots__ = ("min_lsn", "alias")
+
+    def __init__(self, min_lsn: int | None) -> None:
+        self.min_lsn = min_lsn
+        self.alias: str | None = None
+
+
+_context: contextvars.ContextVar[_ReadContext | None] = contextvars.ContextVar("wallets_read_context", default=None)
+
+
+def read_alias() -> str:
+    # Вне read-only запроса (запись, Celery, команды) всё читается с primary. Реплика выбирается при первом
+    # чтении и не меняется до конца запроса, чтобы запрос видел один снимок.
+    ctx = _context.get()
+    if ctx is None:
+        return PRIMARY
+    if ctx.alias is None:
+        ctx.alias = choose(ctx.min_lsn)
+    return ctx.alias
+
+
+def read_connection():
+    # Для сырого SQL мимо ORM (выписка): то же подключение, что выбрал бы роутер.
+    return connections[read_alias()]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        ctx = _context.get()
+        if ctx is not None:
+            # Запись посреди GET (например, сессия) — дальше этот запрос читает с primary.
+            ctx.alias = PRIMARY
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии primary, объекты с разных подключений ссылаются на одни и те же строки.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in aliases()
+
+
+def _requested_lsn(request) -> int | None:
+    values = [parse_lsn(request.headers.get(HEADER, "")), parse_lsn(request.COOKIES.get(COOKIE, ""))]
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _remember_write(response, lsn: int) -> None:
+    # Read-your-writes: LSN коммита уходит клиенту (cookie для браузера и админки, заголовок для API-клиентов),
+    # следующие чтения берут реплику, только если она применила WAL до этого места.
+    value = format_lsn(lsn)
+    response[HEADER] = value
+    response.set_cookie(
+        COOKIE,
+        value,
+        max_age=int(getattr(settings, "REPLICA_STICKY_SECONDS", 300)),
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not aliases():
+            return self.get_response(request)
+        if request.method in _SAFE_METHODS:
+            token = _context.set(_ReadContext(_requested_lsn(request)))
+            try:
+                return self.get_response(request)
+            finally:
+                _context.reset(token)
+        response = self.get_response(request)
+        if 200 <= response.status_code < 300:
+            _remember_write(response, primary_lsn())
+        return response
+
+    async def __acall__(self, request):
+        if not aliases():
+            return await self.get_response(request)
+        if request.method in _SAFE_METHODS:
+            token = _context.set(_ReadContext(_requested_lsn(request)))
+            try:
+                return await self.get_response(request)
+            finally:
+                _context.reset(token)
+        response = await self.get_response(request)
+        if 200 <= response.status_code < 300:
+            _remember_write(response, await aprimary_lsn())
+        return response
+
+
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from wallets import metrics
+
+
+T = TypeVar("T")
+
+SERIALIZATION_FAILURE = "40001"
+DEADLOCK_DETECTED = "40P01"
+RETRYABLE_SQLSTATES = frozenset({SERIALIZATION_FAILURE, DEADLOCK_DETECTED})
+
+ISOLATION_LEVELS = {
+    "read committed": "READ COMMITTED",
+    "repeatable read": "REPEATABLE READ",
+    "serializable": "SERIALIZABLE",
+}
+
+
+class RetriesExhausted(Exception):
+    def __init__(self, attempts: int, sqlstate: str):
+        super().__init__(f"транзакция не прошла после {attempts} попыток (SQLSTATE {sqlstate})")
+        self.attempts = attempts
+        self.sqlstate = sqlstate
+
+
+def isolation_level() -> str:
+    level = str(getattr(settings, "TRANSFER_ISOLATION_LEVEL", "read committed")).lower()
+    if level not in ISOLATION_LEVELS:
+        raise ValueError(f"Неизвестный TRANSFER_ISOLATION_LEVEL: {level}")
+    return level
+
+
+def set_isolation_sql() -> str | None:
+    # READ COMMITTED — уровень Postgres по умолчанию, лишний round trip не нужен.
+    level = isolation_level()
+    if level == "read committed":
+        return None
+    return f"SET TRANSACTION ISOLATION LEVEL {ISOLATION_LEVELS[level]}"
+
+
+def retryable_sqlstate(exc: BaseException) -> str | None:
+    # Django оборачивает ошибку psycopg в свою OperationalError; SQLSTATE лежит в __cause__.
+    while exc is not None:
+        sqlstate = getattr(exc, "sqlstate", None)
+        if sqlstate is not None:
+            return sqlstate if sqlstate in RETRYABLE_SQLSTATES else None
+        exc = exc.__cause__
+    return None
+
+
+def max_retries() -> int:
+    return int(getattr(settings, "TRANSFER_MAX_RETRIES", 5))
+
+
+def backoff_delay(attempt: int) -> float:
+    # Ограниченный экспоненциальный backoff с full jitter: столкнувшиеся транзакции не повторяются синхронно.
+    base = float(getattr(settings, "TRANSFER_RETRY_BACKOFF_BASE", 0.005))
+    cap = float(getattr(settings, "TRANSFER_RETRY_BACKOFF_MAX", 0.2))
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def _on_failure(exc: BaseException, attempt: int, path: str) -> float:
+    sqlstate = retryable_sqlstate(exc)
+    if sqlstate is None:
+        raise exc
+    if attempt >= max_retries():
+        metrics.transfer_result(path, "conflict")
+        raise RetriesExhausted(attempt + 1, sqlstate) from exc
+    metrics.transfer_retry(path, sqlstate)
+    return backoff_delay(attempt)
+
+
+def run(fn: Callable[[], T], *, path: str = "sync") -> T:
+    # Уже внутри транзакции: откат до savepoint не спасает снимок внешней транзакции,
+    # поэтому ошибка уходит наружу — повторять должен владелец внешнего atomic.
+    if connection.in_atomic_block:
+        with transaction.atomic():
+            return fn()
+
+    attempt = 0
+    while True:
+        try:
+            with transaction.atomic():
+                statement = set_isolation_sql()
+                if statement is not None:
+                    with connection.cursor() as cur:
+                        cur.execute(statement)
+                return fn()
+        except Exception as e:
+            delay = _on_failure(e, attempt, path)
+        attempt += 1
+        time.sleep(delay)
+
+
+async def arun(fn: Callable[[], Awaitable[T]], *, path: str = "async") -> T:
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            delay = _on_failure(e, attempt, path)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def atomic(path: str = "sync"):
+    # Замена @transaction.atomic для сервисов: та же транзакция, плюс уровень изоляции и повтор на 40001/40P01.
+    def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> T:
+            return run(functools.partial(fn, *args, **kwargs), path=path)
+
+        return wrapper
+
+    return decorator
+
+
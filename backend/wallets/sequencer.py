@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+import zlib
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
+
+from wallets import fees, ids, outbox
+from wallets.models import (
+    DEFAULT_WALLET_CLASS,
+    OutboxEvent,
+    SequencerCheckpoint,
+    Transaction,
+    TransactionStatus,
+    Wallet,
+)
+from wallets.services import (
+    InsufficientFunds,
+    InvalidTransfer,
+    TransferError,
+    _admin_wallet_id,
+    _apply_balances,
+    _q2,
+    _validate_transfer,
+    _wallet_currencies,
+)
+
+
+DEFAULT_NAME = "default"
+
+_FLUSH_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class SequencedTransfer:
+    id: str
+    from_wallet_id: str
+    to_wallet_id: str
+    fee_wallet_id: str
+    amount: Decimal
+    fee: Decimal
+    from_balance_after: Decimal
+    # Баланс получателя известен, только если он тоже в памяти sequencer.
+    to_balance_after: Decimal | None
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "from": self.from_wallet_id,
+            "to": self.to_wallet_id,
+            "fee_wallet": self.fee_wallet_id,
+            "amount": str(self.amount),
+            "fee": str(self.fee),
+            "from_after": str(self.from_balance_after),
+            "to_after": None if self.to_balance_after is None else str(self.to_balance_after),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> SequencedTransfer:
+        return cls(
+            id=data["id"],
+            from_wallet_id=data["from"],
+            to_wallet_id=data["to"],
+            fee_wallet_id=data["fee_wallet"],
+            amount=Decimal(data["amount"]),
+            fee=Decimal(data["fee"]),
+            from_balance_after=Decimal(data["from_after"]),
+            to_balance_after=None if data["to_after"] is None else Decimal(data["to_after"]),
+        )
+
+    @property
+    def total_debited(self) -> Decimal:
+        return _q2(self.amount + self.fee)
+
+    def ledger_row(self) -> Transaction:
+        return Transaction(
+            id=uuid.UUID(self.id),
+            from_wallet_id=self.from_wallet_id,
+            to_wallet_id=self.to_wallet_id,
+            amount=self.amount,
+            fee=self.fee,
+            fee_wallet_id=self.fee_wallet_id if self.fee > 0 else None,
+            from_balance_after=self.from_balance_after,
+            to_balance_after=self.to_balance_after,
+            status=TransactionStatus.SUCCESS,
+        )
+
+
+@dataclass(frozen=True)
+class TransferRequest:
+    from_wallet_id: str
+    to_wallet_id: str
+    amount: Decimal
+
+
+@dataclass(frozen=True)
+class Outcome:
+    transfer: SequencedTransfer | None = None
+    error: TransferError | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.transfer is not None
+
+
+class LedgerEngine:
+    # Балансы «горячих» кошельков в памяти; переводы применяются строго последовательно одним потоком,
+    # с теми же проверками и комиссией, что и transfer(). Всё, что не в памяти, меняется только дельтами при flush.
+    def __init__(
+        self,
+        balances: dict[str, Decimal],
+        *,
+        currencies: Callable[[list[str]], dict[str, str]] = _wallet_currencies,
+        admin_wallet_id: Callable[[str], str] = lambda currency: _admin_wallet_id(currency, 0),
+        wallet_classes: dict[str, str] | None = None,
+        reserved: dict[str, Decimal] | None = None,
+    ) -> None:
+        self.balances = balances
+        self.wallet_classes = wallet_classes or {}
+        # Резервы холдов (Wallet.reserved): списывать можно только balance - reserved, как в transfer().
+        # Новые холды на кошельки sequencer не создаются, поэтому резерв между flush может только уменьшиться.
+        self.reserved = reserved or {}
+        self._currencies = currencies
+        self._admin_wallet_id = admin_wallet_id
+        self.pending: list[SequencedTransfer] = []
+
+    def apply(self, request: TransferRequest) -> Outcome:
+        try:
+            return Outcome(transfer=self._apply(request))
+        except TransferError as e:
+            return Outcome(error=e)
+
+    def _apply(self, request: TransferRequest) -> SequencedTransfer:
+        from_wallet_id, to_wallet_id, amount = _validate_transfer(
+            request.from_wallet_id, request.to_wallet_id, request.amount
+        )
+        if from_wallet_id not in self.balances:
+            raise InvalidTransfer("from_wallet не обслуживается sequencer")
+
+        currencies = self._currencies([from_wallet_id, to_wallet_id])
+        if to_wallet_id not in currencies:
+            raise InvalidTransfer("Один или несколько кошельков не найдены")
+        currency = currencies[from_wallet_id]
+        admin_id = self._admin_wallet_id(currency)
+        if admin_id in (from_wallet_id, to_wallet_id):
+            raise InvalidTransfer("Один или несколько кошельков не найдены")
+        if currencies[to_wallet_id] != currency:
+            raise InvalidTransfer("Валюты кошельков не совпадают")
+
+        wallet_class = self.wallet_classes.get(from_wallet_id, DEFAULT_WALLET_CLASS)
+        fee = fees.current().fee(amount, currency, wallet_class)
+        total = _q2(amount + fee)
+        if self.balances[from_wallet_id] - self.reserved.get(from_wallet_id, Decimal("0.00")) < total:
+            raise InsufficientFunds("Insufficient funds")
+
+        transfer = SequencedTransfer(
+            id=str(ids.new_id()),
+            from_wallet_id=from_wallet_id,
+            to_wallet_id=to_wallet_id,
+            fee_wallet_id=admin_id,
+            amount=amount,
+            fee=fee,
+            from_balance_after=_q2(self.balances[from_wallet_id] - total),
+            to_balance_after=_q2(self.balances[to_wallet_id] + amount) if to_wallet_id in self.balances else None,
+        )
+        self.replay(transfer)
+        return transfer
+
+    def replay(self, transfer: SequencedTransfer) -> None:
+        # Применение уже проверенного перевода: из apply() и при восстановлении из WAL.
+        if transfer.from_wallet_id in self.balances:
+            self.balances[transfer.from_wallet_id] = transfer.from_balance_after
+        if transfer.to_wallet_id in self.balances:
+            self.balances[transfer.to_wallet_id] = _q2(self.balances[transfer.to_wallet_id] + transfer.amount)
+        self.pending.append(transfer)
+
+    def deltas(self) -> dict[str, Decimal]:
+        deltas: dict[str, Decimal] = {}
+        for t in self.pending:
+            for wallet_id, delta in (
+                (t.from_wallet_id, -t.total_debited),
+                (t.to_wallet_id, t.amount),
+                (t.fee_wallet_id, t.fee),
+            ):
+                deltas[wallet_id] = deltas.get(wallet_id, Decimal("0.00")) + delta
+        return deltas
+
+
+class WriteAheadLog:
+    # Строка на пакет: "<crc32> <json>\n". Пакет считается принятым только после fsync — до ответа клиентам.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab")
+
+    def append(self, seq: int, transfers: list[SequencedTransfer]) -> None:
+        body = json.dumps({"seq": seq, "transfers": [t.as_dict() for t in transfers]}, separators=(",", ":"))
+        data = body.encode()
+        self._file.write(b"%08x %s\n" % (zlib.crc32(data), data))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def records(self) -> Iterator[tuple[int, list[SequencedTransfer]]]:
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                crc, _, data = line.rstrip(b"\n").partition(b" ")
+                # Оборванная последняя запись (падение посреди write) — не подтверждена клиентам, отбрасываем.
+                if not line.endswith(b"\n") or crc != b"%08x" % zlib.crc32(data):
+                    break
+                good += len(line)
+                record = json.loads(data)
+                yield record["seq"], [SequencedTransfer.from_dict(t) for t in record["transfers"]]
+        if good != os.path.getsize(self.path):
+            self._truncate(good)
+
+    def reset(self) -> None:
+        # Всё из WAL уже в Postgres (checkpoint закоммичен) — журнал можно начать с нуля.
+        self._truncate(0)
+
+    def _truncate(self, size: int) -> None:
+        self._file.flush()
+        os.truncate(self.path, size)
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Sequencer:
+    def __init__(self, engine: LedgerEngine, wal: WriteAheadLog, *, name: str = DEFAULT_NAME, seq: int = 0) -> None:
+        self.engine = engine
+        self.wal = wal
+        self.name = name
+        self.seq = seq
+
+    @classmethod
+    def open(cls, wallet_ids: list[str], wal_path: str, *, name: str = DEFAULT_NAME) -> Sequencer:
+        # Восстановление: балансы из Postgres уже включают всё до checkpoint.last_seq, остаток доигрывается из WAL.
+        rows = list(
+            Wallet.objects.filter(id__in=wallet_ids).values_list("id", "balance", "reserved", "wallet_class")
+        )
+        balances = {str(wallet_id): balance for wallet_id, balance, _, _ in rows}
+        reserved = {str(wallet_id): amount for wallet_id, _, amount, _ in rows}
+        wallet_classes = {str(wallet_id): wallet_class for wallet_id, _, _, wallet_class in rows}
+        missing = set(map(str, wallet_ids)) - set(balances)
+        if missing:
+            raise InvalidTransfer(f"Кошельки не найдены: {', '.join(sorted(missing))}")
+
+        checkpoint, _ = SequencerCheckpoint.objects.get_or_create(name=name)
+        engine = LedgerEngine(balances, wallet_classes=wallet_classes, reserved=reserved)
+        sequencer = cls(engine, WriteAheadLog(wal_path), name=name, seq=checkpoint.last_seq)
+        for seq, transfers in sequencer.wal.records():
+            if seq <= checkpoint.last_seq:
+                continue
+            for transfer in transfers:
+                sequencer.engine.replay(transfer)
+            sequencer.seq = seq
+        sequencer.flush()
+        return sequencer
+
+    def submit(self, requests: list[TransferRequest]) -> list[Outcome]:
+        outcomes = [self.engine.apply(request) for request in requests]
+        applied = [outcome.transfer for outcome in outcomes if outcome.ok]
+        if applied:
+            # Если запись в WAL упала, память уже разошлась с журналом: процесс должен упасть и восстановиться.
+            self.seq += 1
+            self.wal.append(self.seq, applied)
+        return outcomes
+
+    def flush(self) -> int:
+        pending = self.engine.pending
+        ledger = [t.ledger_row() for t in pending]
+        with transaction.atomic():
+            if ledger:
+                _apply_balances(self.engine.deltas(), [])
+                Transaction.objects.bulk_create(ledger, batch_size=_FLUSH_BATCH_SIZE)
+                events = [outbox.notification_event(tx) for tx in ledger]
+                OutboxEvent.objects.bulk_create(events, batch_size=_FLUSH_BATCH_SIZE)
+                SequencerCheckpoint.objects.filter(name=self.name).update(last_seq=self.seq)
+            # После flush память равна Postgres: заодно подхватываются зачисления, прошедшие мимо sequencer.
+            rows = list(
+                Wallet.objects.filter(id__in=list(self.engine.balances)).values_list("id", "balance", "reserved")
+            )
+
+        self.engine.balances.update({str(wallet_id): balance for wallet_id, balance, _ in rows})
+        self.engine.reserved.update({str(wallet_id): reserved for wallet_id, _, reserved in rows})
+        if ledger:
+            self.engine.pending = []
+            self.wal.reset()
+        return len(ledger)
+
+    def close(self) -> None:
+        self.wal.close()
+
+
+def acquire_writer_lock(name: str = DEFAULT_NAME) -> bool:
+    # Единственный писатель: session-level advisory lock живёт, пока живо соединение процесса.
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [f"wallets.sequencer:{name}"])
+        return cur.fetchone()[0]
+
+
+class SequencerUnavailable(Exception):
+    pass
+
+
+_client: redis.Redis | None = None
+
+
+def _redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        url = getattr(settings, "SEQUENCER_REDIS_URL", "") or settings.CELERY_BROKER_URL
+        _client = redis.Redis.from_url(url)
+    return _client
+
+
+def _requests_key(name: str) -> str:
+    return f"sequencer:{name}:requests"
+
+
+def _reply_key(name: str, request_id: str) -> str:
+    return f"sequencer:{name}:reply:{request_id}"
+
+
+def _reply_timeout() -> float:
+    return float(getattr(settings, "SEQUENCER_REPLY_TIMEOUT", 5.0))
+
+
+def call(request: TransferRequest, *, name: str = DEFAULT_NAME) -> Outcome:
+    # Запрос в очередь Redis, ответ — в личный список. Sequencer не берёт запросы с истёкшим deadline,
+    # а клиент ждёт чуть дольше deadline: «ушёл по таймауту, но перевод прошёл» исключено.
+    timeout = _reply_timeout()
+    request_id = uuid.uuid4().hex
+    client = _redis()
+    try:
+        client.rpush(
+            _requests_key(name),
+            json.dumps(
+                {
+                    "id": request_id,
+                    "from": request.from_wallet_id,
+                    "to": request.to_wallet_id,
+                    "amount": str(request.amount),
+                    "deadline": time.time() + timeout,
+                }
+            ),
+        )
+        reply = client.blpop([_reply_key(name, request_id)], timeout=max(1, round(timeout + 1)))
+    except redis.RedisError as e:
+        raise SequencerUnavailable("sequencer недоступен") from e
+    if reply is None:
+        raise SequencerUnavailable("sequencer не ответил вовремя")
+    return decode_outcome(json.loads(reply[1]))
+
+
+def encode_outcome(outcome: Outcome) -> dict:
+    if outcome.ok:
+        return {"ok": True, "transfer": outcome.transfer.as_dict()}
+    kind = "insufficient_funds" if isinstance(outcome.error, InsufficientFunds) else "invalid"
+    return {"ok": False, "error": kind, "detail": str(outcome.error)}
+
+
+def decode_outcome(data: dict) -> Outcome:
+    if data["ok"]:
+        return Outcome(transfer=SequencedTransfer.from_dict(data["transfer"]))
+    error = InsufficientFunds if data["error"] == "insufficient_funds" else InvalidTransfer
+    return Outcome(error=error(data["detail"]))
+
+
+def serve_batch(sequencer: Sequencer, client: redis.Redis, *, batch_size: int, block: float) -> int:
+    key = _requests_key(sequencer.name)
+    first = client.blpop([key], timeout=block)
+    if first is None:
+        return 0
+    raw = [first[1]]
+    if batch_size > 1:
+        raw.extend(client.lpop(key, batch_size - 1) or [])
+
+    now = time.time()
+    requests = [json.loads(item) for item in raw]
+    live = [r for r in requests if r["deadline"] > now]
+    outcomes = sequencer.submit([TransferRequest(r["from"], r["to"], Decimal(r["amount"])) for r in live])
+
+    # Ответы — только после fsync WAL внутри submit().
+    pipe = client.pipeline(transaction=False)
+    for r, outcome in zip(live, outcomes):
+        reply_key = _reply_key(sequencer.name, r["id"])
+        pipe.rpush(reply_key, json.dumps(encode_outcome(outcome)))
+        pipe.expire(reply_key, 60)
+    pipe.execute()
+    return len(live)
+
+
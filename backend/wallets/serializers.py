@@ -1,7 +1,11 @@
 from decimal import Decimal
 
+from django.conf import settings
 from rest_framework import serializers
 
+from wallets.services import BATCH_ALL_OR_NOTHING, BATCH_BEST_EFFORT
+from wallets.statements import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
 
 class TransferRequestSerializer(serializers.Serializer):
     from_wallet_id = serializers.UUIDField()
@@ -14,3 +18,39 @@ class TransferRequestSerializer(serializers.Serializer):
         return value
 
 
+class HoldRequestSerializer(serializers.Serializer):
+    wallet_id = serializers.UUIDField()
+    to_wallet_id = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=18, decimal_places=2)
+    ttl_seconds = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_amount(self, value: Decimal) -> Decimal:
+        if value <= 0:
+            raise serializers.ValidationError("amount должен быть > 0")
+        return value
+
+
+class HoldCaptureSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=18, decimal_places=2, required=False)
+
+    def validate_amount(self, value: Decimal) -> Decimal:
+        if value <= 0:
+            raise serializers.ValidationError("amount должен быть > 0")
+        return value
+
+
+class BatchTransferRequestSerializer(serializers.Serializer):
+    mode = serializers.ChoiceField(choices=[BATCH_ALL_OR_NOTHING, BATCH_BEST_EFFORT], default=BATCH_ALL_OR_NOTHING)
+    items = serializers.ListField(
+        child=TransferRequestSerializer(),
+        allow_empty=False,
+        max_length=getattr(settings, "TRANSFER_BATCH_MAX_ITEMS", 5000),
+    )
+
+
+class WalletStatementQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE)
+    cursor = serializers.CharField(required=False, allow_blank=False)
+    include_balance = serializers.BooleanField(default=False)
+
+
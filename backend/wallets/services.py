@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import copy
+import functools
+import random
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
 from django.conf import settings
-from django.db import IntegrityError, transaction
-from django.db.models import F
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.utils import timezone
 
-from wallets.models import Transaction, TransactionStatus, Wallet
+from wallets import contention, fees, fx, metrics, outbox, retry, sql, wallet_cache
+from wallets.models import OutboxEvent, Transaction, TransactionStatus, Wallet
 
 
 class TransferError(Exception):
@@ -21,19 +26,239 @@ class InvalidTransfer(TransferError):
     pass
 
 
+class OptimisticConflict(Exception):
+    # Кошелёк изменился между чтением и условным UPDATE. Для retry это serialization failure:
+    # транзакция откатывается и повторяется, а кошелёк уже помечен как «горячий».
+    sqlstate = retry.SERIALIZATION_FAILURE
+
+    def __init__(self, wallet_ids: list[str]):
+        super().__init__(f"версия кошельков изменилась: {', '.join(wallet_ids)}")
+        self.wallet_ids = wallet_ids
+
+
 def _q2(value: Decimal) -> Decimal:
     return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
-def _ensure_admin_wallet(currency: str) -> Wallet:
-    owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+def _admin_owner() -> str:
+    return getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+
+def _admin_shards() -> int:
+    return max(1, int(getattr(settings, "ADMIN_WALLET_SHARDS", 1)))
+
+
+def _pick_admin_shard() -> int:
+    shards = _admin_shards()
+    return random.randrange(shards) if shards > 1 else 0
+
+
+def _ensure_admin_wallet(currency: str, shard: int = 0) -> Wallet:
+    owner = _admin_owner()
     try:
-        return Wallet.objects.get(owner_name=owner, currency=currency)
+        return Wallet.objects.get(owner_name=owner, currency=currency, shard=shard)
     except Wallet.DoesNotExist:
         try:
-            return Wallet.objects.create(owner_name=owner, currency=currency, balance=Decimal("0.00"))
+            return Wallet.objects.create(owner_name=owner, currency=currency, shard=shard, balance=Decimal("0.00"))
         except IntegrityError:
-            return Wallet.objects.get(owner_name=owner, currency=currency)
+            return Wallet.objects.get(owner_name=owner, currency=currency, shard=shard)
+
+
+def admin_wallet_balance(currency: str) -> Decimal:
+    total = (
+        Wallet.objects.filter(owner_name=_admin_owner(), currency=currency)
+        .aggregate(total=Sum("balance"))["total"]
+    )
+    return total if total is not None else Decimal("0.00")
+
+
+def _fee_for(amount: Decimal, wallet: Wallet, schedule: fees.FeeSchedule | None = None) -> Decimal:
+    # Тариф — по валюте и классу кошелька-отправителя из снимка правил процесса (wallets.fees), без запросов.
+    return (schedule or fees.current()).fee(amount, wallet.currency, wallet.wallet_class)
+
+
+_LOCK_WALLETS_SQL = f"""
+SELECT {sql.columns(Wallet)}
+FROM wallets_wallet
+WHERE id = ANY(%s::uuid[])
+ORDER BY id
+FOR UPDATE
+"""
+
+
+_READ_WALLETS_SQL = f"""
+SELECT {sql.columns(Wallet)}
+FROM wallets_wallet
+WHERE id = ANY(%s::uuid[])
+"""
+
+LOCKING_PESSIMISTIC = "pessimistic"
+LOCKING_OPTIMISTIC = "optimistic"
+
+
+def _wallets_from_rows(rows, alias: str) -> dict[str, Wallet]:
+    return {str(w.id): w for w in sql.from_rows(Wallet, rows, alias)}
+
+
+def _lock_wallets(wallet_ids: list[str]) -> dict[str, Wallet]:
+    with connection.cursor() as cursor:
+        cursor.execute(_LOCK_WALLETS_SQL, [wallet_ids])
+        return _wallets_from_rows(cursor.fetchall(), connection.alias)
+
+
+def _read_wallets(wallet_ids: list[str]) -> dict[str, Wallet]:
+    with connection.cursor() as cursor:
+        cursor.execute(_READ_WALLETS_SQL, [wallet_ids])
+        return _wallets_from_rows(cursor.fetchall(), connection.alias)
+
+
+def _optimistic(wallet_ids: list[str]) -> bool:
+    mode = getattr(settings, "TRANSFER_LOCKING_MODE", LOCKING_PESSIMISTIC)
+    return mode == LOCKING_OPTIMISTIC and not contention.hot_wallets.any_hot(wallet_ids)
+
+
+def _check_versions(deltas: dict[str, Decimal], balances: dict[str, Decimal], path: str) -> None:
+    # Условный UPDATE не нашёл списываемую строку — её версия ушла вперёд. Часть строк уже обновлена, поэтому
+    # откатывается вся транзакция; кошелёк помечается «горячим», и повтор пойдёт через FOR UPDATE.
+    stale = [wallet_id for wallet_id, delta in deltas.items() if delta < 0 and wallet_id not in balances]
+    if stale:
+        contention.hot_wallets.mark(stale, float(getattr(settings, "TRANSFER_CONTENTION_TTL", 30)))
+        metrics.optimistic_conflict(path)
+        raise OptimisticConflict(stale)
+
+
+_FIX_TO_BALANCE_SQL = f"UPDATE {Transaction._meta.db_table} SET to_balance_after = %s WHERE id = %s AND created_at = %s"
+
+
+def _stale_credit(tx: Transaction, balances: dict[str, Decimal]) -> list | None:
+    # Зачисление в оптимистичном режиме не сверяет version: если баланс получателя изменился между чтением и
+    # UPDATE, to_balance_after строки леджера переписывается по RETURNING. Возвращает параметры _FIX_TO_BALANCE_SQL.
+    actual = balances.get(str(tx.to_wallet_id))
+    if actual is None or actual == tx.to_balance_after:
+        return None
+    tx.to_balance_after = actual
+    return [actual, tx.id, tx.created_at]
+
+
+def _wallet_currencies(wallet_ids: list[str]) -> dict[str, str]:
+    return wallet_cache.wallet_currencies.get_many_or_load(
+        wallet_ids,
+        lambda ids: {
+            str(wallet_id): currency
+            for wallet_id, currency in Wallet.objects.filter(id__in=ids).values_list("id", "currency")
+        },
+    )
+
+
+def _admin_wallet_id(currency: str, shard: int) -> str:
+    return wallet_cache.admin_wallet_ids.get_or_load(
+        (currency, shard),
+        lambda key: str(_ensure_admin_wallet(currency=key[0], shard=key[1]).id),
+    )
+
+
+def _apply_balances_sql(
+    deltas: dict[str, Decimal],
+    ledger: list[Transaction],
+    *,
+    events: list[OutboxEvent] = (),
+    admin_shard: Wallet | None = None,
+    versions: dict[str, int] | None = None,
+    db=connection,
+) -> tuple[str, list]:
+    # Один запрос: UPDATE балансов по дельтам + INSERT строк леджера и событий outbox; новые балансы — из RETURNING.
+    # Если передан admin_shard, тем же запросом считаем сумму остальных шардов его admin-кошелька.
+    # versions — оптимистичный режим: списание проходит, только если version строки не изменилась с момента чтения.
+    # Зачисления (получатель, admin-шард комиссии) применяются безусловно: общий admin-шард меняется на каждом
+    # переводе с комиссией, и проверка его version превращала бы любые два таких перевода в конфликт.
+    deltas = {wallet_id: delta for wallet_id, delta in deltas.items() if delta}
+    params: list = []
+    for wallet_id, delta in deltas.items():
+        params.extend([wallet_id, delta])
+        if versions is not None:
+            params.append(versions[wallet_id])
+    for tx in ledger:
+        params.extend(sql.insert_params(tx, db))
+    for event in events:
+        params.extend(sql.insert_params(event, db))
+
+    if versions is None:
+        delta_rows = ", ".join(["(%s::uuid, %s::numeric)"] * len(deltas))
+        statement = f"""
+WITH updated AS (
+    UPDATE wallets_wallet AS w
+    SET balance = w.balance + d.delta, version = w.version + 1
+    FROM (VALUES {delta_rows}) AS d(id, delta)
+    WHERE w.id = d.id
+    RETURNING w.id, w.balance
+)"""
+    else:
+        # Строки захватываются тем же запросом в порядке id: два встречных оптимистичных перевода не ловят deadlock,
+        # а проигравший после ожидания видит новую version списываемой строки и не попадает в locked.
+        delta_rows = ", ".join(["(%s::uuid, %s::numeric, %s::bigint)"] * len(deltas))
+        statement = f"""
+WITH d(id, delta, version) AS (
+    VALUES {delta_rows}
+), locked AS (
+    SELECT w.id
+    FROM wallets_wallet AS w
+    JOIN d ON d.id = w.id
+    WHERE d.delta > 0 OR (w.version = d.version AND w.balance - w.reserved + d.delta >= 0)
+    ORDER BY w.id
+    FOR UPDATE OF w
+), updated AS (
+    UPDATE wallets_wallet AS w
+    SET balance = w.balance + d.delta, version = w.version + 1
+    FROM d
+    WHERE w.id = d.id AND (d.delta > 0 OR w.version = d.version) AND w.id IN (SELECT id FROM locked)
+    RETURNING w.id, w.balance
+)"""
+    if ledger:
+        statement += f""", inserted AS (
+    {sql.insert_sql(Transaction, len(ledger))}
+)"""
+    if events:
+        statement += f""", outboxed AS (
+    {sql.insert_sql(OutboxEvent, len(events))}
+)"""
+    statement += """
+SELECT id, balance FROM updated
+"""
+    if admin_shard is not None:
+        statement += """UNION ALL
+SELECT NULL, COALESCE(SUM(balance), 0)
+FROM wallets_wallet
+WHERE owner_name = %s AND currency = %s AND id <> %s::uuid
+"""
+        params.extend([admin_shard.owner_name, admin_shard.currency, str(admin_shard.id)])
+    return statement, params
+
+
+def _read_applied(rows) -> tuple[dict[str, Decimal], Decimal]:
+    balances: dict[str, Decimal] = {}
+    other_shards = Decimal("0.00")
+    for wallet_id, balance in rows:
+        if wallet_id is None:
+            other_shards = balance
+        else:
+            balances[str(wallet_id)] = balance
+    return balances, other_shards
+
+
+def _apply_balances(
+    deltas: dict[str, Decimal],
+    ledger: list[Transaction],
+    *,
+    events: list[OutboxEvent] = (),
+    admin_shard: Wallet | None = None,
+    versions: dict[str, int] | None = None,
+) -> tuple[dict[str, Decimal], Decimal]:
+    statement, params = _apply_balances_sql(deltas, ledger, events=events, admin_shard=admin_shard, versions=versions)
+    with connection.cursor() as cursor:
+        cursor.execute(statement, params)
+        applied = _read_applied(cursor.fetchall())
+    sql.mark_saved(ledger, connection.alias)
+    return applied
 
 
 @dataclass(frozen=True)
@@ -45,79 +270,465 @@ class TransferResult:
     amount: Decimal
     fee: Decimal
     total_debited: Decimal
+    admin_balance: Decimal
 
 
-@transaction.atomic
-def transfer(*, from_wallet_id: str, to_wallet_id: str, amount: Decimal) -> TransferResult:
+def sequenced_wallets() -> frozenset[str]:
+    return _sequenced_set(tuple(getattr(settings, "SEQUENCER_WALLETS", ())))
+
+
+@functools.lru_cache(maxsize=8)
+def _sequenced_set(wallet_ids: tuple) -> frozenset[str]:
+    return frozenset(str(wallet_id) for wallet_id in wallet_ids)
+
+
+def _reject_sequenced(from_wallet_id: str) -> None:
+    # Списания с кошельков sequencer идут только через него: Postgres не видит его ещё не сброшенных списаний.
+    if from_wallet_id in sequenced_wallets():
+        raise InvalidTransfer("from_wallet обслуживается sequencer")
+
+
+def _validate_transfer(from_wallet_id, to_wallet_id, amount: Decimal) -> tuple[str, str, Decimal]:
     if from_wallet_id == to_wallet_id:
         raise InvalidTransfer("from_wallet_id и to_wallet_id должны отличаться")
 
     if amount <= 0:
         raise InvalidTransfer("amount должен быть > 0")
 
-    amount = _q2(amount)
-
-    from_currency = (
-        Wallet.objects.filter(id=from_wallet_id).values_list("currency", flat=True).first()
-    )
-    if not from_currency:
-        raise InvalidTransfer("from_wallet не найден")
-
-    admin_wallet = _ensure_admin_wallet(currency=from_currency)
-
-    wallet_ids: list[str] = [str(from_wallet_id), str(to_wallet_id), str(admin_wallet.id)]
-    wallets = list(
-        Wallet.objects.select_for_update()
-        .filter(id__in=wallet_ids)
-        .order_by("id")
-    )
-    if len(wallets) != 3:
+    return str(from_wallet_id), str(to_wallet_id), _q2(amount)
+
+
+def _fx_rate(base: str, quote: str, rates: fx.RateTable | None = None) -> Decimal:
+    # Курс берётся из снимка процесса (wallets.fx); запрос к БД — только при проверке версии раз в интервал.
+    rates = rates or fx.current()
+    rate = rates.rate(base, quote)
+    if rate is None:
+        raise InvalidTransfer(f"Валюты кошельков не совпадают, курса {base}/{quote} нет")
+    max_age = float(getattr(settings, "FX_RATES_MAX_AGE", 0))
+    if max_age and (timezone.now() - rates.published_at).total_seconds() > max_age:
+        raise InvalidTransfer(f"Курс {base}/{quote} устарел")
+    return rate
+
+
+def _check_locked_wallets(
+    by_id: dict[str, Wallet],
+    from_wallet_id: str,
+    to_wallet_id: str,
+    admin_id: str,
+    rates: fx.RateTable | None = None,
+) -> tuple[Wallet, Wallet, Wallet]:
+    from_wallet = by_id[from_wallet_id]
+    admin_wallet = by_id[admin_id]
+    to_wallet = by_id.get(to_wallet_id)
+    if to_wallet is None or admin_id in (from_wallet_id, to_wallet_id):
         raise InvalidTransfer("Один или несколько кошельков не найдены")
 
-    by_id = {str(w.id): w for w in wallets}
-    from_wallet = by_id[str(from_wallet_id)]
-    to_wallet = by_id[str(to_wallet_id)]
-    admin_wallet = by_id[str(admin_wallet.id)]
-
     if from_wallet.currency != to_wallet.currency:
-        raise InvalidTransfer("Валюты кошельков не совпадают")
+        _fx_rate(from_wallet.currency, to_wallet.currency, rates)
     if admin_wallet.currency != from_wallet.currency:
         raise InvalidTransfer("Неподдерживаемая валюта/несовпадение валют")
-
-    fee = Decimal("0.00")
-    if amount > Decimal("1000.00"):
-        fee = _q2(amount * Decimal("0.10"))
-
+    return from_wallet, to_wallet, admin_wallet
+
+
+def _convert(
+    from_wallet: Wallet,
+    to_wallet: Wallet,
+    amount: Decimal,
+    rates: fx.RateTable | None,
+) -> tuple[Decimal | None, Decimal]:
+    # Комиссия и списание — в валюте from_wallet, зачисление — amount по курсу в валюте to_wallet.
+    if from_wallet.currency == to_wallet.currency:
+        return None, amount
+    rate = _fx_rate(from_wallet.currency, to_wallet.currency, rates)
+    credit = fx.convert(amount, rate)
+    if credit <= 0:
+        raise InvalidTransfer("Сумма после конвертации меньше 0.01")
+    return rate, credit
+
+
+def _prepare_transfer(
+    from_wallet: Wallet,
+    to_wallet: Wallet,
+    admin_wallet: Wallet,
+    amount: Decimal,
+    rates: fx.RateTable | None = None,
+    schedule: fees.FeeSchedule | None = None,
+) -> tuple[Transaction, dict[str, Decimal], Decimal, Decimal]:
+    fee = _fee_for(amount, from_wallet, schedule)
     total = _q2(amount + fee)
 
-    if from_wallet.balance < total:
+    # Зарезервированное холдами списать нельзя.
+    if from_wallet.balance - from_wallet.reserved < total:
         raise InsufficientFunds("Insufficient funds")
 
-    Wallet.objects.filter(id=from_wallet.id).update(balance=F("balance") - total)
-    Wallet.objects.filter(id=to_wallet.id).update(balance=F("balance") + amount)
-    if fee > 0:
-        Wallet.objects.filter(id=admin_wallet.id).update(balance=F("balance") + fee)
-
-    tx = Transaction.objects.create(
+    rate, credit = _convert(from_wallet, to_wallet, amount, rates)
+    tx = Transaction(
         from_wallet=from_wallet,
         to_wallet=to_wallet,
         amount=amount,
         fee=fee,
+        fee_wallet=admin_wallet if fee > 0 else None,
+        to_amount=None if rate is None else credit,
+        fx_rate=rate,
+        from_balance_after=_q2(from_wallet.balance - total),
+        to_balance_after=_q2(to_wallet.balance + credit),
         status=TransactionStatus.SUCCESS,
     )
-
-    from_wallet.refresh_from_db()
-    to_wallet.refresh_from_db()
-    admin_wallet.refresh_from_db()
+    deltas = {
+        str(from_wallet.id): -total,
+        str(to_wallet.id): credit,
+        str(admin_wallet.id): fee,
+    }
+    return tx, deltas, fee, total
+
+
+def _transfer_result(
+    tx: Transaction,
+    wallets: tuple[Wallet, Wallet, Wallet],
+    balances: dict[str, Decimal],
+    other_shards: Decimal,
+) -> TransferResult:
+    from_wallet, to_wallet, admin_wallet = wallets
+    for wallet in wallets:
+        wallet.balance = balances.get(str(wallet.id), wallet.balance)
 
     return TransferResult(
         transaction=tx,
         from_wallet=from_wallet,
         to_wallet=to_wallet,
         admin_wallet=admin_wallet,
-        amount=amount,
-        fee=fee,
-        total_debited=total,
+        amount=tx.amount,
+        fee=tx.fee,
+        total_debited=_q2(tx.amount + tx.fee),
+        admin_balance=admin_wallet.balance + other_shards,
+    )
+
+
+@retry.atomic("sync")
+def transfer(*, from_wallet_id: str, to_wallet_id: str, amount: Decimal) -> TransferResult:
+    from_wallet_id, to_wallet_id, amount = _validate_transfer(from_wallet_id, to_wallet_id, amount)
+    _reject_sequenced(from_wallet_id)
+
+    # Валюта и id admin-шарда берутся из кэша метаданных, так что до блокировки запросов нет.
+    with metrics.stage("currency"):
+        currency = _wallet_currencies([from_wallet_id]).get(from_wallet_id)
+    if currency is None:
+        raise InvalidTransfer("from_wallet не найден")
+
+    admin_shard = _pick_admin_shard()
+    with metrics.stage("admin_wallet"):
+        admin_id = _admin_wallet_id(currency, admin_shard)
+    # Снимки тарифов и курсов берутся до блокировки: проверка их версий (раз в интервал) не идёт под FOR UPDATE.
+    schedule, rates = fees.current(), fx.current()
+    # Оптимистичный режим: кошельки читаются без FOR UPDATE, конфликт ловит условный UPDATE по version. «Горячим»
+    # бывает только списываемый кошелёк — зачисления version не сверяют.
+    optimistic = _optimistic([from_wallet_id])
+    fetch = _read_wallets if optimistic else _lock_wallets
+    if optimistic:
+        with metrics.stage("read"):
+            by_id = fetch([from_wallet_id, to_wallet_id, admin_id])
+    else:
+        with metrics.stage("lock"), metrics.lock_wait():
+            by_id = fetch([from_wallet_id, to_wallet_id, admin_id])
+    from_wallet = by_id.get(from_wallet_id)
+    if from_wallet is None:
+        wallet_cache.wallet_currencies.invalidate(from_wallet_id)
+        raise InvalidTransfer("from_wallet не найден")
+
+    admin_wallet = by_id.get(admin_id)
+    if admin_wallet is None or admin_wallet.currency != from_wallet.currency:
+        # Кэш устарел: admin-шард удалён или валюта изменилась — перечитываем и доблокируем его.
+        wallet_cache.wallet_currencies.invalidate(from_wallet_id)
+        wallet_cache.admin_wallet_ids.invalidate((currency, admin_shard))
+        admin_id = _admin_wallet_id(from_wallet.currency, admin_shard)
+        by_id.update(fetch([admin_id]))
+
+    wallets = _check_locked_wallets(by_id, from_wallet_id, to_wallet_id, admin_id, rates)
+    tx, deltas, fee, total = _prepare_transfer(*wallets, amount, rates, schedule)
+    with metrics.stage("apply"):
+        balances, other_shards = _apply_balances(
+            deltas,
+            [tx],
+            events=[outbox.notification_event(tx)],
+            admin_shard=wallets[2] if _admin_shards() > 1 else None,
+            versions={str(w.id): w.version for w in wallets} if optimistic else None,
+        )
+    if optimistic:
+        _check_versions(deltas, balances, "sync")
+        fix = _stale_credit(tx, balances)
+        if fix is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(_FIX_TO_BALANCE_SQL, fix)
+    return _transfer_result(tx, wallets, balances, other_shards)
+
+
+@retry.atomic("consolidate")
+def consolidate_admin_shards(currency: str) -> Decimal:
+    # Сворачивает шарды admin-кошелька в шард 0; перенос фиксируется в леджере, чтобы сверка сходилась.
+    owner = _admin_owner()
+    primary = _ensure_admin_wallet(currency=currency, shard=0)
+    shard_ids = [
+        str(wallet_id)
+        for wallet_id in Wallet.objects.filter(owner_name=owner, currency=currency).values_list("id", flat=True)
+    ]
+    shards = _lock_wallets(shard_ids)
+    primary = shards[str(primary.id)]
+
+    moved = Decimal("0.00")
+    deltas: dict[str, Decimal] = {}
+    ledger: list[Transaction] = []
+    for wallet_id, shard in shards.items():
+        if shard.shard == 0 or shard.balance <= 0:
+            continue
+        deltas[wallet_id] = -shard.balance
+        moved += shard.balance
+        ledger.append(
+            Transaction(
+                from_wallet=shard,
+                to_wallet=primary,
+                amount=shard.balance,
+                fee=Decimal("0.00"),
+                from_balance_after=Decimal("0.00"),
+                to_balance_after=_q2(primary.balance + moved),
+                status=TransactionStatus.SUCCESS,
+            )
+        )
+
+    if ledger:
+        deltas[str(primary.id)] = moved
+        _apply_balances(deltas, ledger)
+    return moved
+
+
+def consolidate_all_admin_shards() -> dict[str, Decimal]:
+    currencies = (
+        Wallet.objects.filter(owner_name=_admin_owner(), shard__gt=0, balance__gt=0)
+        .values_list("currency", flat=True)
+        .distinct()
     )
+    return {currency: consolidate_admin_shards(currency) for currency in currencies}
+
+
+BATCH_ALL_OR_NOTHING = "all_or_nothing"
+BATCH_BEST_EFFORT = "best_effort"
+
+
+@dataclass(frozen=True)
+class TransferItem:
+    from_wallet_id: str
+    to_wallet_id: str
+    amount: Decimal
+
+
+@dataclass(frozen=True)
+class BatchItemResult:
+    index: int
+    transaction: Transaction | None = None
+    amount: Decimal | None = None
+    fee: Decimal | None = None
+    total_debited: Decimal | None = None
+    error: TransferError | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.transaction is not None
+
+
+@dataclass(frozen=True)
+class BatchTransferResult:
+    items: list[BatchItemResult]
+    committed: bool
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        return [item.transaction for item in self.items if item.transaction is not None]
+
+
+def _validate_item(item: TransferItem) -> TransferItem:
+    from_wallet_id, to_wallet_id, amount = _validate_transfer(item.from_wallet_id, item.to_wallet_id, item.amount)
+    _reject_sequenced(from_wallet_id)
+    return TransferItem(from_wallet_id=from_wallet_id, to_wallet_id=to_wallet_id, amount=amount)
+
+
+@retry.atomic("coalesced")
+def transfer_coalesced(items: list[TransferItem]) -> list[TransferResult | TransferError]:
+    # Микропакет переводов с одного кошелька (см. wallets.coalescer): одна блокировка и один CTE на весь пакет,
+    # но у каждого перевода свой результат, как у отдельного transfer(). Путь всегда пессимистичный: сюда попадают
+    # именно конкурирующие запросы.
+    outcomes: list[TransferResult | TransferError | None] = [None] * len(items)
+    valid: list[tuple[int, TransferItem]] = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, _validate_item(item)))
+        except TransferError as e:
+            outcomes[index] = e
+    if not valid:
+        return outcomes
+
+    from_wallet_id = valid[0][1].from_wallet_id
+    if any(item.from_wallet_id != from_wallet_id for _, item in valid):
+        raise ValueError("Микропакет должен списывать с одного кошелька")
+
+    def fail_all(message: str) -> list[TransferResult | TransferError]:
+        for index, _ in valid:
+            outcomes[index] = InvalidTransfer(message)
+        return outcomes
+
+    currency = _wallet_currencies([from_wallet_id]).get(from_wallet_id)
+    if currency is None:
+        return fail_all("from_wallet не найден")
+
+    admin_shard = _pick_admin_shard()
+    admin_id = _admin_wallet_id(currency, admin_shard)
+    schedule, rates = fees.current(), fx.current()
+    with metrics.lock_wait("coalesced"):
+        by_id = _lock_wallets(sorted({from_wallet_id, admin_id, *(item.to_wallet_id for _, item in valid)}))
+    from_wallet = by_id.get(from_wallet_id)
+    if from_wallet is None:
+        wallet_cache.wallet_currencies.invalidate(from_wallet_id)
+        return fail_all("from_wallet не найден")
+
+    admin_wallet = by_id.get(admin_id)
+    if admin_wallet is None or admin_wallet.currency != from_wallet.currency:
+        wallet_cache.wallet_currencies.invalidate(from_wallet_id)
+        wallet_cache.admin_wallet_ids.invalidate((currency, admin_shard))
+        admin_id = _admin_wallet_id(from_wallet.currency, admin_shard)
+        by_id.update(_lock_wallets([admin_id]))
+
+    # Переводы применяются по порядку к заблокированным кошелькам в памяти; каждому результату — снимок балансов
+    # после его перевода.
+    deltas: dict[str, Decimal] = {}
+    ledger: list[Transaction] = []
+    applied: list[tuple[int, Transaction, tuple[Wallet, Wallet, Wallet]]] = []
+    for index, item in valid:
+        try:
+            wallets = _check_locked_wallets(by_id, from_wallet_id, item.to_wallet_id, admin_id, rates)
+            tx, tx_deltas, _, _ = _prepare_transfer(*wallets, item.amount, rates, schedule)
+        except TransferError as e:
+            outcomes[index] = e
+            continue
+        for wallet_id, delta in tx_deltas.items():
+            by_id[wallet_id].balance += delta
+            deltas[wallet_id] = deltas.get(wallet_id, Decimal("0.00")) + delta
+        ledger.append(tx)
+        applied.append((index, tx, tuple(copy.copy(wallet) for wallet in wallets)))
+
+    if ledger:
+        with metrics.stage("apply"):
+            _, other_shards = _apply_balances(
+                deltas,
+                ledger,
+                events=[outbox.notification_event(tx) for tx in ledger],
+                admin_shard=by_id[admin_id] if _admin_shards() > 1 else None,
+            )
+        for index, tx, wallets in applied:
+            outcomes[index] = _transfer_result(tx, wallets, {}, other_shards)
+    return outcomes
+
+
+@retry.atomic("batch")
+def transfer_many(items: list[TransferItem], *, mode: str = BATCH_ALL_OR_NOTHING) -> BatchTransferResult:
+    if mode not in (BATCH_ALL_OR_NOTHING, BATCH_BEST_EFFORT):
+        raise InvalidTransfer("Неизвестный режим пакета")
+
+    results: dict[int, BatchItemResult] = {}
+    valid: list[tuple[int, TransferItem]] = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, _validate_item(item)))
+        except TransferError as e:
+            results[index] = BatchItemResult(index=index, error=e)
+
+    if results and mode == BATCH_ALL_OR_NOTHING:
+        return BatchTransferResult(items=[results.get(i, BatchItemResult(index=i)) for i in range(len(items))], committed=False)
+
+    # Валюты нужны до блокировки, чтобы выбрать шард admin-кошелька; сама валюта кошелька не меняется.
+    wallet_ids = {wallet_id for _, item in valid for wallet_id in (item.from_wallet_id, item.to_wallet_id)}
+    currencies = _wallet_currencies(sorted(wallet_ids))
+    admin_shards = {
+        currency: _pick_admin_shard()
+        for currency in {currencies[item.from_wallet_id] for _, item in valid if item.from_wallet_id in currencies}
+    }
+    admin_ids = {currency: _admin_wallet_id(currency, shard) for currency, shard in admin_shards.items()}
+
+    schedule, rates = fees.current(), fx.current()
+    # Одна блокировка объединения кошельков в порядке id; дальше пакет применяется в памяти по порядку.
+    with metrics.lock_wait("batch"):
+        wallets = _lock_wallets(sorted(wallet_ids | set(admin_ids.values())))
+
+    needed = {wallets[item.from_wallet_id].currency for _, item in valid if item.from_wallet_id in wallets}
+    for currency in needed:
+        admin_wallet = wallets.get(admin_ids.get(currency, ""))
+        if admin_wallet is None or admin_wallet.currency != currency:
+            # Кэш метаданных устарел — перечитываем admin-шард и доблокируем его.
+            shard = admin_shards.get(currency, 0)
+            wallet_cache.admin_wallet_ids.invalidate((currency, shard))
+            admin_ids[currency] = _admin_wallet_id(currency, shard)
+            wallets.update(_lock_wallets([admin_ids[currency]]))
+    balances = {wallet_id: wallet.balance for wallet_id, wallet in wallets.items()}
+    # Комиссии всего пакета одним проходом по снимку тарифов.
+    priced = [(index, item, wallets[item.from_wallet_id]) for index, item in valid if item.from_wallet_id in wallets]
+    batch_fees = dict(
+        zip(
+            [index for index, _, _ in priced],
+            schedule.fees((w.currency, w.wallet_class, item.amount) for _, item, w in priced),
+        )
+    )
+    deltas: dict[str, Decimal] = {}
+    ledger: list[Transaction] = []
+    applied: dict[int, BatchItemResult] = {}
+
+    for index, item in valid:
+        from_wallet = wallets.get(item.from_wallet_id)
+        to_wallet = wallets.get(item.to_wallet_id)
+        try:
+            if from_wallet is None:
+                raise InvalidTransfer("from_wallet не найден")
+            if to_wallet is None:
+                raise InvalidTransfer("Один или несколько кошельков не найдены")
+            rate, credit = _convert(from_wallet, to_wallet, item.amount, rates)
+
+            admin_wallet = wallets[admin_ids[from_wallet.currency]]
+            if admin_wallet.id in (from_wallet.id, to_wallet.id):
+                raise InvalidTransfer("Один или несколько кошельков не найдены")
+
+            fee = batch_fees[index]
+            total = _q2(item.amount + fee)
+            if balances[item.from_wallet_id] - from_wallet.reserved < total:
+                raise InsufficientFunds("Insufficient funds")
+        except TransferError as e:
+            results[index] = BatchItemResult(index=index, error=e)
+            continue
+
+        admin_id = str(admin_wallet.id)
+        for wallet_id, delta in ((item.from_wallet_id, -total), (item.to_wallet_id, credit), (admin_id, fee)):
+            balances[wallet_id] += delta
+            deltas[wallet_id] = deltas.get(wallet_id, Decimal("0.00")) + delta
+
+        tx = Transaction(
+            from_wallet=from_wallet,
+            to_wallet=to_wallet,
+            amount=item.amount,
+            fee=fee,
+            fee_wallet=admin_wallet if fee > 0 else None,
+            to_amount=None if rate is None else credit,
+            fx_rate=rate,
+            from_balance_after=balances[item.from_wallet_id],
+            to_balance_after=balances[item.to_wallet_id],
+            status=TransactionStatus.SUCCESS,
+        )
+        ledger.append(tx)
+        applied[index] = BatchItemResult(index=index, transaction=tx, amount=item.amount, fee=fee, total_debited=total)
+
+    committed = bool(ledger) and not (results and mode == BATCH_ALL_OR_NOTHING)
+    if committed:
+        _apply_balances(deltas, [])
+        Transaction.objects.bulk_create(ledger, batch_size=1000)
+        OutboxEvent.objects.bulk_create([outbox.notification_event(tx) for tx in ledger], batch_size=1000)
+    else:
+        applied = {index: BatchItemResult(index=index) for index in applied}
+
+    results.update(applied)
+    return BatchTransferResult(items=[results[i] for i in range(len(items))], committed=committed)
 
 
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wallets import fees, wallet_cache
+from wallets.models import FeeRule, Wallet
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def invalidate_wallet_cache(sender, instance: Wallet, **kwargs) -> None:
+    wallet_cache.invalidate_wallet(
+        wallet_id=instance.id,
+        owner_name=instance.owner_name,
+        currency=instance.currency,
+        shard=instance.shard,
+    )
+
+
+@receiver(post_save, sender=FeeRule)
+@receiver(post_delete, sender=FeeRule)
+def reload_fee_rules(sender, **kwargs) -> None:
+    # Правка в этом процессе (админка) действует сразу, в остальных — после следующей проверки отпечатка.
+    fees.reset()
+
+
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from django.db import models
+from django.db.models.fields import AutoFieldMixin
+
+
+def columns(model: type[models.Model]) -> str:
+    return ", ".join(f.column for f in model._meta.concrete_fields)
+
+
+def _insert_fields(model: type[models.Model]) -> list[models.Field]:
+    # Автоинкрементный pk заполняет БД.
+    return [f for f in model._meta.concrete_fields if not isinstance(f, AutoFieldMixin)]
+
+
+def insert_params(instance: models.Model, connection) -> list:
+    # То же, что делает SQLInsertCompiler: pre_save (auto_now_add, default) + адаптация значения под БД.
+    return [
+        f.get_db_prep_save(f.pre_save(instance, True), connection)
+        for f in _insert_fields(type(instance))
+    ]
+
+
+def insert_sql(model: type[models.Model], rows: int = 1, *, suffix: str = "") -> str:
+    fields = _insert_fields(model)
+    row = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    names = ", ".join(f.column for f in fields)
+    sql = f"INSERT INTO {model._meta.db_table} ({names}) VALUES {', '.join([row] * rows)}"
+    return f"{sql} {suffix}" if suffix else sql
+
+
+def from_rows(model: type[models.Model], rows, alias: str) -> list[models.Model]:
+    names = [f.attname for f in model._meta.concrete_fields]
+    return [model.from_db(alias, names, row) for row in rows]
+
+
+def mark_saved(instances, alias: str) -> None:
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = alias
+
+
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from django.utils.dateparse import parse_datetime
+
+from wallets import replicas
+from wallets.models import Transaction
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DEBIT = "debit"
+CREDIT = "credit"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class StatementEntry:
+    transaction_id: uuid.UUID
+    created_at: datetime
+    direction: str
+    amount: Decimal
+    fee: Decimal
+    counterparty_wallet_id: uuid.UUID
+    status: str
+    balance_after: Decimal | None
+
+
+@dataclass(frozen=True)
+class StatementPage:
+    entries: list[StatementEntry]
+    next_cursor: str | None
+
+
+def encode_cursor(created_at: datetime, transaction_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, transaction_id = raw.split("|", 1)
+        parsed = parse_datetime(created_at)
+        if parsed is None or parsed.tzinfo is None:
+            raise ValueError(created_at)
+        return parsed, uuid.UUID(transaction_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor("Некорректный cursor") from e
+
+
+def _branch(column: str, after: bool, table: str) -> str:
+    # Каждая ветка — отдельный index range scan по (<column>, created_at DESC, id DESC) с LIMIT,
+    # поэтому стоимость страницы не зависит от её глубины. Сравнение кортежей использует индекс целиком;
+    # отдельное created_at <= нужно для отсечения партиций новее курсора (по кортежу Postgres их не отсекает).
+    # Без курсора партиции читаются от новой к старой и скан останавливается на LIMIT.
+    keyset = "AND created_at <= %s AND (created_at, id) < (%s, %s)" if after else ""
+    return f"""
+        (SELECT id, created_at, from_wallet_id, to_wallet_id, amount, fee, status,
+                from_balance_after, to_balance_after, to_amount
+         FROM {table}
+         WHERE {column} = %s {keyset}
+         ORDER BY created_at DESC, id DESC
+         LIMIT %s)
+    """
+
+
+# Списания, зачисления и комиссии, зачисленные на admin-шард, — как у сверки (wallets.reconciliation).
+_COLUMNS = ("from_wallet_id", "to_wallet_id", "fee_wallet_id")
+
+
+def _statement_sql(after: bool, table: str = Transaction._meta.db_table) -> str:
+    return " UNION ALL ".join(_branch(column, after, table) for column in _COLUMNS) + (
+        " ORDER BY created_at DESC, id DESC LIMIT %s"
+    )
+
+
+def _statement_params(branch_params: list, fetch: int) -> list:
+    return [*branch_params * len(_COLUMNS), fetch]
+
+
+def wallet_statement(
+    wallet_id: uuid.UUID,
+    *,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+) -> StatementPage:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница.
+    fetch = limit + 1
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        branch_params = [wallet_id, created_at, created_at, last_id, fetch]
+    else:
+        branch_params = [wallet_id, fetch]
+
+    with replicas.read_connection().cursor() as cur:
+        cur.execute(_statement_sql(bool(cursor)), _statement_params(branch_params, fetch))
+        rows = cur.fetchall()
+
+    entries = []
+    for tx_id, created_at, from_id, to_id, amount, fee, tx_status, from_after, to_after, to_amount in rows[:limit]:
+        is_debit = from_id == wallet_id
+        if not is_debit and to_id != wallet_id:
+            # Строка из ветки fee_wallet: зачисление комиссии на admin-шард. Его баланс после операции
+            # в леджере не материализуется.
+            amount, to_amount, to_after = fee, None, None
+        entries.append(
+            StatementEntry(
+                transaction_id=tx_id,
+                created_at=created_at,
+                direction=DEBIT if is_debit else CREDIT,
+                # Для получателя межвалютного перевода — сумма в его валюте.
+                amount=amount if is_debit or to_amount is None else to_amount,
+                fee=fee if is_debit else Decimal("0.00"),
+                counterparty_wallet_id=to_id if is_debit else from_id,
+                status=tx_status,
+                balance_after=from_after if is_debit else to_after,
+            )
+        )
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = entries[-1]
+        next_cursor = encode_cursor(last.created_at, last.transaction_id)
+    return StatementPage(entries=entries, next_cursor=next_cursor)
+
+
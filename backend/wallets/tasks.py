@@ -1,17 +1,76 @@
-import random
-import time
-
 from celery import shared_task
+from django.conf import settings
+
+from wallets import holds, idempotency, notifications, partitions
+from wallets.models import NotificationDeadLetter
+from wallets.services import consolidate_all_admin_shards
+
+
+@shared_task(bind=True, max_retries=None)
+def send_notifications(self, *, items: list[dict[str, str]]) -> int:
+    batch = [notifications.Notification(**item) for item in items]
+    failed = notifications.dispatch(batch)
+    if not failed:
+        return len(batch)
+
+    attempt = self.request.retries
+    max_retries = int(getattr(settings, "NOTIFICATION_MAX_RETRIES", 3))
+    if attempt >= max_retries:
+        NotificationDeadLetter.objects.bulk_create(
+            [
+                NotificationDeadLetter(
+                    to_wallet_id=n.to_wallet_id,
+                    transaction_id=n.transaction_id,
+                    attempts=attempt + 1,
+                    last_error=repr(e),
+                )
+                for n, e in failed
+            ]
+        )
+        return len(batch) - len(failed)
+
+    # Повторяем только недоставленные элементы пакета.
+    raise self.retry(
+        kwargs={"items": [n.as_dict() for n, _ in failed]},
+        countdown=notifications.backoff_delay(attempt),
+        exc=failed[0][1],
+    )
+
+
+@shared_task
+def send_notification(*, to_wallet_id: str, transaction_id: str) -> None:
+    # Совместимость с задачами, уже лежащими в брокере: доставка идёт через пакетный путь.
+    notifications.enqueue([notifications.Notification(to_wallet_id=to_wallet_id, transaction_id=transaction_id)])
+
+
+@shared_task
+def consolidate_admin_wallets() -> dict[str, str]:
+    moved = consolidate_all_admin_shards()
+    return {currency: f"{amount:.2f}" for currency, amount in moved.items()}
+
+
+@shared_task
+def purge_idempotency_keys() -> int:
+    return idempotency.purge_expired()
+
+
+@shared_task
+def expire_holds() -> int:
+    # Один проход пакетами по индексу истечения, а не задача на каждый холд.
+    return holds.expire_holds()
 
 
-@shared_task(bind=True)
-def send_notification(self, *, to_wallet_id: str, transaction_id: str) -> None:
-    try:
-        time.sleep(5)
-        if random.random() < 0.3:
-            raise Exception("Simulated notification failure")
-        return
-    except Exception as e:
-        raise self.retry(countdown=3, max_retries=3, exc=e)
+@shared_task
+def maintain_transaction_partitions() -> dict[str, list[str]]:
+    created = partitions.ensure_partitions()
+    archived, deferred = [], []
+    months = int(getattr(settings, "TRANSACTION_RETENTION_MONTHS", 0))
+    if months > 0:
+        archived, deferred = partitions.archive_partitions(months, settings.TRANSACTION_ARCHIVE_DIR)
+    return {
+        "created": created,
+        "archived": [p.name for p in archived],
+        "deferred": [p.name for p in deferred],
+    }
 
 
@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from wallets.models import Transaction, Wallet
+from wallets.services import TransferItem, transfer_many
+
+
+class BatchTransferAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        self.admin = Wallet.objects.create(owner_name=self.admin_owner, currency=self.currency, balance=Decimal("0.00"))
+        self.a = Wallet.objects.create(owner_name="A_batch", currency=self.currency, balance=Decimal("3000.00"))
+        self.b = Wallet.objects.create(owner_name="B_batch", currency=self.currency, balance=Decimal("0.00"))
+        self.c = Wallet.objects.create(owner_name="C_batch", currency=self.currency, balance=Decimal("0.00"))
+
+    def _item(self, src, dst, amount: str) -> dict:
+        return {"from_wallet_id": str(src.id), "to_wallet_id": str(dst.id), "amount": amount}
+
+    def test_best_effort_applies_successful_items(self):
+        r = self.client.post(
+            "/api/transfers/batch",
+            data={
+                "mode": "best_effort",
+                "items": [
+                    self._item(self.a, self.b, "1500.00"),
+                    self._item(self.a, self.c, "2000.00"),
+                    self._item(self.a, self.c, "100.00"),
+                    self._item(self.b, self.c, "50.00"),
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(r.status_code, 200)
+        body = r.json()
+        self.assertTrue(body["committed"])
+        self.assertEqual([item["status"] for item in body["items"]], ["ok", "error", "ok", "ok"])
+        self.assertEqual(body["items"][0]["fee"], "150.00")
+        self.assertEqual(body["items"][1]["detail"], "Insufficient funds")
+
+        for wallet in (self.a, self.b, self.c, self.admin):
+            wallet.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("1250.00"))
+        self.assertEqual(self.b.balance, Decimal("1450.00"))
+        self.assertEqual(self.c.balance, Decimal("150.00"))
+        self.assertEqual(self.admin.balance, Decimal("150.00"))
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_all_or_nothing_rejects_whole_batch(self):
+        r = self.client.post(
+            "/api/transfers/batch",
+            data={
+                "items": [
+                    self._item(self.a, self.b, "1000.00"),
+                    self._item(self.a, self.c, "2500.00"),
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(r.status_code, 409)
+        body = r.json()
+        self.assertFalse(body["committed"])
+        self.assertEqual([item["status"] for item in body["items"]], ["skipped", "error"])
+
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("3000.00"))
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_invalid_item_is_reported_per_item(self):
+        r = self.client.post(
+            "/api/transfers/batch",
+            data={"items": [self._item(self.a, self.b, "10.00"), self._item(self.a, self.a, "10.00")]},
+            format="json",
+        )
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["items"][1]["status"], "error")
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        items = [TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))] * 200
+        # SAVEPOINT, валюты, admin-кошелёк, блокировка, UPDATE балансов, INSERT леджера, INSERT outbox, RELEASE
+        with self.assertNumQueries(8):
+            result = transfer_many(items)
+
+        self.assertTrue(result.committed)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("2800.00"))
+        self.assertEqual(Transaction.objects.count(), 200)
+
+
@@ -0,0 +1,26 @@
+import random
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from wallets.bench import Sampler, latency_summary, percentile
+
+
+class BenchHelpersTests(SimpleTestCase):
+    def test_zipf_sampler_is_skewed_towards_first_wallet(self):
+        zipf = Counter(Sampler(100, skew="zipf", zipf_s=1.2, rng=random.Random(1))() for _ in range(20000))
+        uniform = Counter(Sampler(100, rng=random.Random(1))() for _ in range(20000))
+
+        self.assertEqual(zipf.most_common(1)[0][0], 0)
+        self.assertGreater(zipf[0], 10 * zipf[50])
+        self.assertLess(uniform.most_common(1)[0][1], 3 * min(uniform.values()))
+        self.assertTrue(all(0 <= i < 100 for i in zipf))
+
+    def test_percentiles(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 51.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(latency_summary([])["p99"], 0.0)
+        self.assertEqual(latency_summary(values)["max"], 100.0)
+
+
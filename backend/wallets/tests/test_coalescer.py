@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from wallets import coalescer, services, wallet_cache
+from wallets.models import OutboxEvent, Transaction, Wallet
+from wallets.services import InsufficientFunds, InvalidTransfer, TransferItem, transfer_coalesced
+
+
+class TransferCoalescedTests(TestCase):
+    def setUp(self) -> None:
+        wallet_cache.clear()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin = Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_coal", currency=currency, balance=Decimal("2000.00"))
+        self.b = Wallet.objects.create(owner_name="B_coal", currency=currency, balance=Decimal("0.00"))
+        self.c = Wallet.objects.create(owner_name="C_coal", currency=currency, balance=Decimal("5.00"))
+
+    def _item(self, to: Wallet, amount: str) -> TransferItem:
+        return TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(to.id), amount=Decimal(amount))
+
+    def test_items_get_own_results_in_one_transaction(self):
+        items = [
+            self._item(self.b, "1100.00"),
+            self._item(self.a, "1.00"),
+            self._item(self.c, "800.00"),
+            self._item(self.b, "100.00"),
+        ]
+        outcomes = transfer_coalesced(items)
+
+        first, self_transfer, overdraft, last = outcomes
+        self.assertEqual((first.fee, first.total_debited), (Decimal("110.00"), Decimal("1210.00")))
+        self.assertEqual(first.from_wallet.balance, Decimal("790.00"))
+        self.assertEqual(first.to_wallet.balance, Decimal("1100.00"))
+        self.assertEqual(first.admin_balance, Decimal("110.00"))
+        self.assertIsInstance(self_transfer, InvalidTransfer)
+        self.assertIsInstance(overdraft, InsufficientFunds)
+        self.assertEqual(last.from_wallet.balance, Decimal("690.00"))
+        self.assertEqual(last.to_wallet.balance, Decimal("1200.00"))
+
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.admin.refresh_from_db()
+        self.assertEqual(
+            (self.a.balance, self.b.balance, self.admin.balance),
+            (Decimal("690.00"), Decimal("1200.00"), Decimal("110.00")),
+        )
+        ledger = Transaction.objects.order_by("from_balance_after").values_list("from_balance_after", flat=True)
+        self.assertEqual(list(ledger), [Decimal("690.00"), Decimal("790.00")])
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+
+    def test_rejects_mixed_source_wallets(self):
+        with self.assertRaises(ValueError):
+            transfer_coalesced(
+                [self._item(self.b, "1.00"), TransferItem(str(self.c.id), str(self.b.id), Decimal("1.00"))]
+            )
+
+    def test_view_routes_through_coalescer(self):
+        client = APIClient()
+        payload = {"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "10.00"}
+        with override_settings(TRANSFER_COALESCE_ENABLED=True, TRANSFER_COALESCE_MAX_WAIT=0.0), mock.patch(
+            "wallets.services.transfer_coalesced", wraps=transfer_coalesced
+        ) as coalesced:
+            r = client.post("/api/transfer/", data=payload, format="json")
+            keyed = client.post("/api/transfer/", data=payload, format="json", HTTP_IDEMPOTENCY_KEY="coal-1")
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(keyed.status_code, 200)
+        self.assertEqual(coalesced.call_count, 1)
+        self.assertEqual(r.json()["balances"]["from_wallet"]["balance"], "1990.00")
+        self.assertEqual(keyed.json()["balances"]["from_wallet"]["balance"], "1980.00")
+
+
+@override_settings(TRANSFER_COALESCE_MAX_WAIT=5.0, TRANSFER_COALESCE_MAX_BATCH=8)
+class CoalescerConcurrencyTests(TransactionTestCase):
+    def setUp(self) -> None:
+        wallet_cache.clear()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_coal", currency=currency, balance=Decimal("50.00"))
+        self.b = Wallet.objects.create(owner_name="B_coal", currency=currency, balance=Decimal("0.00"))
+
+    def test_concurrent_requests_share_one_batch(self):
+        outcomes: list = []
+        lock = threading.Lock()
+
+        def worker() -> None:
+            try:
+                result = coalescer.transfer(
+                    from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("10.00")
+                )
+            except InsufficientFunds as e:
+                result = e
+            finally:
+                connection.close()
+            with lock:
+                outcomes.append(result)
+
+        with mock.patch("wallets.services.transfer_coalesced", wraps=services.transfer_coalesced) as coalesced:
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(coalesced.call_count, 1)
+        ok = sorted(o.from_wallet.balance for o in outcomes if not isinstance(o, Exception))
+        self.assertEqual(ok, [Decimal("0.00"), Decimal("10.00"), Decimal("20.00"), Decimal("30.00"), Decimal("40.00")])
+        self.assertEqual(sum(isinstance(o, InsufficientFunds) for o in outcomes), 3)
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.balance, self.b.balance), (Decimal("0.00"), Decimal("50.00")))
+        self.assertEqual(Transaction.objects.count(), 5)
+
+
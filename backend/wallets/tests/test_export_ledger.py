@@ -0,0 +1,85 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from wallets.models import Transaction, Wallet
+from wallets.services import TransferItem, transfer_many
+
+
+class ExportLedgerTests(TestCase):
+    def setUp(self) -> None:
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        Wallet.objects.create(owner_name=admin_owner, currency=currency, balance=Decimal("0.00"))
+        self.a = Wallet.objects.create(owner_name="A_export", currency=currency, balance=Decimal("1000.00"))
+        self.b = Wallet.objects.create(owner_name="B_export", currency=currency, balance=Decimal("0.00"))
+        self.c = Wallet.objects.create(owner_name="C_export", currency=currency, balance=Decimal("0.00"))
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _transfers(self, dst, n: int) -> None:
+        transfer_many(
+            [TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(dst.id), amount=Decimal("1.00"))] * n
+        )
+
+    def _export(self, path: str, *args) -> None:
+        call_command("export_ledger", path, "--chunk-size", "3", *args, stderr=StringIO())
+
+    def test_gzip_csv_resume_appends_without_duplicates(self):
+        self._transfers(self.b, 7)
+        path = os.path.join(self.tmp.name, "ledger.csv.gz")
+        self._export(path)
+
+        self._transfers(self.c, 5)
+        self._export(path, "--resume")
+
+        with gzip.open(path, "rt", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 12)
+        self.assertEqual({r["id"] for r in rows}, {str(pk) for pk in Transaction.objects.values_list("id", flat=True)})
+        keys = [(r["created_at"], r["id"]) for r in rows]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_resume_truncates_uncommitted_tail(self):
+        self._transfers(self.b, 7)
+        path = os.path.join(self.tmp.name, "ledger.csv.gz")
+        self._export(path)
+        # Падение между записью чанка и сохранением cursor: в файле недописанный member и повтор последнего чанка.
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "ab") as f:
+            f.write(data[-40:] + gzip.compress(b"torn")[:10])
+
+        self._transfers(self.c, 2)
+        self._export(path, "--resume")
+
+        with gzip.open(path, "rt", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(len({r["id"] for r in rows}), 9)
+        with open(f"{path}.cursor") as f:
+            self.assertEqual(json.load(f)["offset"], os.path.getsize(path))
+
+    def test_jsonl_wallet_filter(self):
+        self._transfers(self.b, 4)
+        self._transfers(self.c, 2)
+        path = os.path.join(self.tmp.name, "ledger.jsonl")
+        self._export(path, "--format", "jsonl", "--wallet", str(self.c.id))
+
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(r["to_wallet_id"] == str(self.c.id) for r in rows))
+        self.assertEqual(rows[-1]["from_balance_after"], "994.00")
+
+
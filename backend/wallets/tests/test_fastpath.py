@@ -0,0 +1,148 @@
+import io
+import json
+import unittest
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from wallets import fastpath
+from wallets.models import Wallet
+from wallets.serializers import TransferRequestSerializer
+
+A = "5f1c4a38-2a4e-4c52-9d6e-0a1b2c3d4e5f"
+B = "0192a6f0-7c1e-7b3a-8d2f-5e6f7a8b9c0d"
+
+
+@override_settings(TRANSFER_FAST_PATH=True)
+class FastPathValidationTests(SimpleTestCase):
+    def test_matches_serializer(self):
+        amounts = [
+            "10", "10.5", "10.50", "0.01", "007.50", "9999999999999999.99", 10, 10.5, 1e-05, 1e16,
+            "0", "0.00", "-1", "1.234", " 10 ", "1e3", "+5", "NaN", "Infinity", "", "10.", ".5",
+            "99999999999999999", True, None, [], {},
+        ]
+        ids = [A, A.upper(), A.replace("-", ""), "{" + A + "}", "urn:uuid:" + A, "not-a-uuid", 12345, None]
+        payloads = [{"from_wallet_id": A, "to_wallet_id": B, "amount": amount} for amount in amounts]
+        payloads += [{"from_wallet_id": wallet_id, "to_wallet_id": B, "amount": "1.00"} for wallet_id in ids]
+        payloads += [
+            {"from_wallet_id": A, "amount": "1.00"},
+            {"from_wallet_id": A, "to_wallet_id": B, "amount": 1, "x": 1},
+            [],
+            "x",
+            None,
+        ]
+
+        accepted = 0
+        for payload in payloads:
+            serializer = TransferRequestSerializer(data=payload)
+            valid = serializer.is_valid()
+            fast = fastpath.transfer_request(payload)
+            if fast is not None:
+                accepted += 1
+                self.assertTrue(valid, payload)
+                # str: Decimal("10.5") == Decimal("10.50"), а экспонента должна совпасть.
+                expected = {name: str(value) for name, value in serializer.validated_data.items()}
+                self.assertEqual({name: str(value) for name, value in fast.items()}, expected)
+
+            data, errors = fastpath.validate_transfer(payload)
+            self.assertEqual(errors, None if valid else serializer.errors, payload)
+            self.assertEqual(data is not None, valid, payload)
+        self.assertGreater(accepted, 10)
+
+
+@unittest.skipIf(fastpath.orjson is None, "нужен orjson")
+@override_settings(TRANSFER_FAST_PATH=True)
+class FastPathJSONTests(SimpleTestCase):
+    def test_render_is_byte_identical(self):
+        serializer = TransferRequestSerializer(data={"amount": "x"})
+        self.assertFalse(serializer.is_valid())
+        bodies = [
+            {"transaction_id": A, "amount": "1000.00", "balances": {"to_wallet": {"id": B, "balance": None}}},
+            {"detail": "Недостаточно средств    😀 x\x00\x1f\x7f\n\t\"\\/"},
+            {"amount": [ErrorDetail("amount должен быть > 0", code="invalid")], "sequenced": True, "n": 2**63 - 1},
+            serializer.errors,
+            {"id": uuid.UUID(A), "big": 2**70, "amount": Decimal("1.50")},
+            {"id": uuid.UUID(A), "created_at": datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)},
+            [],
+        ]
+        for body in bodies:
+            self.assertEqual(fastpath.render(body), JSONRenderer().render(body), body)
+        self.assertEqual(fastpath.render(None), b"")
+
+    def test_parse_matches_json_parser(self):
+        inputs = [
+            b'{"from_wallet_id": "%s", "amount": "10.00"}' % A.encode(),
+            '{"detail": "кириллица \\u2028"}'.encode(),
+            b'{"a": 1, "a": 2, "f": 1.1, "n": -0, "big": 123456789012345678901234567890}',
+            b'{"x": NaN}',
+            b'{"x": "\\ud800"}',
+            b"[1, 2,]",
+            b"",
+            b"\xff",
+        ]
+        for body in inputs:
+            try:
+                expected = JSONParser().parse(io.BytesIO(body))
+            except ParseError as e:
+                with self.assertRaises(ParseError) as ctx:
+                    fastpath.FastJSONParser().parse(io.BytesIO(body))
+                self.assertEqual(ctx.exception.detail, e.detail)
+            else:
+                self.assertEqual(fastpath.FastJSONParser().parse(io.BytesIO(body)), expected, body)
+
+            try:
+                self.assertEqual(fastpath.loads(body), json.loads(body), body)
+            except ValueError as e:
+                with self.assertRaisesMessage(ValueError, str(e)):
+                    fastpath.loads(body)
+
+
+class FastPathTransferAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency)
+        self.a = Wallet.objects.create(owner_name="A_fast", currency=currency, balance=Decimal("5000.00"))
+        self.b = Wallet.objects.create(owner_name="B_fast", currency=currency)
+
+    def _post(self, url: str, payload, key: str | None = None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(url, data=json.dumps(payload), content_type="application/json", **headers)
+
+    def test_responses_are_byte_identical(self):
+        ok = {"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "1500.00"}
+        requests = [
+            ("/api/transfer/", ok, "fast-sync"),
+            ("/api/transfer/", {**ok, "amount": "0"}, None),
+            ("/api/transfer/async", {**ok, "amount": "-1", "to_wallet_id": "x"}, None),
+            ("/api/transfer/", {**ok, "amount": "100000.00"}, None),
+            ("/api/transfer/", {**ok, "to_wallet_id": str(self.a.id)}, None),
+        ]
+        # С ключом сравниваются повторы сохранённого ответа. Async-view здесь только с ошибками валидации:
+        # его пул соединений не видит данных транзакции TestCase.
+        self._post("/api/transfer/", ok, "fast-sync")
+        for url, payload, key in requests:
+            with override_settings(TRANSFER_FAST_PATH=False):
+                expected = self._post(url, payload, key)
+            with override_settings(TRANSFER_FAST_PATH=True):
+                actual = self._post(url, payload, key)
+            self.assertEqual(actual.status_code, expected.status_code, payload)
+            self.assertEqual(actual.content, expected.content, payload)
+
+        with override_settings(TRANSFER_FAST_PATH=True):
+            r = self._post("/api/transfer/", ok)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.content, JSONRenderer().render(json.loads(r.content)))
+
+            r = self.client.post("/api/transfer/", data=b'{"amount": ', content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertTrue(r.json()["detail"].startswith("JSON parse error - "))
+
+
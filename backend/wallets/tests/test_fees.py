@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from wallets import fees, holds
+from wallets.models import FeeRule, Wallet
+from wallets.services import BATCH_BEST_EFFORT, TransferItem, _q2, transfer, transfer_coalesced, transfer_many
+
+
+def _legacy_fee(amount: Decimal) -> Decimal:
+    # Правило до wallets.fees: 10% при amount > 1000.00.
+    if amount > Decimal("1000.00"):
+        return _q2(amount * Decimal("0.10"))
+    return Decimal("0.00")
+
+
+class FeeScheduleTests(TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(7)
+        self.amounts = [Decimal(a) for a in ("0.01", "999.99", "1000.00", "1000.01", "1000.05", "1234.55")]
+        self.amounts += [_q2(Decimal(rng.uniform(0.01, 10_000_000))) for _ in range(2000)]
+
+    def tearDown(self) -> None:
+        fees.reset()
+
+    def test_single_tier_matches_legacy_rule(self):
+        configured = fees.compile_rules([("", "", Decimal("1000.00"), Decimal("10.0000"), Decimal("0.00"))])
+        empty = fees.compile_rules([])
+        for amount in self.amounts:
+            expected = _legacy_fee(amount)
+            self.assertEqual(configured.fee(amount, "U", "standard"), expected, amount)
+            self.assertEqual(empty.fee(amount, "U", "standard"), expected, amount)
+
+        requests = [("U", "standard", amount) for amount in self.amounts]
+        self.assertEqual(configured.fees(requests), [_legacy_fee(amount) for amount in self.amounts])
+
+    def test_tiers_and_precedence(self):
+        schedule = fees.compile_rules(
+            [
+                ("", "", Decimal("0.00"), Decimal("1.0000"), Decimal("0.00")),
+                ("USD", "", Decimal("0.00"), Decimal("0"), Decimal("0.30")),
+                ("USD", "", Decimal("100.00"), Decimal("2.5000"), Decimal("0.00")),
+                ("USD", "", Decimal("10000.00"), Decimal("1.2500"), Decimal("0.00")),
+                ("USD", "vip", Decimal("0.00"), Decimal("0"), Decimal("0.00")),
+                ("", "merchant", Decimal("500.00"), Decimal("0.5000"), Decimal("1.00")),
+            ]
+        )
+        self.assertEqual(schedule.fee(Decimal("100.00"), "USD", "standard"), Decimal("0.30"))
+        self.assertEqual(schedule.fee(Decimal("100.01"), "USD", "standard"), Decimal("2.50"))
+        self.assertEqual(schedule.fee(Decimal("20000.00"), "USD", "standard"), Decimal("250.00"))
+        self.assertEqual(schedule.fee(Decimal("20000.00"), "USD", "vip"), Decimal("0.00"))
+        # Правило по валюте важнее правила по классу.
+        self.assertEqual(schedule.fee(Decimal("1000.00"), "USD", "merchant"), Decimal("25.00"))
+        self.assertEqual(schedule.fee(Decimal("1000.00"), "EUR", "merchant"), Decimal("6.00"))
+        self.assertEqual(schedule.fee(Decimal("500.00"), "EUR", "merchant"), Decimal("0.00"))
+        self.assertEqual(schedule.fee(Decimal("1000.00"), "EUR", "standard"), Decimal("10.00"))
+
+        requests = [("USD", "standard", Decimal("100.01")), ("EUR", "merchant", Decimal("1000.00"))] * 3
+        self.assertEqual(schedule.fees(requests), [schedule.fee(a, c, k) for c, k, a in requests])
+
+
+class FeeRuleTransferTests(TestCase):
+    def setUp(self) -> None:
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+        self.admin = Wallet.objects.create(owner_name=admin_owner, currency=self.currency)
+        self.a = Wallet.objects.create(owner_name="A_fee", currency=self.currency, balance=Decimal("10000.00"))
+        self.m = Wallet.objects.create(
+            owner_name="M_fee", currency=self.currency, wallet_class="merchant", balance=Decimal("10000.00")
+        )
+        self.b = Wallet.objects.create(owner_name="B_fee", currency=self.currency)
+        fees.reset()
+
+    def tearDown(self) -> None:
+        fees.reset()
+
+    def _fee(self, src: Wallet, amount: str) -> Decimal:
+        return transfer(from_wallet_id=str(src.id), to_wallet_id=str(self.b.id), amount=Decimal(amount)).fee
+
+    def test_rules_apply_by_sender_class_and_reload_on_change(self):
+        self.assertEqual(self._fee(self.a, "2000.00"), Decimal("200.00"))
+
+        rule = FeeRule.objects.create(wallet_class="merchant", above=Decimal("0.00"), percent=Decimal("1.5"))
+        self.assertEqual(self._fee(self.m, "2000.00"), Decimal("30.00"))
+        self.assertEqual(self._fee(self.a, "2000.00"), Decimal("200.00"))
+
+        rule.percent = Decimal("2")
+        rule.save()
+        self.assertEqual(self._fee(self.m, "2000.00"), Decimal("40.00"))
+
+        result = transfer_many(
+            [
+                TransferItem(from_wallet_id=str(self.m.id), to_wallet_id=str(self.b.id), amount=Decimal("100.00")),
+                TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1500.00")),
+            ],
+            mode=BATCH_BEST_EFFORT,
+        )
+        self.assertEqual([item.fee for item in result.items], [Decimal("2.00"), Decimal("150.00")])
+
+    def test_snapshot_is_recompiled_only_when_rules_change(self):
+        first = fees.current()
+        with self.assertNumQueries(0):
+            self.assertIs(fees.current(), first)
+        with override_settings(FEE_RULES_CHECK_INTERVAL=0):
+            # Отпечаток тот же — один запрос, те же скомпилированные ступени.
+            with self.assertNumQueries(1):
+                self.assertIs(fees.current().tiers, first.tiers)
+            # Правка мимо ORM (без сигнала) видна по отпечатку.
+            FeeRule.objects.bulk_create([FeeRule(currency=self.currency, percent=Decimal("3"))])
+            self.assertEqual(fees.current().fee(Decimal("100.00"), self.currency, "standard"), Decimal("3.00"))
+
+    def test_signature_is_checked_before_wallet_locks(self):
+        item = TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("10.00"))
+        hold = holds.authorize(wallet_id=self.a.id, to_wallet_id=self.b.id, amount=Decimal("10.00"))
+        calls = {
+            "transfer": lambda: transfer(**vars(item)),
+            "coalesced": lambda: transfer_coalesced([item]),
+            "batch": lambda: transfer_many([item]),
+            "authorize": lambda: holds.authorize(wallet_id=self.a.id, to_wallet_id=self.b.id, amount=Decimal("1.00")),
+            "capture": lambda: holds.capture(hold.id),
+        }
+        for path, call in calls.items():
+            with override_settings(FEE_RULES_CHECK_INTERVAL=0), CaptureQueriesContext(connection) as ctx:
+                call()
+            sqls = [q["sql"] for q in ctx.captured_queries]
+            signature = next(i for i, sql in enumerate(sqls) if fees._SIGNATURE_SQL.strip() in sql)
+            lock = next(i for i, sql in enumerate(sqls) if "FOR UPDATE" in sql)
+            self.assertLess(signature, lock, path)
+
+
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from wallets import fx, holds
+from wallets.models import FxRateSet, Transaction, Wallet
+from wallets.reconciliation import reconcile
+from wallets.services import (
+    BATCH_BEST_EFFORT,
+    InvalidTransfer,
+    TransferItem,
+    transfer,
+    transfer_coalesced,
+    transfer_many,
+)
+from wallets.statements import CREDIT, wallet_statement
+
+
+class FxRateTableTests(TestCase):
+    def tearDown(self) -> None:
+        fx.reset()
+
+    def test_convert_rounds_once_half_up(self):
+        self.assertEqual(fx.convert(Decimal("10.00"), Decimal("0.123450000000")), Decimal("1.23"))
+        self.assertEqual(fx.convert(Decimal("10.00"), Decimal("0.123500000000")), Decimal("1.24"))
+        # Произведение не округляется до 28 знаков контекста по умолчанию.
+        self.assertEqual(
+            fx.convert(Decimal("9999999999999999.99"), Decimal("999999999999.000000000005")),
+            Decimal("9999999999989999990000050000.01"),
+        )
+
+    def test_publish_merges_previous_version(self):
+        fx.publish({("USD", "EUR"): Decimal("0.9"), ("EUR", "USD"): Decimal("1.1")}, source="test")
+        first = fx.current()
+        self.assertEqual(first.rate("USD", "EUR"), Decimal("0.9"))
+
+        fx.publish({("USD", "EUR"): Decimal("0.92")})
+        second = fx.current()
+        self.assertGreater(second.version, first.version)
+        self.assertEqual(second.rates, {("USD", "EUR"): Decimal("0.92"), ("EUR", "USD"): Decimal("1.1")})
+        # Снимок неизменяем: перевод, взявший первую версию, не видит половину второй.
+        self.assertEqual(first.rate("USD", "EUR"), Decimal("0.9"))
+
+        fx.publish({("USD", "GBP"): Decimal("0.8")}, replace_all=True)
+        self.assertEqual(fx.current().rates, {("USD", "GBP"): Decimal("0.8")})
+
+        with self.assertRaises(ValueError):
+            fx.publish({("USD", "USD"): Decimal("1")})
+        with self.assertRaises(ValueError):
+            fx.publish({("USD", "EUR"): Decimal("0")})
+
+    def test_version_is_checked_once_per_interval(self):
+        fx.current()
+        with self.assertNumQueries(0):
+            fx.current()
+        # Версия не изменилась — курсы не перечитываются, только проверяется id последней версии.
+        with override_settings(FX_RATES_CHECK_INTERVAL=0), self.assertNumQueries(1):
+            fx.current()
+
+
+class CrossCurrencyTransferTests(TestCase):
+    def setUp(self) -> None:
+        admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+        self.admin = Wallet.objects.create(owner_name=admin_owner, currency="USD")
+        Wallet.objects.create(owner_name=admin_owner, currency="EUR")
+        self.a = Wallet.objects.create(owner_name="A_fx", currency="USD", balance=Decimal("5000.00"))
+        self.b = Wallet.objects.create(owner_name="B_fx", currency="EUR", balance=Decimal("10.00"))
+        fx.publish({("USD", "EUR"): Decimal("0.923456789012")}, source="test")
+
+    def tearDown(self) -> None:
+        fx.reset()
+
+    def test_transfer_credits_converted_amount_and_charges_fee_in_source_currency(self):
+        result = transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("2000.00"))
+
+        self.assertEqual((result.fee, result.total_debited), (Decimal("200.00"), Decimal("2200.00")))
+        tx = Transaction.objects.get(id=result.transaction.id)
+        self.assertEqual(
+            (tx.amount, tx.to_amount, tx.fx_rate),
+            (Decimal("2000.00"), Decimal("1846.91"), Decimal("0.923456789012")),
+        )
+        self.assertEqual((tx.from_balance_after, tx.to_balance_after), (Decimal("2800.00"), Decimal("1856.91")))
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.admin.refresh_from_db()
+        self.assertEqual(
+            (self.a.balance, self.b.balance, self.admin.balance),
+            (Decimal("2800.00"), Decimal("1856.91"), Decimal("200.00")),
+        )
+
+        entry = wallet_statement(self.b.id).entries[0]
+        self.assertEqual((entry.direction, entry.amount), (CREDIT, Decimal("1846.91")))
+        report = reconcile(settle_lag=timedelta(0), adopt_opening_balances=True)
+        self.assertEqual(report.mismatches, [])
+
+    def test_rates_version_is_checked_before_wallet_locks(self):
+        item = TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("10.00"))
+        hold = holds.authorize(wallet_id=self.a.id, to_wallet_id=self.b.id, amount=Decimal("10.00"))
+        calls = {
+            "transfer": lambda: transfer(**vars(item)),
+            "coalesced": lambda: transfer_coalesced([item]),
+            "batch": lambda: transfer_many([item]),
+            "capture": lambda: holds.capture(hold.id),
+        }
+        for path, call in calls.items():
+            with override_settings(FX_RATES_CHECK_INTERVAL=0), CaptureQueriesContext(connection) as ctx:
+                call()
+            sqls = [q["sql"] for q in ctx.captured_queries]
+            version = next(i for i, sql in enumerate(sqls) if fx._LATEST_SQL in sql)
+            lock = next(i for i, sql in enumerate(sqls) if "FOR UPDATE" in sql)
+            self.assertLess(version, lock, path)
+            self.assertEqual(sum(fx._LATEST_SQL in sql for sql in sqls), 1, path)
+
+    def test_missing_or_stale_rate_is_rejected(self):
+        with self.assertRaisesMessage(InvalidTransfer, "курса EUR/USD нет"):
+            transfer(from_wallet_id=str(self.b.id), to_wallet_id=str(self.a.id), amount=Decimal("1.00"))
+
+        FxRateSet.objects.update(created_at=FxRateSet.objects.get().created_at - timedelta(hours=2))
+        fx.reset()
+        with override_settings(FX_RATES_MAX_AGE=3600), self.assertRaisesMessage(InvalidTransfer, "устарел"):
+            transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+
+    def test_batch_and_hold_capture(self):
+        result = transfer_many(
+            [
+                TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("100.00")),
+                TransferItem(from_wallet_id=str(self.b.id), to_wallet_id=str(self.a.id), amount=Decimal("1.00")),
+            ],
+            mode=BATCH_BEST_EFFORT,
+        )
+        self.assertTrue(result.committed)
+        self.assertEqual(result.items[0].transaction.to_amount, Decimal("92.35"))
+        self.assertIsInstance(result.items[1].error, InvalidTransfer)
+
+        hold = holds.authorize(wallet_id=self.a.id, to_wallet_id=self.b.id, amount=Decimal("10.00"))
+        captured = holds.capture(hold.id)
+        self.assertEqual(captured.transfer.transaction.to_amount, Decimal("9.23"))
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.balance, Decimal("10.00") + Decimal("92.35") + Decimal("9.23"))
+
+
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from wallets import holds
+from wallets.models import Hold, HoldStatus, Transaction, Wallet
+from wallets.services import InsufficientFunds, InvalidTransfer, TransferItem, transfer, transfer_many
+
+
+class HoldServiceTests(TestCase):
+    def setUp(self) -> None:
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin = Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=self.currency
+        )
+        self.a = Wallet.objects.create(owner_name="A_hold", currency=self.currency, balance=Decimal("3000.00"))
+        self.b = Wallet.objects.create(owner_name="B_hold", currency=self.currency)
+
+    def _authorize(self, amount: str, **kwargs) -> Hold:
+        return holds.authorize(wallet_id=self.a.id, to_wallet_id=self.b.id, amount=Decimal(amount), **kwargs)
+
+    def test_reserved_funds_cannot_be_transferred(self):
+        hold = self._authorize("2000.00")
+        # Комиссия резервируется вместе с суммой.
+        self.assertEqual(hold.reserved, Decimal("2200.00"))
+        self.a.refresh_from_db()
+        self.assertEqual(
+            (self.a.balance, self.a.reserved, self.a.available),
+            (Decimal("3000.00"), Decimal("2200.00"), Decimal("800.00")),
+        )
+
+        with self.assertRaises(InsufficientFunds):
+            transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("900.00"))
+        with self.assertRaises(InsufficientFunds):
+            self._authorize("900.00")
+        result = transfer_many(
+            [TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("801.00"))]
+        )
+        self.assertFalse(result.committed)
+
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("800.00"))
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.available, Decimal("0.00"))
+
+    def test_partial_capture_releases_remainder(self):
+        hold = self._authorize("2000.00")
+        result = holds.capture(hold.id, Decimal("1500.00"))
+
+        self.assertEqual(result.transfer.fee, Decimal("150.00"))
+        self.assertEqual(result.hold.status, HoldStatus.CAPTURED)
+        self.assertEqual(result.hold.captured_amount, Decimal("1500.00"))
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.admin.refresh_from_db()
+        self.assertEqual((self.a.balance, self.a.reserved), (Decimal("1350.00"), Decimal("0.00")))
+        self.assertEqual(self.b.balance, Decimal("1500.00"))
+        self.assertEqual(self.admin.balance, Decimal("150.00"))
+
+        tx = Transaction.objects.get(id=result.hold.transaction_id)
+        self.assertEqual((tx.amount, tx.from_balance_after), (Decimal("1500.00"), Decimal("1350.00")))
+
+        with self.assertRaises(holds.HoldStateError):
+            holds.capture(hold.id)
+        with self.assertRaises(holds.HoldStateError):
+            holds.void(hold.id)
+
+    def test_capture_above_authorized_amount_is_rejected(self):
+        hold = self._authorize("100.00")
+        with self.assertRaises(InvalidTransfer):
+            holds.capture(hold.id, Decimal("100.01"))
+        self.assertEqual(Hold.objects.get(id=hold.id).status, HoldStatus.ACTIVE)
+
+    def test_void_releases_reservation(self):
+        hold = self._authorize("100.00")
+        self.assertEqual(holds.void(hold.id).status, HoldStatus.VOIDED)
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.balance, self.a.reserved), (Decimal("3000.00"), Decimal("0.00")))
+
+    def test_expired_holds_are_swept_in_batches(self):
+        c = Wallet.objects.create(owner_name="C_hold", currency=self.currency, balance=Decimal("100.00"))
+        expired = [self._authorize("10.00") for _ in range(5)]
+        expired.append(holds.authorize(wallet_id=c.id, to_wallet_id=self.b.id, amount=Decimal("20.00")))
+        alive = self._authorize("30.00")
+        captured = self._authorize("40.00")
+        holds.capture(captured.id)
+        Hold.objects.filter(id__in=[h.id for h in expired] + [captured.id]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(holds.expire_holds(batch_size=2), 6)
+        self.assertEqual(holds.expire_holds(batch_size=2), 0)
+
+        statuses = dict(Hold.objects.values_list("id", "status"))
+        self.assertTrue(all(statuses[h.id] == HoldStatus.EXPIRED for h in expired))
+        self.assertEqual(statuses[alive.id], HoldStatus.ACTIVE)
+        self.assertEqual(statuses[captured.id], HoldStatus.CAPTURED)
+        self.a.refresh_from_db()
+        c.refresh_from_db()
+        self.assertEqual(self.a.reserved, Decimal("30.00"))
+        self.assertEqual(c.reserved, Decimal("0.00"))
+
+        with self.assertRaises(holds.HoldStateError):
+            holds.capture(expired[0].id)
+
+    def test_expired_but_unswept_hold_cannot_be_captured(self):
+        hold = self._authorize("10.00", ttl=60)
+        Hold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(holds.HoldStateError):
+            holds.capture(hold.id)
+
+
+class HoldAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency)
+        self.a = Wallet.objects.create(owner_name="A_hold_api", currency=currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_hold_api", currency=currency)
+
+    def _authorize(self, amount: str):
+        return self.client.post(
+            "/api/holds",
+            {"wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": amount, "ttl_seconds": 600},
+            format="json",
+        )
+
+    def test_authorize_capture_void(self):
+        r = self._authorize("60.00")
+        self.assertEqual(r.status_code, 201)
+        hold_id = r.json()["hold_id"]
+        self.assertEqual(r.json()["reserved"], "60.00")
+
+        self.assertEqual(self._authorize("50.00").status_code, 409)
+
+        r = self.client.post(f"/api/holds/{hold_id}/capture", {"amount": "25.00"}, format="json")
+        self.assertEqual(r.status_code, 200)
+        body = r.json()
+        self.assertEqual(body["hold"]["status"], "captured")
+        self.assertEqual(body["balances"]["from_wallet"]["balance"], "75.00")
+        self.assertEqual(body["hold"]["transaction_id"], body["transaction_id"])
+
+        self.assertEqual(self.client.post(f"/api/holds/{hold_id}/void").status_code, 409)
+        self.assertEqual(self.client.get(f"/api/holds/{hold_id}").json()["status"], "captured")
+
+        r = self._authorize("75.00")
+        self.assertEqual(r.status_code, 201)
+        r = self.client.post(f"/api/holds/{r.json()['hold_id']}/void")
+        self.assertEqual((r.status_code, r.json()["status"]), (200, "voided"))
+
+    def test_unknown_hold(self):
+        missing = "00000000-0000-7000-8000-000000000000"
+        self.assertEqual(self.client.get(f"/api/holds/{missing}").status_code, 404)
+        self.assertEqual(self.client.post(f"/api/holds/{missing}/capture").status_code, 404)
+
+
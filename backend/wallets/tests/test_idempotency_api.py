@@ -0,0 +1,84 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from wallets import idempotency
+from wallets.models import IdempotencyKey, Transaction, Wallet
+
+
+class IdempotencyAPITests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        self.admin = Wallet.objects.create(owner_name=self.admin_owner, currency=self.currency, balance=Decimal("0.00"))
+        self.a = Wallet.objects.create(owner_name="A_idem", currency=self.currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_idem", currency=self.currency, balance=Decimal("0.00"))
+        self.payload = {"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "10.00"}
+
+    def _post(self, payload: dict, key: str):
+        return self.client.post("/api/transfer/", data=payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_second_debit(self):
+        first = self._post(self.payload, "key-1")
+        self.assertEqual(first.status_code, 200)
+
+        # Промах кэша: один SELECT по уникальному индексу, без блокировок кошельков.
+        with self.assertNumQueries(1):
+            second = self._post(self.payload, "key-1")
+        # Дальше ответ отдаётся из кэша.
+        with self.assertNumQueries(0):
+            third = self._post(self.payload, "key-1")
+
+        for replay in (second, third):
+            self.assertEqual(replay.status_code, 200)
+            self.assertEqual(replay.json(), first.json())
+            self.assertEqual(replay.headers.get("Idempotent-Replayed"), "true")
+
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("90.00"))
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get(key="key-1").transaction_id, Transaction.objects.get().id)
+
+    def test_key_reused_with_different_payload(self):
+        self._post(self.payload, "key-2")
+        r = self._post({**self.payload, "amount": "20.00"}, "key-2")
+        self.assertEqual(r.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_transfer_does_not_consume_key(self):
+        r = self._post({**self.payload, "amount": "500.00"}, "key-3")
+        self.assertEqual(r.status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.filter(key="key-3").exists())
+
+    def test_concurrent_duplicate_is_rolled_back(self):
+        self._post(self.payload, "key-4")
+        cache.clear()
+        real_lookup = idempotency.lookup
+
+        # Второй запрос «не увидел» ключ до вставки, как при гонке двух повторов.
+        with mock.patch("wallets.views.idempotency.lookup", side_effect=[None, real_lookup("key-4")]):
+            r = self._post(self.payload, "key-4")
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.headers.get("Idempotent-Replayed"), "true")
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("90.00"))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_purge_expired_keys(self):
+        self._post(self.payload, "key-5")
+        IdempotencyKey.objects.filter(key="key-5").update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(idempotency.purge_expired(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from wallets import ids
+from wallets.models import Wallet
+from wallets.services import transfer
+
+
+class Uuid7Tests(SimpleTestCase):
+    def test_layout_and_timestamp(self):
+        before = time.time_ns() // 1_000_000
+        value = ids.uuid7()
+        after = time.time_ns() // 1_000_000
+
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertTrue(before <= ids.timestamp_ms(value) <= after)
+        self.assertIsNone(ids.timestamp_ms(uuid.uuid4()))
+
+    def test_strictly_increasing_within_process(self):
+        values = [ids.uuid7() for _ in range(20_000)]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+        # uuid в Postgres сравнивается побайтно — тот же порядок, что у int.
+        self.assertEqual([v.bytes for v in values], sorted(v.bytes for v in values))
+
+    def test_clock_going_back_keeps_order(self):
+        first = ids.uuid7()
+        with mock.patch("wallets.ids.time.time_ns", return_value=time.time_ns() - 5 * 10**9):
+            second = ids.uuid7()
+        self.assertGreater(second, first)
+        self.assertEqual(second.version, 7)
+
+    @override_settings(UUID_VERSION=4)
+    def test_uuid4_switch(self):
+        self.assertEqual(ids.new_id().version, 4)
+
+
+class ModelIdTests(TestCase):
+    def test_new_rows_get_uuid7(self):
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency)
+        a = Wallet.objects.create(owner_name="A_ids", currency=currency, balance=Decimal("10.00"))
+        b = Wallet.objects.create(owner_name="B_ids", currency=currency)
+        result = transfer(from_wallet_id=str(a.id), to_wallet_id=str(b.id), amount=Decimal("1.00"))
+
+        self.assertEqual((a.id.version, b.id.version), (7, 7))
+        self.assertEqual(result.transaction.id.version, 7)
+        self.assertLess(a.id, b.id)
+
+
@@ -0,0 +1,97 @@
+import os
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+from psycopg_pool import ConnectionPool
+from rest_framework.test import APIClient
+
+from wallets import metrics
+from wallets.async_services import _conninfo
+from wallets.models import Wallet
+
+
+def _sample(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_metrics", currency=currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_metrics", currency=currency, balance=Decimal("0.00"))
+
+    def _post(self, amount: str, **headers):
+        return self.client.post(
+            "/api/transfer/",
+            data={"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": amount},
+            format="json",
+            **headers,
+        )
+
+    def test_transfer_is_timed_per_stage(self):
+        stages = ["validate", "idempotency_lookup", "service", "currency", "admin_wallet", "lock", "apply"]
+        before = {s: _sample("wallet_transfer_stage_seconds_count", {"stage": s}) for s in stages}
+        lock_before = _sample("wallet_lock_wait_seconds_count", {"path": "sync"})
+        ok_before = _sample("wallet_transfers_total", {"path": "sync", "result": "ok"})
+        queries_before = _sample("wallet_http_db_queries_count", {"route": "api/transfer/"})
+
+        self.assertEqual(self._post("10.00", HTTP_IDEMPOTENCY_KEY="metrics-1").status_code, 200)
+
+        for s in stages:
+            self.assertEqual(_sample("wallet_transfer_stage_seconds_count", {"stage": s}), before[s] + 1, s)
+        self.assertEqual(_sample("wallet_lock_wait_seconds_count", {"path": "sync"}), lock_before + 1)
+        self.assertEqual(_sample("wallet_transfers_total", {"path": "sync", "result": "ok"}), ok_before + 1)
+        self.assertEqual(_sample("wallet_http_db_queries_count", {"route": "api/transfer/"}), queries_before + 1)
+        self.assertGreater(_sample("wallet_http_db_queries_sum", {"route": "api/transfer/"}), 0)
+
+    def test_rejected_transfer_is_counted(self):
+        before = _sample("wallet_transfers_total", {"path": "sync", "result": "insufficient_funds"})
+        self.assertEqual(self._post("500.00").status_code, 409)
+        self.assertEqual(_sample("wallet_transfers_total", {"path": "sync", "result": "insufficient_funds"}), before + 1)
+
+    def test_metrics_endpoint(self):
+        self._post("1.00")
+        r = self.client.get("/metrics")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r["Content-Type"].startswith("text/plain"))
+        body = r.content.decode()
+        self.assertIn('wallet_transfer_stage_seconds_bucket{le="0.0005",stage="lock"}', body)
+        self.assertIn("wallet_lock_wait_seconds_count", body)
+        self.assertIn("wallet_outbox_pending 1.0", body)
+        self.assertIn('wallet_cache_hits_total{cache="currency"', body)
+
+    def test_pool_wait_and_saturation(self):
+        labels = f'alias="default",pid="{os.getpid()}"'
+        with ConnectionPool(_conninfo(), min_size=1, max_size=2, open=True) as pool:
+            with mock.patch("wallets.metrics._db_pools", return_value=[("default", pool)]):
+                with pool.connection(), pool.connection():
+                    body = self.client.get("/metrics").content.decode()
+        self.assertIn(f"wallet_db_pool_saturation{{{labels}}} 1.0", body)
+        self.assertIn(f"wallet_db_pool_max{{{labels}}} 2.0", body)
+        self.assertIn(f"wallet_db_pool_requests_total{{{labels}}} 2.0", body)
+        self.assertIn(f"wallet_db_pool_wait_seconds_total{{{labels}}}", body)
+
+    def test_scrape_does_not_create_pools(self):
+        # Алиас с настроенным пулом, которым процесс ещё не пользовался: scrape не должен открыть ему соединения.
+        conn = connections["default"]
+        with mock.patch.dict(conn.settings_dict["OPTIONS"], pool={"min_size": 1}), mock.patch.dict(
+            connections.settings["default"]["OPTIONS"], pool={"min_size": 1}
+        ):
+            self.assertEqual([alias for alias, _ in metrics._db_pools()], [])
+            self.assertNotIn("default", conn._connection_pools)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_metrics_are_not_recorded(self):
+        before = _sample("wallet_transfer_stage_seconds_count", {"stage": "lock"})
+        self.assertEqual(self._post("1.00").status_code, 200)
+        self.assertEqual(_sample("wallet_transfer_stage_seconds_count", {"stage": "lock"}), before)
+
+
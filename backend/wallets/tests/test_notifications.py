@@ -0,0 +1,61 @@
+import time
+import uuid
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from wallets import notifications
+from wallets.models import NotificationDeadLetter
+from wallets.notifications import Notification
+from wallets.tasks import send_notifications
+
+
+def _items(n: int) -> list[dict[str, str]]:
+    return [Notification(to_wallet_id=str(uuid.uuid4()), transaction_id=str(uuid.uuid4())).as_dict() for _ in range(n)]
+
+
+@override_settings(NOTIFICATION_LATENCY=0.05, NOTIFICATION_FAILURE_RATE=0.0, NOTIFICATION_MAX_RETRIES=2)
+class NotificationDispatchTests(TestCase):
+    def test_batch_is_delivered_concurrently(self):
+        started = time.perf_counter()
+        delivered = send_notifications.apply(kwargs={"items": _items(50)}).get()
+        self.assertEqual(delivered, 50)
+        # Последовательно это было бы 50 * 0.05 = 2.5 с.
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_only_failed_items_are_retried(self):
+        items = _items(4)
+        flaky = {items[1]["transaction_id"]}
+        calls: list[str] = []
+
+        async def deliver(notification):
+            calls.append(notification.transaction_id)
+            if notification.transaction_id in flaky:
+                flaky.discard(notification.transaction_id)
+                raise notifications.DeliveryError("boom")
+
+        with mock.patch("wallets.notifications.deliver", deliver):
+            delivered = send_notifications.apply(kwargs={"items": items}).get()
+
+        self.assertEqual(delivered, 1)
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(calls[-1], items[1]["transaction_id"])
+        self.assertFalse(NotificationDeadLetter.objects.exists())
+
+    @override_settings(NOTIFICATION_FAILURE_RATE=1.0)
+    def test_exhausted_retries_go_to_dead_letter(self):
+        items = _items(3)
+        send_notifications.apply(kwargs={"items": items})
+
+        letters = NotificationDeadLetter.objects.all()
+        self.assertEqual(letters.count(), 3)
+        self.assertEqual({str(letter.transaction_id) for letter in letters}, {i["transaction_id"] for i in items})
+        self.assertTrue(all(letter.attempts == 3 for letter in letters))
+
+    @override_settings(NOTIFICATION_RETRY_BACKOFF_BASE=1.0, NOTIFICATION_RETRY_BACKOFF_MAX=10.0)
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [notifications.backoff_delay(attempt) for attempt in range(10) for _ in range(20)]
+        self.assertTrue(all(0 <= d <= 10.0 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
@@ -0,0 +1,101 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from wallets import outbox
+from wallets.models import OutboxEvent, Wallet
+from wallets.notifications import Notification
+from wallets.services import InsufficientFunds, transfer
+
+
+class OutboxTests(TestCase):
+    def setUp(self) -> None:
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_outbox", currency=currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_outbox", currency=currency, balance=Decimal("0.00"))
+
+    def _transfer(self, amount: str):
+        return transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal(amount))
+
+    def test_event_is_written_with_the_transfer(self):
+        with self.assertRaises(InsufficientFunds):
+            self._transfer("500.00")
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        result = self._transfer("10.00")
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, outbox.TOPIC_NOTIFICATION)
+        self.assertEqual(event.payload, {"to_wallet_id": str(self.b.id), "transaction_id": str(result.transaction.id)})
+
+    def test_relay_publishes_in_batches_and_deletes(self):
+        results = [self._transfer("1.00") for _ in range(5)]
+
+        with mock.patch("wallets.outbox.notifications.enqueue") as enqueue:
+            self.assertEqual(outbox.relay_batch(3).published, 3)
+            self.assertEqual(outbox.relay_batch(3).published, 2)
+            self.assertEqual(outbox.relay_batch(3).published, 0)
+
+        self.assertEqual(enqueue.call_count, 2)
+        published = [n for call in enqueue.call_args_list for n in call.args[0]]
+        self.assertEqual(
+            published,
+            [Notification(to_wallet_id=str(self.b.id), transaction_id=str(r.transaction.id)) for r in results],
+        )
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(outbox.backlog()["pending"], 0)
+
+    def test_failed_publish_keeps_events(self):
+        self._transfer("1.00")
+
+        def broken(events):
+            raise ConnectionError("broker down")
+
+        with self.assertRaises(ConnectionError):
+            outbox.relay_batch(10, publisher=broken)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        self.assertEqual(outbox.backlog()["pending"], 1)
+
+
+class OutboxSkipLockedTests(TransactionTestCase):
+    def test_concurrent_relays_do_not_share_events(self):
+        OutboxEvent.objects.bulk_create(
+            [OutboxEvent(topic=outbox.TOPIC_NOTIFICATION, payload={"i": i}) for i in range(10)]
+        )
+        claimed = threading.Event()
+        release = threading.Event()
+        first: list[int] = []
+
+        def slow_publisher(events):
+            first.extend(p["i"] for p in events[outbox.TOPIC_NOTIFICATION])
+            claimed.set()
+            release.wait(5)
+
+        def run_first():
+            try:
+                outbox.relay_batch(6, publisher=slow_publisher)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run_first)
+        thread.start()
+        self.assertTrue(claimed.wait(5))
+
+        second: list[int] = []
+        batch = outbox.relay_batch(
+            100, publisher=lambda events: second.extend(p["i"] for p in events[outbox.TOPIC_NOTIFICATION])
+        )
+        release.set()
+        thread.join(5)
+
+        self.assertEqual(batch.published, 4)
+        self.assertEqual(sorted(first + second), list(range(10)))
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
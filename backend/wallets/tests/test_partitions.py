@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from wallets import partitions, statements
+from wallets.models import IdempotencyKey, ReconciliationCheckpoint, Transaction, Wallet
+from wallets.reconciliation import reconcile
+from wallets.services import transfer
+
+
+def _utc(year: int, month: int, day: int = 1) -> datetime:
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+class TransactionPartitionTests(TestCase):
+    def setUp(self) -> None:
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin = Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_part", currency=currency, balance=Decimal("1000.00"))
+        self.b = Wallet.objects.create(owner_name="B_part", currency=currency, balance=Decimal("0.00"))
+
+    def _transfer(self, amount: str = "10.00") -> Transaction:
+        return transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal(amount)).transaction
+
+    def _move(self, tx: Transaction, created_at: datetime) -> None:
+        # UPDATE ключа партиционирования переносит строку в другую партицию.
+        Transaction.objects.filter(pk=tx.pk).update(created_at=created_at)
+
+    def _partition_of(self, tx: Transaction) -> str:
+        with connection.cursor() as cur:
+            cur.execute(f"SELECT tableoid::regclass::text FROM {Transaction._meta.db_table} WHERE id = %s", [tx.id])
+            return cur.fetchone()[0]
+
+    def test_rows_land_in_monthly_partition(self):
+        tx = self._transfer()
+        self.assertEqual(self._partition_of(tx), partitions.partition_name(partitions.month_start(tx.created_at)))
+        names = {p.name for p in partitions.list_partitions()}
+        self.assertIn(partitions.DEFAULT_PARTITION, names)
+        self.assertEqual(partitions.ensure_partitions(), [])
+
+    def test_ensure_moves_stray_rows_out_of_default(self):
+        tx = self._transfer()
+        self._move(tx, _utc(2031, 2, 14))
+        self.assertEqual(self._partition_of(tx), partitions.DEFAULT_PARTITION)
+
+        created = partitions.ensure_partitions(2, now=_utc(2031, 1, 20))
+
+        table = Transaction._meta.db_table
+        self.assertEqual(created, [f"{table}_y2031m01", f"{table}_y2031m02", f"{table}_y2031m03"])
+        self.assertEqual(self._partition_of(tx), f"{table}_y2031m02")
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_ensure_skips_months_covered_by_legacy_partition(self):
+        # Как после 0013 на непустом леджере: одна партиция на несколько месяцев.
+        table = Transaction._meta.db_table
+        with connection.cursor() as cur:
+            cur.execute(
+                f"CREATE TABLE {table}_legacy PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                [_utc(2032, 1).isoformat(), _utc(2032, 4).isoformat()],
+            )
+
+        self.assertEqual(partitions.ensure_partitions(2, now=_utc(2032, 2, 10)), [f"{table}_y2032m04"])
+
+    def test_archive_defers_partition_referenced_by_idempotency_key(self):
+        old = self._transfer()
+        partitions.create_partition(_utc(2020, 3))
+        self._move(old, _utc(2020, 3, 5))
+        key = IdempotencyKey.objects.create(
+            key="k-part", request_hash="h", transaction=old, response_status=200, response_body={}
+        )
+        self.assertFalse(reconcile(settle_lag=timedelta(0), adopt_opening_balances=True).mismatches)
+        with connection.cursor() as cur:
+            cur.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archived, [deferred] = partitions.archive_partitions(12, archive_dir)
+            self.assertEqual(archived, [])
+            self.assertEqual(deferred.name, partitions.partition_name(_utc(2020, 3)))
+            self.assertIn(IdempotencyKey._meta.db_table, deferred.reason)
+            self.assertTrue(Transaction.objects.filter(pk=old.pk).exists())
+
+            key.delete()
+            [done], deferred = partitions.archive_partitions(12, archive_dir)
+        self.assertEqual((done.name, done.rows, deferred), (partitions.partition_name(_utc(2020, 3)), 1, []))
+
+    def test_archive_old_month_to_gzip(self):
+        old, kept = self._transfer("10.00"), self._transfer("20.00")
+        partitions.create_partition(_utc(2020, 3))
+        self._move(old, _utc(2020, 3, 5))
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archived, deferred = partitions.archive_partitions(12, archive_dir)
+            self.assertEqual((archived, [p.name for p in deferred]), ([], [partitions.partition_name(_utc(2020, 3))]))
+
+            # Сверка фиксирует checkpoint по всем кошелькам — после этого старый месяц можно убрать из леджера.
+            self.assertFalse(reconcile(settle_lag=timedelta(0), adopt_opening_balances=True).mismatches)
+            self.assertEqual(ReconciliationCheckpoint.objects.count(), Wallet.objects.count())
+            # TestCase держит всё в одной транзакции: отложенные проверки FK от вставок выше не дают сделать DROP.
+            with connection.cursor() as cur:
+                cur.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            [done], deferred = partitions.archive_partitions(12, archive_dir)
+
+            self.assertEqual(deferred, [])
+            self.assertEqual(done.rows, 1)
+            with gzip.open(done.path, "rt") as f:
+                rows = list(csv.DictReader(io.StringIO(f.read())))
+            self.assertEqual([(r["id"], r["amount"]) for r in rows], [(str(old.id), "10.00")])
+            self.assertFalse(os.path.exists(f"{done.path}.tmp"))
+
+        self.assertNotIn(done.name, {p.name for p in partitions.list_partitions()})
+        self.assertEqual(list(Transaction.objects.values_list("id", flat=True)), [kept.id])
+        self.assertFalse(reconcile(settle_lag=timedelta(0)).mismatches)
+
+    def test_statement_cursor_prunes_newer_partitions(self):
+        tx = self._transfer()
+        cursor_at = tx.created_at
+        next_month = partitions.add_months(partitions.month_start(cursor_at), 1)
+        with connection.cursor() as cur:
+            cur.execute(
+                "EXPLAIN " + statements._statement_sql(True),
+                statements._statement_params([self.a.id, cursor_at, cursor_at, tx.id, 10], 10),
+            )
+            plan = "\n".join(row[0] for row in cur.fetchall())
+
+        self.assertIn(partitions.partition_name(partitions.month_start(cursor_at)), plan)
+        self.assertNotIn(partitions.partition_name(next_month), plan)
+
+
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from wallets import replicas
+from wallets.models import Wallet
+
+
+def _state(alias: str, *, available: bool = True, lag: float = 0.0, lsn: int = 1000) -> replicas.ReplicaState:
+    return replicas.ReplicaState(alias, available, lag, lsn, time.monotonic())
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0", "replica_1"], REPLICA_MAX_LAG=1.0, REPLICA_LAG_CHECK_INTERVAL=60)
+class ChooseReplicaTests(SimpleTestCase):
+    def setUp(self) -> None:
+        replicas.reset()
+        self.addCleanup(replicas.reset)
+        self.states = {"replica_0": _state("replica_0"), "replica_1": _state("replica_1")}
+        patcher = mock.patch("wallets.replicas._probe", side_effect=lambda alias: self.states[alias])
+        self.probe = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_round_robin_between_healthy_replicas(self):
+        self.assertEqual({replicas.choose() for _ in range(4)}, {"replica_0", "replica_1"})
+        # Состояние кэшируется на REPLICA_LAG_CHECK_INTERVAL: по одной проверке на реплику.
+        self.assertEqual(self.probe.call_count, 2)
+
+    def test_lagging_and_unavailable_replicas_are_skipped(self):
+        self.states["replica_0"] = _state("replica_0", lag=5.0)
+        self.assertEqual({replicas.choose() for _ in range(4)}, {"replica_1"})
+
+        replicas.reset()
+        self.states["replica_1"] = _state("replica_1", available=False)
+        self.assertEqual(replicas.choose(), replicas.PRIMARY)
+
+    def test_read_your_writes_falls_back_until_replica_catches_up(self):
+        self.states["replica_0"] = _state("replica_0", lsn=900)
+        self.states["replica_1"] = _state("replica_1", lsn=900)
+        self.assertEqual(replicas.choose(min_lsn=950), replicas.PRIMARY)
+        self.assertIn(replicas.choose(min_lsn=900), {"replica_0", "replica_1"})
+
+    def test_middleware_pins_request_to_one_alias(self):
+        seen = []
+
+        def view(request):
+            seen.extend([replicas.read_alias(), replicas.read_alias()])
+            replicas.ReplicaRouter().db_for_write(Wallet)
+            seen.append(replicas.read_alias())
+            return HttpResponse()
+
+        request = RequestFactory().get("/api/wallets/x/transactions", HTTP_X_READ_LSN=replicas.format_lsn(500))
+        replicas.ReplicaRoutingMiddleware(view)(request)
+
+        self.assertIn(seen[0], {"replica_0", "replica_1"})
+        self.assertEqual(seen[1], seen[0])
+        # После записи внутри GET запрос дочитывает с primary.
+        self.assertEqual(seen[2], replicas.PRIMARY)
+        self.assertEqual(replicas.read_alias(), replicas.PRIMARY)
+
+    def test_sticky_lsn_from_cookie(self):
+        self.states["replica_0"] = _state("replica_0", lsn=900)
+        self.states["replica_1"] = _state("replica_1", lsn=900)
+        seen = []
+
+        def view(request):
+            seen.append(replicas.read_alias())
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.COOKIES[replicas.COOKIE] = replicas.format_lsn(901)
+        replicas.ReplicaRoutingMiddleware(view)(request)
+        self.assertEqual(seen, [replicas.PRIMARY])
+
+    def test_lsn_roundtrip(self):
+        self.assertEqual(replicas.parse_lsn("16/B374D848"), (0x16 << 32) | 0xB374D848)
+        self.assertEqual(replicas.format_lsn(replicas.parse_lsn("16/B374D848")), "16/B374D848")
+        self.assertIsNone(replicas.parse_lsn("garbage"))
+
+
+@override_settings(DATABASE_REPLICAS=["default"], REPLICA_LAG_CHECK_INTERVAL=0)
+class StandInReplicaTests(TestCase):
+    # Стенд без второго сервера: реплика — тот же default, проверка идёт по настоящему SQL.
+    def setUp(self) -> None:
+        replicas.reset()
+        self.addCleanup(replicas.reset)
+        self.client = APIClient()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency)
+        self.a = Wallet.objects.create(owner_name="A_replica", currency=currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_replica", currency=currency)
+
+    def test_transfer_then_statement(self):
+        r = self.client.post(
+            "/api/transfer", {"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "10.00"},
+            format="json",
+        )
+        self.assertEqual(r.status_code, 200)
+        lsn = replicas.parse_lsn(r[replicas.HEADER])
+        self.assertIsNotNone(lsn)
+        self.assertEqual(r.cookies[replicas.COOKIE].value, r[replicas.HEADER])
+
+        state = replicas.state("default")
+        self.assertTrue(state.available)
+        self.assertEqual(state.lag_seconds, 0.0)
+        self.assertGreaterEqual(state.replay_lsn, lsn)
+
+        r = self.client.get(f"/api/wallets/{self.b.id}/transactions")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json()["results"]), 1)
+
+
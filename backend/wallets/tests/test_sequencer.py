@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import os
+import random
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from wallets import sequencer, wallet_cache
+from wallets.models import SequencerCheckpoint, Transaction, Wallet
+from wallets.sequencer import Outcome, Sequencer, TransferRequest
+from wallets.services import InsufficientFunds, InvalidTransfer, TransferError, transfer
+
+
+def _operations(n: int, seed: int = 7) -> list[tuple[int, int, Decimal]]:
+    # Индексы кошельков и суммы: переводы с комиссией (> 1000), перерасход и перевод самому себе.
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(n):
+        src = rng.randrange(3)
+        dst = src if rng.random() < 0.05 else rng.randrange(3)
+        amount = Decimal(rng.choice(["0.01", "5.00", "250.00", "1000.00", "1000.01", "1500.00", "4000.00"]))
+        ops.append((src, dst, amount))
+    return ops
+
+
+class SequencerTests(TestCase):
+    def setUp(self) -> None:
+        wallet_cache.clear()
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin = Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"),
+            currency=self.currency,
+            balance=Decimal("0.00"),
+        )
+        self.wal_dir = tempfile.TemporaryDirectory()
+        self.wal_path = os.path.join(self.wal_dir.name, "sequencer.wal")
+
+    def tearDown(self) -> None:
+        self.wal_dir.cleanup()
+
+    def _wallets(self, prefix: str) -> list[Wallet]:
+        return [
+            Wallet.objects.create(owner_name=f"{prefix}{i}", currency=self.currency, balance=Decimal(balance))
+            for i, balance in enumerate(["5000.00", "1200.00", "0.00"])
+        ]
+
+    def _open(self, wallets: list[Wallet]) -> Sequencer:
+        return Sequencer.open([str(w.id) for w in wallets], self.wal_path)
+
+    def _admin_balance(self) -> Decimal:
+        self.admin.refresh_from_db()
+        return self.admin.balance
+
+    def test_matches_db_path(self):
+        ops = _operations(300)
+
+        db_wallets = self._wallets("db-")
+        admin_before = self._admin_balance()
+        db_outcomes: list[type | None] = []
+        for src, dst, amount in ops:
+            try:
+                transfer(from_wallet_id=str(db_wallets[src].id), to_wallet_id=str(db_wallets[dst].id), amount=amount)
+                db_outcomes.append(None)
+            except TransferError as e:
+                db_outcomes.append(type(e))
+        db_fees = self._admin_balance() - admin_before
+        db_ledger = list(Transaction.objects.order_by("created_at", "id"))
+
+        seq_wallets = self._wallets("seq-")
+        seq = self._open(seq_wallets)
+        admin_before = self._admin_balance()
+        requests = [
+            TransferRequest(str(seq_wallets[src].id), str(seq_wallets[dst].id), amount) for src, dst, amount in ops
+        ]
+        outcomes: list[Outcome] = []
+        rng = random.Random(1)
+        while requests:
+            size = rng.randint(1, 40)
+            outcomes.extend(seq.submit(requests[:size]))
+            requests = requests[size:]
+            if rng.random() < 0.3:
+                seq.flush()
+        seq.flush()
+        seq.close()
+
+        self.assertEqual([None if o.ok else type(o.error) for o in outcomes], db_outcomes)
+        self.assertEqual(self._admin_balance() - admin_before, db_fees)
+        for db_wallet, seq_wallet in zip(db_wallets, seq_wallets):
+            db_wallet.refresh_from_db()
+            seq_wallet.refresh_from_db()
+            self.assertEqual(seq_wallet.balance, db_wallet.balance)
+            self.assertEqual(seq.engine.balances[str(seq_wallet.id)], db_wallet.balance)
+
+        index = {str(w.id): i for i, w in enumerate(db_wallets)} | {str(w.id): i for i, w in enumerate(seq_wallets)}
+
+        def row(tx: Transaction) -> tuple:
+            return (
+                index[str(tx.from_wallet_id)],
+                index[str(tx.to_wallet_id)],
+                tx.amount,
+                tx.fee,
+                tx.fee_wallet_id is not None,
+                tx.from_balance_after,
+                tx.to_balance_after,
+            )
+
+        seq_ledger = Transaction.objects.filter(from_wallet__in=seq_wallets).order_by("created_at", "id")
+        applied = [o.transfer.id for o in outcomes if o.ok]
+        self.assertEqual([str(tx.id) for tx in seq_ledger], applied)
+        self.assertEqual([row(tx) for tx in seq_ledger], [row(tx) for tx in db_ledger])
+        self.assertEqual(SequencerCheckpoint.objects.get(name=seq.name).last_seq, seq.seq)
+
+    def test_recovers_unflushed_batches_from_wal(self):
+        wallets = self._wallets("wal-")
+        ids = [str(w.id) for w in wallets]
+        seq = self._open(wallets)
+        seq.submit([TransferRequest(ids[0], ids[1], Decimal("100.00"))])
+        seq.flush()
+        seq.submit(
+            [TransferRequest(ids[0], ids[2], Decimal("1500.00")), TransferRequest(ids[1], ids[2], Decimal("50.00"))]
+        )
+        seq.submit([TransferRequest(ids[2], ids[0], Decimal("10.00"))])
+        expected = dict(seq.engine.balances)
+        seq.close()
+        # Падение посреди записи следующего пакета: хвост без перевода строки.
+        with open(self.wal_path, "ab") as f:
+            f.write(b"deadbeef {\"seq\": 99")
+
+        self.assertEqual(Transaction.objects.count(), 1)
+        recovered = self._open(wallets)
+        recovered.close()
+
+        self.assertEqual(recovered.engine.balances, expected)
+        self.assertEqual(recovered.seq, 3)
+        self.assertEqual(Transaction.objects.count(), 4)
+        for wallet in wallets:
+            wallet.refresh_from_db()
+            self.assertEqual(wallet.balance, expected[str(wallet.id)])
+        self.assertEqual(os.path.getsize(self.wal_path), 0)
+
+    def test_flushed_records_are_not_replayed(self):
+        wallets = self._wallets("ckpt-")
+        ids = [str(w.id) for w in wallets]
+        seq = self._open(wallets)
+        seq.submit([TransferRequest(ids[0], ids[1], Decimal("100.00"))])
+        # Падение между COMMIT flush и очисткой WAL: запись уже в Postgres и в журнале.
+        with mock.patch.object(seq.wal, "reset"):
+            seq.flush()
+        seq.close()
+
+        recovered = self._open(wallets)
+        recovered.close()
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(recovered.engine.balances[ids[0]], Decimal("4900.00"))
+
+    def test_external_credit_is_picked_up_on_flush(self):
+        wallets = self._wallets("ext-")
+        ids = [str(w.id) for w in wallets]
+        outsider = Wallet.objects.create(owner_name="ext-outsider", currency=self.currency, balance=Decimal("500.00"))
+        seq = self._open(wallets)
+        with override_settings(SEQUENCER_WALLETS=ids):
+            transfer(from_wallet_id=str(outsider.id), to_wallet_id=ids[2], amount=Decimal("200.00"))
+            with self.assertRaises(InvalidTransfer):
+                transfer(from_wallet_id=ids[2], to_wallet_id=str(outsider.id), amount=Decimal("1.00"))
+
+        [outcome] = seq.submit([TransferRequest(ids[2], ids[0], Decimal("1.00"))])
+        self.assertIsInstance(outcome.error, InsufficientFunds)
+        seq.submit([TransferRequest(ids[0], ids[1], Decimal("1.00"))])
+        seq.flush()
+        seq.close()
+        self.assertEqual(seq.engine.balances[ids[2]], Decimal("200.00"))
+
+    def test_reserved_funds_are_not_spent(self):
+        wallets = self._wallets("res-")
+        ids = [str(w.id) for w in wallets]
+        # Холд открыт до того, как кошелёк попал в SEQUENCER_WALLETS.
+        Wallet.objects.filter(id=ids[1]).update(reserved=Decimal("1000.00"))
+        seq = self._open(wallets)
+
+        [outcome] = seq.submit([TransferRequest(ids[1], ids[2], Decimal("300.00"))])
+        self.assertIsInstance(outcome.error, InsufficientFunds)
+        [outcome] = seq.submit([TransferRequest(ids[1], ids[2], Decimal("200.00"))])
+        self.assertTrue(outcome.ok)
+        self.assertEqual(seq.flush(), 1)
+
+        # Void холда мимо sequencer освобождает резерв — виден после flush.
+        Wallet.objects.filter(id=ids[1]).update(reserved=Decimal("0.00"))
+        seq.flush()
+        [outcome] = seq.submit([TransferRequest(ids[1], ids[2], Decimal("300.00"))])
+        self.assertTrue(outcome.ok)
+        seq.flush()
+        seq.close()
+        self.assertEqual(Wallet.objects.get(id=ids[1]).balance, Decimal("700.00"))
+
+    def test_api_routes_sequenced_wallets(self):
+        wallets = self._wallets("api-")
+        ids = [str(w.id) for w in wallets]
+        done = sequencer.SequencedTransfer(
+            id="6f0e3c53-2d0b-4a0c-9d67-8b1f0d3a9c11",
+            from_wallet_id=ids[0],
+            to_wallet_id=ids[1],
+            fee_wallet_id=str(self.admin.id),
+            amount=Decimal("10.00"),
+            fee=Decimal("0.00"),
+            from_balance_after=Decimal("4990.00"),
+            to_balance_after=None,
+        )
+        client = APIClient()
+        payload = {"from_wallet_id": ids[0], "to_wallet_id": ids[1], "amount": "10.00"}
+        with override_settings(SEQUENCER_WALLETS=ids[:1]), mock.patch(
+            "wallets.sequencer.call", return_value=Outcome(transfer=done)
+        ) as call:
+            r = client.post("/api/transfer/", data=payload, format="json")
+            replayed = client.post("/api/transfer/", data=payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(call.call_count, 1)
+        self.assertTrue(r.json()["sequenced"])
+        self.assertEqual(r.json()["balances"]["from_wallet"]["balance"], "4990.00")
+        self.assertIsNone(r.json()["balances"]["to_wallet"]["balance"])
+        self.assertEqual(replayed.status_code, 400)
+
+
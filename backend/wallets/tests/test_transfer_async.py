@@ -0,0 +1,104 @@
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase
+from psycopg.conninfo import conninfo_to_dict
+
+from wallets import async_services, wallet_cache
+from wallets.async_services import close_pool
+from wallets.models import OutboxEvent, Transaction, Wallet
+
+
+class AsyncTransferTests(TransactionTestCase):
+    def setUp(self) -> None:
+        wallet_cache.clear()
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        self.admin = Wallet.objects.create(owner_name=self.admin_owner, currency=self.currency, balance=Decimal("0.00"))
+        self.a = Wallet.objects.create(owner_name="A_async", currency=self.currency, balance=Decimal("2000.00"))
+        self.b = Wallet.objects.create(owner_name="B_async", currency=self.currency, balance=Decimal("0.00"))
+
+    def tearDown(self) -> None:
+        wallet_cache.clear()
+
+    def _post(self, payload: dict, **headers):
+        # Пул привязан к event loop, а async_to_sync создаёт новый loop на каждый вызов.
+        async def go():
+            try:
+                return await AsyncClient().post(
+                    "/api/transfer/async", data=payload, content_type="application/json", headers=headers
+                )
+            finally:
+                await close_pool()
+
+        return async_to_sync(go)()
+
+    def test_matches_sync_transfer(self):
+        r = self._post({"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "1500.00"})
+
+        self.assertEqual(r.status_code, 200)
+        body = r.json()
+        self.assertEqual(body["fee"], "150.00")
+        self.assertEqual(body["total_debited"], "1650.00")
+        self.assertEqual(body["balances"]["from_wallet"]["balance"], "350.00")
+        self.assertEqual(body["balances"]["to_wallet"]["balance"], "1500.00")
+        self.assertEqual(body["balances"]["admin_wallet"], {"id": str(self.admin.id), "balance": "150.00"})
+
+        tx = Transaction.objects.get()
+        self.assertEqual(body["transaction_id"], str(tx.id))
+        self.assertEqual(tx.fee_wallet_id, self.admin.id)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("350.00"))
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.payload, {"to_wallet_id": str(self.b.id), "transaction_id": str(tx.id)})
+
+    def test_errors(self):
+        r = self._post({"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "5000.00"})
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r.json(), {"detail": "Insufficient funds"})
+
+        r = self._post({"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.a.id), "amount": "1.00"})
+        self.assertEqual(r.status_code, 400)
+
+        r = self._post({"from_wallet_id": str(self.a.id), "amount": "1.00"})
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("to_wallet_id", r.json())
+
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_creates_admin_wallet_and_replays_idempotency_key(self):
+        Wallet.objects.filter(id=self.admin.id).delete()
+        payload = {"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "10.00"}
+
+        first = self._post(payload, **{"Idempotency-Key": "async-1"})
+        second = self._post(payload, **{"Idempotency-Key": "async-1"})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers.get("Idempotent-Replayed"), "true")
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertTrue(Wallet.objects.filter(owner_name=self.admin_owner, currency=self.currency).exists())
+
+
+class AsyncConninfoTests(SimpleTestCase):
+    def test_keeps_connection_options(self):
+        options = {
+            "sslmode": "require",
+            "connect_timeout": 3,
+            "options": "-c search_path=ledger",
+            "isolation_level": 1,
+            "pool": {"min_size": 1},
+        }
+        with mock.patch.dict(settings.DATABASES["default"], OPTIONS=options):
+            params = conninfo_to_dict(async_services._conninfo())
+
+        self.assertEqual((params["sslmode"], params["connect_timeout"]), ("require", "3"))
+        self.assertEqual(params["options"], "-c search_path=ledger -c TimeZone=UTC")
+        self.assertNotIn("isolation_level", params)
+        self.assertNotIn("pool", params)
+
+
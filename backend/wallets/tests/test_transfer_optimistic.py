@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+
+from wallets import contention, services
+from wallets.models import Transaction, Wallet
+from wallets.services import TransferItem, transfer, transfer_many
+
+
+def _lock_queries(ctx: CaptureQueriesContext) -> list[str]:
+    # Отдельный SELECT ... FOR UPDATE пессимистичного пути; захват строк внутри CTE перевода сюда не входит.
+    return [
+        q["sql"] for q in ctx.captured_queries if q["sql"].lstrip().startswith("SELECT") and "FOR UPDATE" in q["sql"]
+    ]
+
+
+def _conflicts() -> float:
+    return REGISTRY.get_sample_value("wallet_optimistic_conflicts_total", {"path": "sync"}) or 0.0
+
+
+@override_settings(TRANSFER_LOCKING_MODE="optimistic", TRANSFER_RETRY_BACKOFF_BASE=0.0)
+class OptimisticTransferTests(TransactionTestCase):
+    def setUp(self) -> None:
+        contention.hot_wallets.clear()
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin = Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_opt", currency=currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_opt", currency=currency, balance=Decimal("0.00"))
+
+    def _transfer(self, amount: str):
+        return transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal(amount))
+
+    def test_transfer_without_row_locks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = self._transfer("10.00")
+
+        self.assertFalse(_lock_queries(ctx))
+        self.assertEqual(result.from_wallet.balance, Decimal("90.00"))
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.admin.refresh_from_db()
+        self.assertEqual((self.a.balance, self.a.version), (Decimal("90.00"), 1))
+        self.assertEqual((self.b.balance, self.b.version), (Decimal("10.00"), 1))
+        # Комиссии нет — admin-кошелёк не обновлялся.
+        self.assertEqual(self.admin.version, 0)
+
+    def test_pessimistic_writes_bump_version(self):
+        with override_settings(TRANSFER_LOCKING_MODE="pessimistic"):
+            self._transfer("10.00")
+        transfer_many([TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))])
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.version, 2)
+
+    def test_conflict_falls_back_to_pessimistic(self):
+        real = services._read_wallets
+        main = threading.get_ident()
+        raced = []
+
+        def interleaved(wallet_ids):
+            wallets = real(wallet_ids)
+            if threading.get_ident() == main and not raced:
+                raced.append(1)
+                thread = threading.Thread(target=self._concurrent_transfer)
+                thread.start()
+                thread.join(5)
+            return wallets
+
+        before = _conflicts()
+        with mock.patch("wallets.services._read_wallets", interleaved), CaptureQueriesContext(connection) as ctx:
+            self._transfer("10.00")
+
+        self.assertEqual(_conflicts(), before + 1)
+        self.assertTrue(contention.hot_wallets.any_hot([str(self.a.id)]))
+        self.assertTrue(_lock_queries(ctx))
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("85.00"))
+        self.assertEqual(Transaction.objects.count(), 2)
+        tx = Transaction.objects.get(amount=Decimal("10.00"))
+        self.assertEqual(tx.from_balance_after, Decimal("85.00"))
+
+    def test_concurrent_fee_credits_do_not_conflict(self):
+        # Два перевода с комиссией с разных кошельков: общий admin-шард и общий получатель меняются между
+        # чтением и UPDATE, но зачисления version не сверяют.
+        currency = self.a.currency
+        c = Wallet.objects.create(owner_name="C_opt", currency=currency, balance=Decimal("5000.00"))
+        d = Wallet.objects.create(owner_name="D_opt", currency=currency, balance=Decimal("5000.00"))
+        real = services._read_wallets
+        main = threading.get_ident()
+        raced = []
+
+        def concurrent() -> None:
+            try:
+                transfer(from_wallet_id=str(d.id), to_wallet_id=str(self.b.id), amount=Decimal("1500.00"))
+            finally:
+                connection.close()
+
+        def interleaved(wallet_ids):
+            wallets = real(wallet_ids)
+            if threading.get_ident() == main and not raced:
+                raced.append(1)
+                thread = threading.Thread(target=concurrent)
+                thread.start()
+                thread.join(5)
+            return wallets
+
+        before = _conflicts()
+        with mock.patch("wallets.services._read_wallets", interleaved), CaptureQueriesContext(connection) as ctx:
+            result = transfer(from_wallet_id=str(c.id), to_wallet_id=str(self.b.id), amount=Decimal("2000.00"))
+
+        self.assertEqual(raced, [1])
+        self.assertEqual(_conflicts(), before)
+        self.assertFalse(_lock_queries(ctx))
+        self.assertFalse(contention.hot_wallets.any_hot([str(self.admin.id), str(self.b.id), str(c.id), str(d.id)]))
+        self.admin.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual(self.admin.balance, Decimal("350.00"))
+        self.assertEqual(self.b.balance, Decimal("3500.00"))
+        # to_balance_after переписан по фактическому балансу получателя после обоих зачислений.
+        self.assertEqual(result.transaction.to_balance_after, Decimal("3500.00"))
+        self.assertEqual(
+            list(Transaction.objects.order_by("to_balance_after").values_list("to_balance_after", flat=True)),
+            [Decimal("1500.00"), Decimal("3500.00")],
+        )
+
+    def test_insufficient_funds_stays_guarded(self):
+        with self.assertRaises(services.InsufficientFunds):
+            self._transfer("100.01")
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.balance, self.a.version), (Decimal("100.00"), 0))
+
+    def _concurrent_transfer(self) -> None:
+        try:
+            self._transfer("5.00")
+        finally:
+            connection.close()
+
+
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from prometheus_client import REGISTRY
+from psycopg import errors as pg_errors
+from rest_framework.test import APIClient
+
+from wallets import services
+from wallets.models import Transaction, Wallet
+from wallets.services import transfer
+
+
+def _retries(sqlstate: str, path: str = "sync") -> float:
+    return REGISTRY.get_sample_value("wallet_transfer_retries_total", {"path": path, "sqlstate": sqlstate}) or 0.0
+
+
+def _deadlock() -> OperationalError:
+    error = OperationalError("deadlock detected")
+    error.__cause__ = pg_errors.DeadlockDetected("deadlock detected")
+    return error
+
+
+@override_settings(TRANSFER_RETRY_BACKOFF_BASE=0.0)
+class TransferRetryTests(TransactionTestCase):
+    def setUp(self) -> None:
+        currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        Wallet.objects.create(
+            owner_name=getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"), currency=currency, balance=Decimal("0.00")
+        )
+        self.a = Wallet.objects.create(owner_name="A_retry", currency=currency, balance=Decimal("100.00"))
+        self.b = Wallet.objects.create(owner_name="B_retry", currency=currency, balance=Decimal("0.00"))
+
+    def _transfer(self, amount: str = "10.00"):
+        return transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal(amount))
+
+    def test_deadlock_is_retried(self):
+        real = services._apply_balances
+        calls = []
+
+        def flaky(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise _deadlock()
+            return real(*args, **kwargs)
+
+        before = _retries("40P01")
+        with mock.patch("wallets.services._apply_balances", flaky):
+            self._transfer()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(_retries("40P01"), before + 1)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("90.00"))
+
+    @override_settings(TRANSFER_MAX_RETRIES=2)
+    def test_exhausted_retries_return_503(self):
+        with mock.patch("wallets.services._apply_balances", side_effect=_deadlock()) as apply:
+            r = APIClient().post(
+                "/api/transfer/",
+                data={"from_wallet_id": str(self.a.id), "to_wallet_id": str(self.b.id), "amount": "10.00"},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="retry-exhausted",
+            )
+
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r["Retry-After"], "1")
+        self.assertEqual(apply.call_count, 3)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_other_errors_are_not_retried(self):
+        with mock.patch("wallets.services._apply_balances", side_effect=OperationalError("connection lost")) as apply:
+            with self.assertRaises(OperationalError):
+                self._transfer()
+        self.assertEqual(apply.call_count, 1)
+
+    @override_settings(TRANSFER_ISOLATION_LEVEL="repeatable read")
+    def test_repeatable_read_conflict_is_retried(self):
+        real = services._lock_wallets
+        main = threading.get_ident()
+        levels: list[str] = []
+
+        def interleaved(wallet_ids):
+            if threading.get_ident() == main and not levels:
+                with connection.cursor() as cur:
+                    # Первый запрос фиксирует снимок транзакции; затем кошелёк меняет параллельный перевод.
+                    cur.execute("SHOW transaction_isolation")
+                    levels.append(cur.fetchone()[0])
+                thread = threading.Thread(target=self._concurrent_transfer)
+                thread.start()
+                thread.join(5)
+            return real(wallet_ids)
+
+        before = _retries("40001")
+        with mock.patch("wallets.services._lock_wallets", interleaved):
+            self._transfer()
+
+        self.assertEqual(levels, ["repeatable read"])
+        self.assertEqual(_retries("40001"), before + 1)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("85.00"))
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def _concurrent_transfer(self) -> None:
+        try:
+            self._transfer("5.00")
+        finally:
+            connection.close()
+
+
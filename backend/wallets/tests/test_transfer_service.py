@@ -0,0 +1,145 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from wallets import wallet_cache
+from wallets.models import Transaction, Wallet
+from wallets.services import (
+    InsufficientFunds,
+    InvalidTransfer,
+    admin_wallet_balance,
+    consolidate_all_admin_shards,
+    transfer,
+)
+
+
+class TransferServiceTests(TestCase):
+    def setUp(self) -> None:
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        self.admin = Wallet.objects.create(owner_name=self.admin_owner, currency=self.currency, balance=Decimal("0.00"))
+        self.a = Wallet.objects.create(owner_name="A_svc", currency=self.currency, balance=Decimal("2000.00"))
+        self.b = Wallet.objects.create(owner_name="B_svc", currency=self.currency, balance=Decimal("0.00"))
+
+    def test_two_statements_and_balances_without_reread(self):
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("100.00"))
+
+        # Метаданные уже в кэше: SAVEPOINT + блокировка + UPDATE/INSERT + RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            result = transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1500.00"))
+
+        self.assertEqual(result.fee, Decimal("150.00"))
+        self.assertEqual(result.total_debited, Decimal("1650.00"))
+        self.assertEqual(result.from_wallet.balance, Decimal("250.00"))
+        self.assertEqual(result.to_wallet.balance, Decimal("1600.00"))
+        self.assertEqual(result.admin_wallet.balance, Decimal("150.00"))
+        self.assertEqual(result.admin_wallet.id, self.admin.id)
+
+        tx = Transaction.objects.get(pk=result.transaction.pk)
+        self.assertEqual(tx.amount, Decimal("1500.00"))
+        self.assertEqual(tx.fee, Decimal("150.00"))
+        self.assertEqual(tx.from_wallet_id, self.a.id)
+        self.assertEqual(tx.to_wallet_id, self.b.id)
+        self.assertEqual(tx.created_at, result.transaction.created_at)
+
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("250.00"))
+
+    def test_creates_admin_wallet_on_first_transfer(self):
+        c = Wallet.objects.create(owner_name="C_svc", currency="E", balance=Decimal("50.00"))
+        d = Wallet.objects.create(owner_name="D_svc", currency="E", balance=Decimal("0.00"))
+
+        result = transfer(from_wallet_id=str(c.id), to_wallet_id=str(d.id), amount=Decimal("10.00"))
+
+        admin = Wallet.objects.get(owner_name=self.admin_owner, currency="E")
+        self.assertEqual(result.admin_wallet.id, admin.id)
+        self.assertEqual(result.from_wallet.balance, Decimal("40.00"))
+        self.assertEqual(result.to_wallet.balance, Decimal("10.00"))
+
+    def test_metadata_cache_counters_and_invalidation(self):
+        wallet_cache.clear()
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+
+        stats = wallet_cache.stats()
+        self.assertEqual(stats["currency"]["misses"], 1)
+        self.assertEqual(stats["currency"]["hits"], 1)
+        self.assertEqual(stats["admin"]["misses"], 1)
+        self.assertEqual(stats["admin"]["hits"], 1)
+
+        self.a.currency = "E"
+        self.a.save(update_fields=["currency"])
+        with self.assertRaisesMessage(InvalidTransfer, "Валюты кошельков не совпадают"):
+            transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+        self.assertEqual(wallet_cache.stats()["currency"]["misses"], 2)
+
+    def test_stale_admin_wallet_id_is_reloaded(self):
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+        # Имитируем устаревшую запись в кэше (например, после удаления кошелька в другом процессе).
+        wallet_cache.admin_wallet_ids._local_set((self.currency, 0), "00000000-0000-0000-0000-000000000000")
+
+        result = transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1500.00"))
+
+        self.assertEqual(result.admin_wallet.id, self.admin.id)
+        self.assertEqual(result.admin_balance, Decimal("150.00"))
+
+    def test_insufficient_funds_changes_nothing(self):
+        with self.assertRaises(InsufficientFunds):
+            transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1900.00"))
+
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("2000.00"))
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_unknown_wallets(self):
+        missing = "00000000-0000-0000-0000-000000000000"
+        with self.assertRaisesMessage(InvalidTransfer, "from_wallet не найден"):
+            transfer(from_wallet_id=missing, to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+        with self.assertRaisesMessage(InvalidTransfer, "Один или несколько кошельков не найдены"):
+            transfer(from_wallet_id=str(self.a.id), to_wallet_id=missing, amount=Decimal("1.00"))
+
+
+@override_settings(ADMIN_WALLET_SHARDS=4)
+class AdminWalletShardTests(TestCase):
+    def setUp(self) -> None:
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        self.a = Wallet.objects.create(owner_name="A_shard", currency=self.currency, balance=Decimal("100000.00"))
+        self.b = Wallet.objects.create(owner_name="B_shard", currency=self.currency, balance=Decimal("0.00"))
+
+    def test_fees_spread_over_shards_and_total_is_reported(self):
+        for _ in range(20):
+            result = transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("2000.00"))
+            self.assertEqual(result.admin_balance, admin_wallet_balance(self.currency))
+            self.assertEqual(result.transaction.fee_wallet_id, result.admin_wallet.id)
+
+        shards = Wallet.objects.filter(owner_name=self.admin_owner, currency=self.currency)
+        self.assertGreater(shards.count(), 1)
+        self.assertLessEqual(shards.count(), 4)
+        self.assertEqual(result.admin_balance, Decimal("4000.00"))
+
+    def test_consolidation_folds_shards_into_primary(self):
+        for _ in range(20):
+            transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("2000.00"))
+        secondary = Wallet.objects.filter(owner_name=self.admin_owner, currency=self.currency, shard__gt=0, balance__gt=0)
+        expected_moved = sum((w.balance for w in secondary), Decimal("0.00"))
+        expected_moves = secondary.count()
+        before = Transaction.objects.count()
+
+        moved = consolidate_all_admin_shards()
+
+        self.assertEqual(moved.get(self.currency, Decimal("0.00")), expected_moved)
+        self.assertEqual(Transaction.objects.count() - before, expected_moves)
+        primary = Wallet.objects.get(owner_name=self.admin_owner, currency=self.currency, shard=0)
+        self.assertEqual(primary.balance, Decimal("4000.00"))
+        self.assertEqual(admin_wallet_balance(self.currency), Decimal("4000.00"))
+        self.assertFalse(
+            Wallet.objects.filter(owner_name=self.admin_owner, currency=self.currency, shard__gt=0)
+            .exclude(balance=0)
+            .exists()
+        )
+
+
@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from wallets.models import Transaction, Wallet
+from wallets.services import TransferItem, transfer, transfer_many
+
+
+class WalletStatementAPITests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.currency = getattr(settings, "DEFAULT_CURRENCY", "U")
+        self.admin_owner = getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin")
+
+        self.admin = Wallet.objects.create(owner_name=self.admin_owner, currency=self.currency, balance=Decimal("0.00"))
+        self.a = Wallet.objects.create(owner_name="A_stmt", currency=self.currency, balance=Decimal("5000.00"))
+        self.b = Wallet.objects.create(owner_name="B_stmt", currency=self.currency, balance=Decimal("0.00"))
+
+    def _url(self, wallet) -> str:
+        return f"/api/wallets/{wallet.id}/transactions"
+
+    def _pages(self, wallet, limit: int) -> list[dict]:
+        entries, cursor = [], None
+        while True:
+            params = {"limit": limit, "include_balance": "true"}
+            if cursor:
+                params["cursor"] = cursor
+            r = self.client.get(self._url(wallet), params)
+            self.assertEqual(r.status_code, 200)
+            body = r.json()
+            self.assertLessEqual(len(body["results"]), limit)
+            entries.extend(body["results"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return entries
+
+    def test_pages_cover_both_directions_with_running_balance(self):
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("2000.00"))
+        transfer(from_wallet_id=str(self.b.id), to_wallet_id=str(self.a.id), amount=Decimal("500.00"))
+        transfer_many(
+            [
+                TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("100.00")),
+                TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("50.00")),
+            ]
+        )
+
+        entries = self._pages(self.a, limit=2)
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(len({e["transaction_id"] for e in entries}), 4)
+        keys = [(e["created_at"], e["transaction_id"]) for e in entries]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+        by_tx = {e["transaction_id"]: e for e in entries}
+        for tx in Transaction.objects.all():
+            entry = by_tx[str(tx.id)]
+            if tx.from_wallet_id == self.a.id:
+                self.assertEqual(entry["direction"], "debit")
+                self.assertEqual(entry["balance_after"], f"{tx.from_balance_after:.2f}")
+            else:
+                self.assertEqual(entry["direction"], "credit")
+                self.assertEqual(entry["fee"], "0.00")
+                self.assertEqual(entry["balance_after"], f"{tx.to_balance_after:.2f}")
+
+        # 5000 - 2200 + 500 - 100 - 50
+        latest = Transaction.objects.order_by("-created_at", "-id").first()
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("3150.00"))
+        self.assertEqual(latest.from_balance_after, self.a.balance)
+
+        self.assertEqual(len(self._pages(self.b, limit=3)), 4)
+
+    def test_admin_wallet_statement_adds_up_to_balance(self):
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("2000.00"))
+        transfer(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("10.00"))
+        transfer_many(
+            [TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1500.00"))]
+        )
+
+        entries = self._pages(self.admin, limit=1)
+        self.assertEqual([e["amount"] for e in entries], ["150.00", "200.00"])
+        for entry in entries:
+            self.assertEqual((entry["direction"], entry["fee"]), ("credit", "0.00"))
+            self.assertEqual(entry["counterparty_wallet_id"], str(self.a.id))
+            self.assertIsNone(entry["balance_after"])
+        self.admin.refresh_from_db()
+        self.assertEqual(sum(Decimal(e["amount"]) for e in entries), self.admin.balance)
+
+    def test_page_cost_is_constant(self):
+        transfer_many(
+            [
+                TransferItem(from_wallet_id=str(self.a.id), to_wallet_id=str(self.b.id), amount=Decimal("1.00"))
+                for _ in range(30)
+            ]
+        )
+        r = self.client.get(self._url(self.a), {"limit": 10})
+        cursor = r.json()["next_cursor"]
+        self.assertNotIn("balance_after", r.json()["results"][0])
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(self._url(self.a), {"limit": 10, "cursor": cursor})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json()["results"]), 10)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_invalid_cursor_and_unknown_wallet(self):
+        r = self.client.get(self._url(self.a), {"cursor": "not-a-cursor"})
+        self.assertEqual(r.status_code, 400)
+
+        r = self.client.get("/api/wallets/00000000-0000-0000-0000-000000000000/transactions")
+        self.assertEqual(r.status_code, 404)
+
+
@@ -1,11 +1,35 @@
 from django.urls import path
 
-from wallets.views import TransferAPIView
+from wallets.async_views import transfer_async
+from wallets.views import (
+    BatchTransferAPIView,
+    HoldAPIView,
+    HoldCaptureAPIView,
+    HoldDetailAPIView,
+    HoldVoidAPIView,
+    OutboxStatsAPIView,
+    TransferAPIView,
+    WalletCacheStatsAPIView,
+    WalletStatementAPIView,
+)
 
 
 urlpatterns = [
     path("transfer", TransferAPIView.as_view(), name="transfer"),
     path("transfer/", TransferAPIView.as_view(), name="transfer_slash"),
+    path("transfer/async", transfer_async, name="transfer_async"),
+    path("transfer/async/", transfer_async, name="transfer_async_slash"),
+    path("transfers/batch", BatchTransferAPIView.as_view(), name="transfer_batch"),
+    path("transfers/batch/", BatchTransferAPIView.as_view(), name="transfer_batch_slash"),
+    path("holds", HoldAPIView.as_view(), name="holds"),
+    path("holds/", HoldAPIView.as_view(), name="holds_slash"),
+    path("holds/<uuid:hold_id>", HoldDetailAPIView.as_view(), name="hold_detail"),
+    path("holds/<uuid:hold_id>/capture", HoldCaptureAPIView.as_view(), name="hold_capture"),
+    path("holds/<uuid:hold_id>/void", HoldVoidAPIView.as_view(), name="hold_void"),
+    path("wallets/<uuid:wallet_id>/transactions", WalletStatementAPIView.as_view(), name="wallet_statement"),
+    path("wallets/<uuid:wallet_id>/transactions/", WalletStatementAPIView.as_view(), name="wallet_statement_slash"),
+    path("cache/stats", WalletCacheStatsAPIView.as_view(), name="wallet_cache_stats"),
+    path("outbox/stats", OutboxStatsAPIView.as_view(), name="outbox_stats"),
 ]
 
 
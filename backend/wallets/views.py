@@ -1,51 +1,377 @@
-from django.db import transaction as db_transaction
+from django.db import IntegrityError
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from wallets.serializers import TransferRequestSerializer
-from wallets.services import InsufficientFunds, InvalidTransfer, transfer
-from wallets.tasks import send_notification
+from wallets import coalescer, fastpath, holds, idempotency, metrics, outbox, retry, sequencer, statements, wallet_cache
+from wallets.models import Hold, Wallet
+from wallets.serializers import (
+    BatchTransferRequestSerializer,
+    HoldCaptureSerializer,
+    HoldRequestSerializer,
+    WalletStatementQuerySerializer,
+)
+from wallets.services import (
+    BATCH_ALL_OR_NOTHING,
+    BatchItemResult,
+    InsufficientFunds,
+    InvalidTransfer,
+    TransferError,
+    TransferItem,
+    TransferResult,
+    sequenced_wallets,
+    transfer,
+    transfer_many,
+)
+
+
+def _transfer_response_data(result: TransferResult) -> dict:
+    data = {
+        "transaction_id": str(result.transaction.id),
+        "amount": f"{result.amount:.2f}",
+        "fee": f"{result.fee:.2f}",
+        "total_debited": f"{result.total_debited:.2f}",
+        "balances": {
+            "from_wallet": {"id": str(result.from_wallet.id), "balance": f"{result.from_wallet.balance:.2f}"},
+            "to_wallet": {"id": str(result.to_wallet.id), "balance": f"{result.to_wallet.balance:.2f}"},
+            "admin_wallet": {"id": str(result.admin_wallet.id), "balance": f"{result.admin_balance:.2f}"},
+        },
+    }
+    tx = result.transaction
+    if tx.fx_rate is not None:
+        # Межвалютный перевод: to_wallet получил to_amount в своей валюте по курсу fx_rate.
+        data["to_amount"] = f"{tx.to_amount:.2f}"
+        data["fx_rate"] = str(tx.fx_rate)
+    return data
+
+
+def _sequenced_response_data(t: sequencer.SequencedTransfer) -> dict:
+    # Балансы известны только для кошельков, которые sequencer держит в памяти; остальные — null.
+    to_balance = None if t.to_balance_after is None else f"{t.to_balance_after:.2f}"
+    return {
+        "transaction_id": t.id,
+        "amount": f"{t.amount:.2f}",
+        "fee": f"{t.fee:.2f}",
+        "total_debited": f"{t.total_debited:.2f}",
+        "balances": {
+            "from_wallet": {"id": t.from_wallet_id, "balance": f"{t.from_balance_after:.2f}"},
+            "to_wallet": {"id": t.to_wallet_id, "balance": to_balance},
+            "admin_wallet": {"id": t.fee_wallet_id, "balance": None},
+        },
+        "sequenced": True,
+    }
+
+
+def _replay(stored: idempotency.StoredResponse, request_hash: str) -> tuple[dict, int, dict]:
+    if stored.request_hash != request_hash:
+        return (
+            {"detail": "Idempotency-Key уже использован с другими параметрами"},
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {},
+        )
+    return stored.body, stored.status, {"Idempotent-Replayed": "true"}
+
+
+def _conflict_response() -> Response:
+    return Response(
+        {"detail": "Конфликт параллельных переводов, повторите запрос"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
 
 
 class TransferAPIView(APIView):
+    # При TRANSFER_FAST_PATH=0 оба класса сразу отдают работу JSONParser/JSONRenderer.
+    parser_classes = [fastpath.FastJSONParser]
+    renderer_classes = [fastpath.FastJSONRenderer]
+
     def post(self, request):
-        serializer = TransferRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        with metrics.stage("validate"):
+            data, errors = fastpath.validate_transfer(request.data)
+            if errors is not None:
+                raise ValidationError(errors)
 
-        data = serializer.validated_data
+        key = request.headers.get(idempotency.HEADER)
+        if str(data["from_wallet_id"]) in sequenced_wallets():
+            return self._sequenced(data, key)
+        if key is None:
+            return self._transfer(data)
 
-        try:
-            result = transfer(
+        if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+            return Response({"detail": "Некорректный Idempotency-Key"}, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = idempotency.request_fingerprint(
+            from_wallet_id=str(data["from_wallet_id"]),
+            to_wallet_id=str(data["to_wallet_id"]),
+            amount=data["amount"],
+        )
+        with metrics.stage("idempotency_lookup"):
+            stored = idempotency.lookup(key)
+        if stored is None:
+            try:
+                return self._transfer(data, idempotency_key=key, request_hash=request_hash)
+            except IntegrityError:
+                # Параллельный запрос с тем же ключом успел закоммитить первым.
+                stored = idempotency.lookup(key)
+                if stored is None:
+                    raise
+
+        body, http_status, headers = _replay(stored, request_hash)
+        return Response(body, status=http_status, headers=headers)
+
+    def _transfer(self, data, *, idempotency_key: str | None = None, request_hash: str | None = None):
+        # Запрос с ключом не склеивается: ключ пишется в транзакции именно этого перевода.
+        apply = coalescer.transfer if idempotency_key is None and coalescer.enabled() else transfer
+
+        def run() -> dict:
+            result = apply(
                 from_wallet_id=str(data["from_wallet_id"]),
                 to_wallet_id=str(data["to_wallet_id"]),
                 amount=data["amount"],
             )
+            body = _transfer_response_data(result)
+            if idempotency_key:
+                idempotency.store(
+                    idempotency_key,
+                    request_hash=request_hash,
+                    status=status.HTTP_200_OK,
+                    body=body,
+                    tx=result.transaction,
+                )
+            return body
+
+        try:
+            with metrics.stage("service"):
+                # Ключ сохраняется в той же транзакции, что и перевод, и повторяется вместе с ним;
+                # без ключа транзакцию и повторы ведёт сам transfer().
+                body = retry.run(run) if idempotency_key else run()
         except InsufficientFunds:
+            metrics.transfer_result("sync", "insufficient_funds")
             return Response({"detail": "Insufficient funds"}, status=status.HTTP_409_CONFLICT)
         except InvalidTransfer as e:
+            metrics.transfer_result("sync", "invalid")
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except retry.RetriesExhausted:
+            return _conflict_response()
+
+        metrics.transfer_result("sync", "ok")
+        return Response(body, status=status.HTTP_200_OK)
+
+    def _sequenced(self, data, key: str | None):
+        if key is not None:
+            return Response(
+                {"detail": "Idempotency-Key не поддерживается для кошельков sequencer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            with metrics.stage("sequencer"):
+                outcome = sequencer.call(
+                    sequencer.TransferRequest(
+                        from_wallet_id=str(data["from_wallet_id"]),
+                        to_wallet_id=str(data["to_wallet_id"]),
+                        amount=data["amount"],
+                    )
+                )
+        except sequencer.SequencerUnavailable as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"}
+            )
+
+        if isinstance(outcome.error, InsufficientFunds):
+            metrics.transfer_result("sequencer", "insufficient_funds")
+            return Response({"detail": "Insufficient funds"}, status=status.HTTP_409_CONFLICT)
+        if outcome.error is not None:
+            metrics.transfer_result("sequencer", "invalid")
+            return Response({"detail": str(outcome.error)}, status=status.HTTP_400_BAD_REQUEST)
+        metrics.transfer_result("sequencer", "ok")
+        return Response(_sequenced_response_data(outcome.transfer), status=status.HTTP_200_OK)
+
+
+def _batch_item_data(item: BatchItemResult) -> dict:
+    if item.ok:
+        return {
+            "index": item.index,
+            "status": "ok",
+            "transaction_id": str(item.transaction.id),
+            "amount": f"{item.amount:.2f}",
+            "fee": f"{item.fee:.2f}",
+            "total_debited": f"{item.total_debited:.2f}",
+        }
+    if item.error is not None:
+        return {"index": item.index, "status": "error", "detail": str(item.error)}
+    return {"index": item.index, "status": "skipped"}
+
+
+class BatchTransferAPIView(APIView):
+    def post(self, request):
+        serializer = BatchTransferRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        items = [
+            TransferItem(
+                from_wallet_id=str(item["from_wallet_id"]),
+                to_wallet_id=str(item["to_wallet_id"]),
+                amount=item["amount"],
+            )
+            for item in data["items"]
+        ]
+
+        try:
+            result = transfer_many(items, mode=data["mode"])
+        except InvalidTransfer as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except retry.RetriesExhausted:
+            return _conflict_response()
+
+        http_status = status.HTTP_200_OK
+        if not result.committed and data["mode"] == BATCH_ALL_OR_NOTHING:
+            errors = [item.error for item in result.items if item.error is not None]
+            if errors and all(isinstance(e, InsufficientFunds) for e in errors):
+                http_status = status.HTTP_409_CONFLICT
+            elif errors:
+                http_status = status.HTTP_400_BAD_REQUEST
+
+        return Response(
+            {
+                "mode": data["mode"],
+                "committed": result.committed,
+                "items": [_batch_item_data(item) for item in result.items],
+            },
+            status=http_status,
+        )
+
+
+def _hold_data(hold: Hold) -> dict:
+    return {
+        "hold_id": str(hold.id),
+        "status": hold.status,
+        "wallet_id": str(hold.wallet_id),
+        "to_wallet_id": str(hold.to_wallet_id),
+        "amount": f"{hold.amount:.2f}",
+        "reserved": f"{hold.reserved:.2f}",
+        "captured_amount": None if hold.captured_amount is None else f"{hold.captured_amount:.2f}",
+        "transaction_id": None if hold.transaction_id is None else str(hold.transaction_id),
+        "expires_at": hold.expires_at,
+    }
+
+
+def _hold_error_response(e: Exception) -> Response:
+    if isinstance(e, holds.HoldNotFound):
+        return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    if isinstance(e, InsufficientFunds):
+        return Response({"detail": "Insufficient funds"}, status=status.HTTP_409_CONFLICT)
+    if isinstance(e, holds.HoldStateError):
+        return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+    if isinstance(e, retry.RetriesExhausted):
+        return _conflict_response()
+    return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class HoldAPIView(APIView):
+    def post(self, request):
+        serializer = HoldRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        db_transaction.on_commit(
-            lambda: send_notification.delay(
-                to_wallet_id=str(result.to_wallet.id),
-                transaction_id=str(result.transaction.id),
+        data = serializer.validated_data
+        try:
+            hold = holds.authorize(
+                wallet_id=str(data["wallet_id"]),
+                to_wallet_id=str(data["to_wallet_id"]),
+                amount=data["amount"],
+                ttl=data.get("ttl_seconds"),
             )
+        except (TransferError, retry.RetriesExhausted) as e:
+            return _hold_error_response(e)
+        return Response(_hold_data(hold), status=status.HTTP_201_CREATED)
+
+
+class HoldDetailAPIView(APIView):
+    def get(self, request, hold_id):
+        hold = Hold.objects.filter(id=hold_id).first()
+        if hold is None:
+            return Response({"detail": "Холд не найден"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_hold_data(hold), status=status.HTTP_200_OK)
+
+
+class HoldCaptureAPIView(APIView):
+    def post(self, request, hold_id):
+        serializer = HoldCaptureSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            result = holds.capture(hold_id, serializer.validated_data.get("amount"))
+        except (TransferError, retry.RetriesExhausted) as e:
+            return _hold_error_response(e)
+        metrics.transfer_result("hold", "ok")
+        return Response(
+            {"hold": _hold_data(result.hold), **_transfer_response_data(result.transfer)},
+            status=status.HTTP_200_OK,
         )
 
+
+class HoldVoidAPIView(APIView):
+    def post(self, request, hold_id):
+        try:
+            hold = holds.void(hold_id)
+        except (TransferError, retry.RetriesExhausted) as e:
+            return _hold_error_response(e)
+        return Response(_hold_data(hold), status=status.HTTP_200_OK)
+
+
+class WalletCacheStatsAPIView(APIView):
+    def get(self, request):
+        return Response(wallet_cache.stats(), status=status.HTTP_200_OK)
+
+
+def _statement_entry_data(entry: statements.StatementEntry, include_balance: bool) -> dict:
+    data = {
+        "transaction_id": str(entry.transaction_id),
+        "created_at": entry.created_at,
+        "direction": entry.direction,
+        "amount": f"{entry.amount:.2f}",
+        "fee": f"{entry.fee:.2f}",
+        "counterparty_wallet_id": str(entry.counterparty_wallet_id),
+        "status": entry.status,
+    }
+    if include_balance:
+        data["balance_after"] = None if entry.balance_after is None else f"{entry.balance_after:.2f}"
+    return data
+
+
+class WalletStatementAPIView(APIView):
+    def get(self, request, wallet_id):
+        serializer = WalletStatementQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        if not Wallet.objects.filter(id=wallet_id).exists():
+            return Response({"detail": "Кошелёк не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            page = statements.wallet_statement(wallet_id, limit=data["limit"], cursor=data.get("cursor"))
+        except statements.InvalidCursor as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         return Response(
             {
-                "transaction_id": str(result.transaction.id),
-                "amount": f"{result.amount:.2f}",
-                "fee": f"{result.fee:.2f}",
-                "total_debited": f"{result.total_debited:.2f}",
-                "balances": {
-                    "from_wallet": {"id": str(result.from_wallet.id), "balance": f"{result.from_wallet.balance:.2f}"},
-                    "to_wallet": {"id": str(result.to_wallet.id), "balance": f"{result.to_wallet.balance:.2f}"},
-                    "admin_wallet": {"id": str(result.admin_wallet.id), "balance": f"{result.admin_wallet.balance:.2f}"},
-                },
+                "wallet_id": str(wallet_id),
+                "results": [_statement_entry_data(entry, data["include_balance"]) for entry in page.entries],
+                "next_cursor": page.next_cursor,
             },
             status=status.HTTP_200_OK,
         )
 
 
+class OutboxStatsAPIView(APIView):
+    def get(self, request):
+        return Response(outbox.backlog(), status=status.HTTP_200_OK)
+
+
+def metrics_view(request):
+    return HttpResponse(metrics.exposition(), content_type=CONTENT_TYPE_LATEST)
+
+
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TwoTierCache:
+    # L1 — LRU в памяти процесса, L2 (опционально) — общий Django cache (Redis).
+    def __init__(self, name: str, maxsize: int, *, shared: bool = False, shared_timeout: int = 3600) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self._data: OrderedDict[Hashable, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _shared_key(self, key: Hashable) -> str:
+        if isinstance(key, tuple):
+            key = ":".join(str(part) for part in key)
+        return f"walletmeta:{self.name}:{key}"
+
+    def _local_get(self, key: Hashable) -> object:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _local_set(self, key: Hashable, value: object) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _shared_get_many(self, keys: list[Hashable]) -> dict[Hashable, object]:
+        if not self.shared or not keys:
+            return {}
+        by_shared_key = {self._shared_key(key): key for key in keys}
+        try:
+            found = shared_cache.get_many(list(by_shared_key))
+        except Exception:
+            logger.warning("wallet cache %s: shared get failed", self.name, exc_info=True)
+            return {}
+        return {by_shared_key[k]: v for k, v in found.items()}
+
+    def _shared_set_many(self, values: dict[Hashable, object]) -> None:
+        if not self.shared or not values:
+            return
+        try:
+            shared_cache.set_many({self._shared_key(k): v for k, v in values.items()}, self.shared_timeout)
+        except Exception:
+            logger.warning("wallet cache %s: shared set failed", self.name, exc_info=True)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[Hashable], object]) -> object:
+        return self.get_many_or_load([key], lambda keys: {k: loader(k) for k in keys}).get(key)
+
+    def get_many_or_load(
+        self,
+        keys: Iterable[Hashable],
+        loader: Callable[[list[Hashable]], dict[Hashable, object]],
+    ) -> dict[Hashable, object]:
+        result: dict[Hashable, object] = {}
+        pending: list[Hashable] = []
+        for key in keys:
+            value = self._local_get(key)
+            if value is _MISSING:
+                pending.append(key)
+            else:
+                result[key] = value
+
+        if pending:
+            found = self._shared_get_many(pending)
+            with self._lock:
+                self.shared_hits += len(found)
+            for key, value in found.items():
+                self._local_set(key, value)
+            result.update(found)
+            pending = [key for key in pending if key not in found]
+
+        if pending:
+            with self._lock:
+                self.misses += len(pending)
+            loaded = {key: value for key, value in loader(pending).items() if value is not None}
+            for key, value in loaded.items():
+                self._local_set(key, value)
+            self._shared_set_many(loaded)
+            result.update(loaded)
+
+        return result
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[Hashable], Awaitable[object]]) -> object:
+        # Async-путь работает только с L1: общий уровень синхронный и блокировал бы event loop.
+        value = self._local_get(key)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            self.misses += 1
+        value = await loader(key)
+        if value is not None:
+            self._local_set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+        if self.shared:
+            try:
+                shared_cache.delete(self._shared_key(key))
+            except Exception:
+                logger.warning("wallet cache %s: shared delete failed", self.name, exc_info=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+            }
+
+
+_maxsize = int(getattr(settings, "WALLET_CACHE_MAX_SIZE", 100_000))
+_shared = bool(getattr(settings, "WALLET_CACHE_SHARED", False))
+
+# wallet id -> currency
+wallet_currencies = TwoTierCache("currency", _maxsize, shared=_shared)
+# (currency, shard) -> admin wallet id
+admin_wallet_ids = TwoTierCache("admin", 1024, shared=_shared)
+
+
+def invalidate_wallet(*, wallet_id, owner_name: str, currency: str, shard: int) -> None:
+    wallet_currencies.invalidate(str(wallet_id))
+    if owner_name == getattr(settings, "ADMIN_WALLET_OWNER_NAME", "admin"):
+        admin_wallet_ids.invalidate((currency, shard))
+
+
+def stats() -> dict[str, dict[str, int]]:
+    return {cache.name: cache.stats() for cache in (wallet_currencies, admin_wallet_ids)}
+
+
+def clear() -> None:
+    wallet_currencies.clear()
+    admin_wallet_ids.clear()
+
+